@@ -5,16 +5,33 @@ Simple API for Kerala Panchayat document queries
 
 import os
 import time
+import json
+import base64
 import pickle
+import hashlib
+import asyncio
 import logging
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Tuple, Optional, Iterator
+from dataclasses import dataclass, field
 
 # External dependencies
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from groq import Groq
+
+from answer_cache import AnswerCache
+import index_bundle
+from chunk_store import ChunkStore, is_chunk_store
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from shared_index import SharedCorpus
+from federated_index import CorpusReplacedError, FederatedCorpus, calibration_questions, parse_corpora
+from chunk_filter import ChunkFilter, FilteredIds, SearchScope, search_selected
+from micro_batcher import MicroBatcher
+from context_builder import ContextBuilder, DEFAULT_TOKENIZER, clean_chunk
+from context_compressor import ExtractiveCompressor
+from llm_client import LLMClient
+from model_router import ModelRouter, RoutingDecision
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +47,26 @@ class QueryResponse:
     num_sources: int
     success: bool
     error_message: Optional[str] = None
+    cached: bool = False
+    model_used: Optional[str] = None
+    source_details: List[Dict] = field(default_factory=list)
+
+@dataclass(frozen=True, eq=False)
+class CorpusGeneration:
+    """
+    One consistent view of the served corpus
+    
+    A reload builds a new generation and swaps it in with a single assignment.
+    Each request takes one reference at the start and reads chunk ids, text
+    and metadata only from it, so ids found in one version are never resolved
+    against the chunks of another.
+    """
+    index: object
+    chunks: object
+    bm25: Optional[BM25Index] = None
+    version: Optional[str] = None   # None for plain index files (see corpus_version)
+    federated: Optional[FederatedCorpus] = None
+    filtered: Dict = field(default_factory=dict)   # ChunkFilter -> FilteredIds of this generation
 
 class KeralaPanchayatRAG:
     """Production-ready Kerala Panchayat RAG System"""
@@ -38,7 +75,24 @@ class KeralaPanchayatRAG:
                  model_name: str = 'all-MiniLM-L6-v2',
                  groq_api_key: Optional[str] = None,
                  index_path: str = "kerala_panchayat_index.bin",
-                 chunks_path: str = "kerala_chunks.pkl"):
+                 chunks_path: Optional[str] = None,
+                 enable_cache: Optional[bool] = None,
+                 cache_path: Optional[str] = None,
+                 nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None,
+                 bundle_path: Optional[str] = None,
+                 mmap_index: Optional[bool] = None,
+                 verify_checksums: Optional[bool] = None,
+                 retrieval_mode: Optional[str] = None,
+                 reranker_model: Optional[str] = None,
+                 embedding_backend: Optional[str] = None,
+                 shared_memory: Optional[str] = None,
+                 coalesce: Optional[bool] = None,
+                 context_token_budget: Optional[int] = None,
+                 model_routing: Optional[bool] = None,
+                 adaptive_k: Optional[bool] = None,
+                 compress_context: Optional[bool] = None,
+                 corpora: Optional[Dict[str, str]] = None):
         """
         Initialize the RAG system
         
@@ -46,30 +100,209 @@ class KeralaPanchayatRAG:
             model_name: Sentence transformer model name
             groq_api_key: Groq API key (if None, will read from env)
             index_path: Path to FAISS index file
-            chunks_path: Path to chunks pickle file
+            chunks_path: Path to the chunk store (if None, kerala_chunks.kpc, falling back to
+                         the legacy kerala_chunks.pkl pickle)
+            enable_cache: Enable the answer cache (if None, reads RAG_CACHE_ENABLED, default on)
+            cache_path: SQLite file for a persistent answer cache (if None, reads RAG_CACHE_PATH;
+                        unset keeps the cache in memory only)
+            nprobe: IVF lists probed per query (if None, reads RAG_NPROBE, then the index metadata)
+            ef_search: HNSW search depth (if None, reads RAG_EF_SEARCH, then the index metadata)
+            bundle_path: Index bundle directory (if None, reads RAG_BUNDLE_PATH, default
+                         kerala_panchayat_bundle). Used instead of index_path/chunks_path when present.
+            mmap_index: Memory-map the FAISS index (if None, reads RAG_MMAP_INDEX, default on)
+            verify_checksums: Verify bundle file checksums on load (if None, reads
+                              RAG_VERIFY_CHECKSUMS, default on)
+            retrieval_mode: 'dense' (FAISS only) or 'hybrid' (BM25 + FAISS fused with
+                            reciprocal-rank fusion, needs a BM25 index). If None, reads
+                            RAG_RETRIEVAL_MODE, default 'dense'.
+            reranker_model: Cross-encoder used to re-rank the retrieved candidates (if None,
+                            reads RAG_RERANKER_MODEL; unset disables re-ranking). A forward pass
+                            scores at most RAG_RERANK_MAX_PAIRS (question, chunk) pairs (default 64),
+                            each question at least its num_sources; re-ranking gets
+                            RAG_RERANK_BUDGET_MS (default 150) per pass, and up to RAG_WORKER_THREADS
+                            re-rank calls (default 8) run at once.
+            embedding_backend: Query encoder backend, 'torch' (SentenceTransformer) or 'onnx'
+                               (exported model in RAG_ONNX_MODEL_DIR, see onnx_encoder.py).
+                               If None, reads RAG_EMBEDDING_BACKEND, default 'torch'.
+            shared_memory: Name of a corpus published in shared memory by shared_index.py
+                           (if None, reads RAG_SHARED_MEMORY; unset loads from disk). Used
+                           instead of the bundle and index files when set.
+            coalesce: Coalesce concurrent questions into batched encode and search calls
+                      (if None, reads RAG_COALESCE, default off). Batches are bounded by
+                      RAG_COALESCE_MAX_BATCH (default 32) and RAG_COALESCE_MAX_WAIT_MS (default 5).
+            context_token_budget: Maximum prompt context tokens after merging overlapping
+                                  chunks (if None, reads RAG_CONTEXT_TOKEN_BUDGET, default 1200;
+                                  0 disables the budget). Tokens are counted with
+                                  RAG_CONTEXT_TOKENIZER: a tokenizer.json file or directory, or
+                                  a Hugging Face model id read from the local cache when present
+                                  (default context_builder.DEFAULT_TOKENIZER; 'none' estimates
+                                  from characters, as does a tokenizer that cannot be loaded).
+            model_routing: Answer easy questions with a smaller model (if None, reads RAG_MODEL_ROUTING,
+                           default off). See _create_router for the thresholds.
+            adaptive_k: Retrieve up to RAG_ADAPTIVE_MAX_SOURCES sections (default 6, never fewer
+                        than num_sources) and keep only those scoring at least RAG_ADAPTIVE_MIN_SCORE
+                        (default 0.35) and RAG_ADAPTIVE_RELATIVE_CUTOFF times the top hit (default
+                        0.85). Questions with no section above the floor get the "couldn't find"
+                        answer without an LLM call. If None, reads RAG_ADAPTIVE_K, default off.
+            compress_context: Keep only the RAG_COMPRESSION_MAX_SENTENCES sentences (default 8)
+                              most similar to the question, plus RAG_COMPRESSION_NEIGHBOURS
+                              sentences on each side (default 1), before building the prompt.
+                              If None, reads RAG_CONTEXT_COMPRESSION, default off.
+            corpora: Multi-corpus mode: corpus name -> index bundle directory, one bundle per
+                     legal corpus (if None, reads RAG_CORPORA as "name=dir,name=dir"; unset
+                     serves the single bundle). Used instead of the bundle and index files.
         """
         # API setup
         self.groq_api_key = groq_api_key or os.getenv('GROQ_API_KEY')
         if not self.groq_api_key:
             raise ValueError("GROQ_API_KEY not found. Set it as environment variable or pass as parameter.")
         
-        self.groq_client = Groq(api_key=self.groq_api_key)
+        # Request threads per worker process, which size the LLM pool and the re-rank threads
+        self.worker_threads = max(1, int(os.getenv('RAG_WORKER_THREADS', '8')))
+        
+        # Pooled LLM client; timeouts in seconds, pool and hedging threads sized for the
+        # parallel LLM calls of a worker (its request threads, or a batch's concurrency)
+        llm_concurrency = max(self.worker_threads, int(os.getenv('RAG_BATCH_CONCURRENCY', '4')))
+        self.llm = LLMClient(
+            api_key=self.groq_api_key,
+            connect_timeout=float(os.getenv('RAG_LLM_CONNECT_TIMEOUT', '5')),
+            read_timeout=float(os.getenv('RAG_LLM_READ_TIMEOUT', '30')),
+            max_retries=int(os.getenv('RAG_LLM_MAX_RETRIES', '2')),
+            concurrency=llm_concurrency,
+            pool_size=int(os.getenv('RAG_LLM_POOL_SIZE', llm_concurrency)),
+            hedge=os.getenv('RAG_LLM_HEDGE', 'false').lower() in ('1', 'true', 'yes'),
+            hedge_quantile=float(os.getenv('RAG_LLM_HEDGE_QUANTILE', '0.95')),
+            hedge_min_delay=float(os.getenv('RAG_LLM_HEDGE_MIN_DELAY_MS', '500')) / 1000.0
+        )
+        self.groq_client = self.llm.client
+        self._embedding_executor = None
+        self._rerank_executor = None
+        self._rerank_slots = threading.BoundedSemaphore(self.worker_threads)
         
         # File paths
+        if chunks_path is None:
+            chunks_path = "kerala_chunks.kpc" if os.path.exists("kerala_chunks.kpc") else "kerala_chunks.pkl"
         self.index_path = index_path
         self.chunks_path = chunks_path
+        self.bundle_path = bundle_path or os.getenv('RAG_BUNDLE_PATH', 'kerala_panchayat_bundle')
+        self.bundle_manifest = None
+        self.shared_memory = shared_memory or os.getenv('RAG_SHARED_MEMORY')
+        self.corpora = corpora or parse_corpora(os.getenv('RAG_CORPORA', ''))
+        if self.corpora and self.shared_memory:
+            raise ValueError("Multi-corpus mode (RAG_CORPORA) cannot be combined with RAG_SHARED_MEMORY")
+        self._shared = None
+        self._shared_lock = threading.Lock()
+        
+        if mmap_index is None:
+            mmap_index = os.getenv('RAG_MMAP_INDEX', 'true').lower() in ('1', 'true', 'yes')
+        if verify_checksums is None:
+            verify_checksums = os.getenv('RAG_VERIFY_CHECKSUMS', 'true').lower() in ('1', 'true', 'yes')
+        self.mmap_index = mmap_index
+        self.verify_checksums = verify_checksums
         
         # Initialize components
+        self.model_name = model_name
+        self.embedding_backend = (embedding_backend or os.getenv('RAG_EMBEDDING_BACKEND', 'torch')).lower()
         self.embedding_model = None
-        self.index = None
-        self.chunks = []
+        self.index_config = {}
+        self._generation = CorpusGeneration(index=None, chunks=[])
+        
+        # Runtime search parameters for approximate indexes
+        self.nprobe = nprobe or (int(os.getenv('RAG_NPROBE')) if os.getenv('RAG_NPROBE') else None)
+        self.ef_search = ef_search or (int(os.getenv('RAG_EF_SEARCH')) if os.getenv('RAG_EF_SEARCH') else None)
         
         # Load the system
         self._load_embedding_model(model_name)
         self._load_system()
         
+        # Lexical + dense retrieval
+        self.retrieval_mode = (retrieval_mode or os.getenv('RAG_RETRIEVAL_MODE', 'dense')).lower()
+        if self.retrieval_mode not in ('dense', 'hybrid'):
+            raise ValueError(f"Unknown retrieval mode '{self.retrieval_mode}'")
+        if self.retrieval_mode == 'hybrid' and self.bm25 is None:
+            logger.warning("Hybrid retrieval requested but no BM25 index was found; using dense retrieval")
+            self.retrieval_mode = 'dense'
+        self.hybrid_candidates = int(os.getenv('RAG_HYBRID_CANDIDATES', '20'))
+        self.lexical_decisive_ratio = float(os.getenv('RAG_LEXICAL_DECISIVE_RATIO', '2.0'))
+        
+        # Adaptive number of sources
+        if adaptive_k is None:
+            adaptive_k = os.getenv('RAG_ADAPTIVE_K', 'false').lower() in ('1', 'true', 'yes')
+        self.adaptive_k = adaptive_k
+        self.adaptive_max_sources = int(os.getenv('RAG_ADAPTIVE_MAX_SOURCES', '6'))
+        self.adaptive_min_score = float(os.getenv('RAG_ADAPTIVE_MIN_SCORE', '0.35'))
+        self.adaptive_relative_cutoff = float(os.getenv('RAG_ADAPTIVE_RELATIVE_CUTOFF', '0.85'))
+        
+        # Optional cross-encoder re-ranking of a wider candidate set
+        self.reranker = None
+        self.reranker_model = reranker_model or os.getenv('RAG_RERANKER_MODEL')
+        self.rerank_candidates = int(os.getenv('RAG_RERANK_CANDIDATES', '30'))
+        self.rerank_budget_ms = float(os.getenv('RAG_RERANK_BUDGET_MS', '150'))
+        self.rerank_max_pairs = max(1, int(os.getenv('RAG_RERANK_MAX_PAIRS', '64')))
+        if self.reranker_model:
+            self._load_reranker(self.reranker_model)
+        
+        # Answer cache (exact + semantic near-duplicate questions)
+        if enable_cache is None:
+            enable_cache = os.getenv('RAG_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.answer_cache = None
+        if enable_cache:
+            self.answer_cache = AnswerCache(
+                max_entries=int(os.getenv('RAG_CACHE_MAX_ENTRIES', '1000')),
+                ttl_seconds=float(os.getenv('RAG_CACHE_TTL_SECONDS', str(24 * 3600))),
+                similarity_threshold=float(os.getenv('RAG_CACHE_SIMILARITY', '0.95')),
+                persist_path=cache_path or os.getenv('RAG_CACHE_PATH'),
+                watch_paths=self._data_files(),
+                check_interval=float(os.getenv('RAG_CACHE_CHECK_INTERVAL_SECONDS', '5'))
+            )
+        
+        # Prompt context packing
+        if context_token_budget is None:
+            context_token_budget = int(os.getenv('RAG_CONTEXT_TOKEN_BUDGET', '1200'))
+        tokenizer_name = os.getenv('RAG_CONTEXT_TOKENIZER', DEFAULT_TOKENIZER)
+        self.context_builder = ContextBuilder(
+            token_budget=context_token_budget,
+            tokenizer_name=None if tokenizer_name.lower() == 'none' else tokenizer_name
+        )
+        
+        # Extractive compression of the retrieved sections
+        if compress_context is None:
+            compress_context = os.getenv('RAG_CONTEXT_COMPRESSION', 'false').lower() in ('1', 'true', 'yes')
+        self.compressor = ExtractiveCompressor(
+            encode_fn=self._encode_queries,
+            max_sentences=int(os.getenv('RAG_COMPRESSION_MAX_SENTENCES', '8')),
+            neighbours=int(os.getenv('RAG_COMPRESSION_NEIGHBOURS', '1'))
+        ) if compress_context else None
+        
+        # Micro-batching of concurrent embedding + search calls
+        if coalesce is None:
+            coalesce = os.getenv('RAG_COALESCE', 'false').lower() in ('1', 'true', 'yes')
+        self._coalescer = self._create_coalescer() if coalesce else None
+        
+        # Small/large model routing
+        if model_routing is None:
+            model_routing = os.getenv('RAG_MODEL_ROUTING', 'false').lower() in ('1', 'true', 'yes')
+        self.router = self._create_router(model_routing)
+        
         logger.info("Kerala Panchayat RAG system initialized successfully")
     
+    # The corpus currently served; request paths pin self._generation instead
+    @property
+    def index(self):
+        return self._generation.index
+    
+    @property
+    def chunks(self):
+        return self._generation.chunks
+    
+    @property
+    def bm25(self) -> Optional[BM25Index]:
+        return self._generation.bm25
+    
+    @property
+    def federated(self) -> Optional[FederatedCorpus]:
+        return self._generation.federated
+    
     def _detect_device(self) -> str:
         """Detect if CUDA is available"""
         try:
@@ -83,7 +316,16 @@ class KeralaPanchayatRAG:
             return 'cpu'
     
     def _load_embedding_model(self, model_name: str):
-        """Load the sentence transformer model"""
+        """Load the query encoder for the configured backend"""
+        if self.embedding_backend == 'onnx':
+            self._load_onnx_encoder(model_name)
+            return
+        if self.embedding_backend != 'torch':
+            raise ValueError(f"Unknown embedding backend '{self.embedding_backend}'")
+        
+        # Imported here so ONNX-only workers never load torch
+        from sentence_transformers import SentenceTransformer
+        
         try:
             device = self._detect_device()
             self.embedding_model = SentenceTransformer(model_name, device=device)
@@ -92,50 +334,832 @@ class KeralaPanchayatRAG:
             logger.warning(f"Failed to load model on detected device, falling back to CPU: {e}")
             self.embedding_model = SentenceTransformer(model_name, device='cpu')
     
+    def _load_onnx_encoder(self, model_name: str):
+        """
+        Load the exported ONNX query encoder
+        
+        The export must come from the same model as the index and must have
+        passed the cosine check against the PyTorch embeddings, otherwise the
+        index vectors and query vectors would not be comparable.
+        """
+        from onnx_encoder import OnnxSentenceEncoder, read_config
+        
+        model_dir = os.getenv('RAG_ONNX_MODEL_DIR', 'onnx_encoder')
+        config = read_config(model_dir)
+        if config['source_model'] != model_name:
+            raise ValueError(f"ONNX encoder in {model_dir} was exported from '{config['source_model']}' "
+                             f"but the engine uses '{model_name}'")
+        
+        min_cosine = float(os.getenv('RAG_ONNX_MIN_COSINE', str(config['min_cosine_required'])))
+        verified = config.get('verification', {}).get(config['model_file'])
+        if verified is None or verified < min_cosine:
+            raise ValueError(f"ONNX encoder {config['model_file']} was not verified to cosine >= {min_cosine} "
+                             f"against PyTorch (got {verified}); re-export it with onnx_encoder.py")
+        
+        threads = os.getenv('RAG_ONNX_THREADS')
+        self.embedding_model = OnnxSentenceEncoder(model_dir, num_threads=int(threads) if threads else None)
+        logger.info(f"ONNX embedding model {config['model_file']} loaded on cpu "
+                    f"(min cosine vs PyTorch {verified:.4f})")
+    
+    def warm_up(self) -> float:
+        """
+        Run one dummy encode and search before real traffic arrives
+        
+        Pays the first-call costs (kernel selection, thread pool start-up,
+        first page faults on the index and chunks) so the first user does not.
+        
+        Returns:
+            Seconds taken
+        """
+        start_time = time.time()
+        question = "How do I apply for a building permit from the Panchayat?"
+        query_embedding = self._encode_queries([question])
+        self._search_batch_by_embedding(query_embedding, k=3, questions=[question])
+        self.context_builder.count_tokens(question)  # loads the tokenizer
+        elapsed = time.time() - start_time
+        logger.info(f"Warm-up finished in {elapsed:.2f}s")
+        return elapsed
+    
+    def _reset_after_fork(self):
+        """
+        Recreate process-local resources in a forked worker
+        
+        The index, chunks and model weights stay shared with the parent
+        (copy-on-write / page cache); connections, locks and thread pools do
+        not survive fork() and are rebuilt.
+        """
+        self.llm.reset_after_fork()
+        self.groq_client = self.llm.client
+        self._embedding_executor = None
+        self._rerank_executor = None
+        self._rerank_slots = threading.BoundedSemaphore(self.worker_threads)
+        self._shared_lock = threading.Lock()
+        if self._coalescer is not None:
+            self._coalescer = self._create_coalescer()
+        if self.answer_cache is not None:
+            self.answer_cache.reset_after_fork()
+        if hasattr(self.embedding_model, 'reset_after_fork'):
+            self.embedding_model.reset_after_fork()
+        if self.federated is not None:
+            self.federated.index.reset_after_fork()
+            self.federated.manager.reset_after_fork()
+    
+    def _create_coalescer(self) -> MicroBatcher:
+        """Micro-batcher feeding concurrent questions to _encode_and_search"""
+        return MicroBatcher(
+            lambda requests: self._encode_and_search(requests),
+            max_batch=int(os.getenv('RAG_COALESCE_MAX_BATCH', '32')),
+            max_wait_ms=float(os.getenv('RAG_COALESCE_MAX_WAIT_MS', '5')),
+            name='rag-coalescer'
+        )
+    
+    def _create_router(self, enabled: bool) -> ModelRouter:
+        """
+        Model router configured from the environment
+        
+        RAG_ROUTER_SMALL_MODEL (default llama3-8b-8192) answers a question only if
+        its top retrieval score is at least RAG_ROUTER_MIN_TOP_SCORE (default 0.65),
+        beats the runner-up by RAG_ROUTER_MIN_SCORE_GAP (default 0.05) and the
+        question has at most RAG_ROUTER_MAX_QUESTION_WORDS words (default 20).
+        """
+        return ModelRouter(
+            large_model=self.llm.model,
+            small_model=os.getenv('RAG_ROUTER_SMALL_MODEL', 'llama3-8b-8192'),
+            enabled=enabled,
+            min_top_score=float(os.getenv('RAG_ROUTER_MIN_TOP_SCORE', '0.65')),
+            min_score_gap=float(os.getenv('RAG_ROUTER_MIN_SCORE_GAP', '0.05')),
+            max_question_words=int(os.getenv('RAG_ROUTER_MAX_QUESTION_WORDS', '20'))
+        )
+    
+    def _route(self, question: str, relevant_sections: List[Tuple[str, float]]) -> RoutingDecision:
+        """Choose the answer model for a question and log the decision"""
+        decision = self.router.decide(question, relevant_sections)
+        logger.info(f"Routing to {decision.model} ({decision.tier}): {decision.reason} "
+                    f"[top={decision.top_score:.3f} gap={decision.score_gap:.3f} "
+                    f"words={decision.question_words}]")
+        return decision
+    
+    def _load_reranker(self, model_name: str):
+        """Load the cross-encoder on CPU and run one warm-up pass"""
+        from sentence_transformers import CrossEncoder
+        
+        self.reranker = CrossEncoder(model_name, device='cpu', max_length=512)
+        # The first forward pass is much slower; keep it out of the request budget
+        self.reranker.predict([("warm up", "warm up")], show_progress_bar=False)
+        logger.info(f"Re-ranker {model_name} loaded (top {self.rerank_candidates} candidates, "
+                    f"{self.rerank_budget_ms:.0f} ms budget)")
+    
     def _load_system(self):
         """Load the preprocessed FAISS index and chunks"""
         try:
+            if self.corpora:
+                self._load_federated()
+                return
+            
+            if self.shared_memory:
+                self._attach_shared()
+                return
+            
+            if index_bundle.is_bundle(self.bundle_path):
+                self._load_bundle()
+                return
+            
             # Load FAISS index
             if not os.path.exists(self.index_path):
                 raise FileNotFoundError(f"FAISS index not found at {self.index_path}")
             
-            self.index = faiss.read_index(self.index_path)
+            index = index_bundle.read_index(self.index_path, mmap=self.mmap_index)
+            
+            meta_path = self.index_path + ".meta.json"
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    self.index_config = json.load(f)
             
             # Load chunks
             if not os.path.exists(self.chunks_path):
                 raise FileNotFoundError(f"Chunks file not found at {self.chunks_path}")
             
-            with open(self.chunks_path, 'rb') as f:
-                self.chunks = pickle.load(f)
+            chunks = self._load_chunks(self.chunks_path)
+            
+            if index.ntotal != len(chunks):
+                raise index_bundle.BundleError(
+                    f"Index has {index.ntotal} vectors but {len(chunks)} chunks were loaded; "
+                    f"{self.index_path} and {self.chunks_path} do not belong together"
+                )
+            
+            bm25 = None
+            bm25_path = self.chunks_path + ".bm25.npz"
+            if os.path.exists(bm25_path):
+                bm25 = self._load_bm25(bm25_path, chunks)
+            
+            self._generation = CorpusGeneration(index, chunks, bm25)
+            self._apply_index_config()
             
-            logger.info(f"System loaded with {len(self.chunks)} document sections")
+            logger.info(f"System loaded with {len(chunks)} document sections")
             
         except Exception as e:
             logger.error(f"Failed to load system: {e}")
             raise
     
-    def _search_relevant_sections(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
-        """Search for relevant document sections"""
-        if self.index is None or not self.chunks:
+    def _load_chunks(self, path: str):
+        """
+        Open the chunks file
+        
+        Chunk stores are memory-mapped and decoded lazily. Legacy pickled lists
+        are still accepted, but only load those from trusted storage.
+        """
+        if is_chunk_store(path):
+            return ChunkStore.open(path)
+        
+        logger.warning(f"Loading legacy pickled chunks from {path}; re-run ingest_pdf.py to convert")
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    
+    def _load_bm25(self, path: str, chunks) -> BM25Index:
+        """Load the lexical index built alongside the chunks"""
+        bm25 = BM25Index.load(path)
+        if bm25.num_docs != len(chunks):
+            raise index_bundle.BundleError(
+                f"BM25 index covers {bm25.num_docs} chunks but {len(chunks)} were loaded"
+            )
+        logger.info(f"BM25 index loaded with {len(bm25.terms)} terms")
+        return bm25
+    
+    def _load_bundle(self):
+        """Load index and chunks from a versioned bundle, refusing mismatched files"""
+        # Resolve the published symlink once, so every file comes from the same version
+        bundle_dir = os.path.realpath(self.bundle_path)
+        manifest = index_bundle.read_manifest(bundle_dir)
+        index_bundle.verify_files(bundle_dir, manifest, check_checksums=self.verify_checksums)
+        
+        if manifest['embedding_model'] != self.model_name:
+            raise index_bundle.BundleError(
+                f"Bundle was built with '{manifest['embedding_model']}' but the engine uses '{self.model_name}'"
+            )
+        
+        self.index_path = index_bundle.bundle_file(bundle_dir, manifest, 'index')
+        self.chunks_path = index_bundle.bundle_file(bundle_dir, manifest, 'chunks')
+        
+        index = index_bundle.read_index(self.index_path, mmap=self.mmap_index)
+        chunks = self._load_chunks(self.chunks_path)
+        
+        model_dimension = self.embedding_model.get_sentence_embedding_dimension()
+        if not (manifest['dimension'] == index.d == model_dimension):
+            raise index_bundle.BundleError(
+                f"Dimension mismatch: manifest {manifest['dimension']}, index {index.d}, "
+                f"embedding model {model_dimension}"
+            )
+        if not (manifest['chunk_count'] == index.ntotal == len(chunks)):
+            raise index_bundle.BundleError(
+                f"Chunk count mismatch: manifest {manifest['chunk_count']}, "
+                f"index {index.ntotal}, chunks {len(chunks)}"
+            )
+        
+        bm25 = None
+        if 'bm25' in manifest['files']:
+            bm25 = self._load_bm25(index_bundle.bundle_file(bundle_dir, manifest, 'bm25'), chunks)
+        
+        self.bundle_manifest = manifest
+        self.index_config = manifest.get('index_config', {})
+        self._generation = CorpusGeneration(index, chunks, bm25, manifest['bundle_version'])
+        self._apply_index_config()
+        
+        logger.info(f"Bundle {manifest['bundle_version']} loaded with {len(chunks)} document sections "
+                    f"({'memory-mapped' if self.mmap_index else 'in-memory'} index)")
+    
+    def _load_federated(self):
+        """
+        Register one bundle per corpus and search them as one
+        
+        Only the manifests are read here; each corpus is loaded on first use
+        and evicted again, least recently used first, when the data files of
+        the loaded corpora exceed RAG_INDEX_MEMORY_BUDGET_MB. Hits of different corpora
+        are merged in the order of shard scores calibrated with representative questions
+        (see federated_index.calibration_questions) but keep their raw cosine scores;
+        RAG_FEDERATED_CALIBRATION=false merges by raw score. Calibrating touches every
+        corpus once.
+        """
+        federated = FederatedCorpus(
+            self.corpora,
+            embedding_model=self.model_name,
+            dimension=self.embedding_model.get_sentence_embedding_dimension(),
+            mmap=self.mmap_index,
+            check_checksums=self.verify_checksums
+        )
+        self._generation = self._federated_generation(federated)
+        self.index_config = {'index_type': 'federated', 'corpora': federated.names}
+        self._apply_index_config()
+        
+        if self._federated_calibration():
+            federated.calibrate(self._encode_queries(calibration_questions()))
+        
+        logger.info(f"Multi-corpus mode: {len(federated.shards)} corpora "
+                    f"({', '.join(federated.names)}) with {federated.ntotal} document sections")
+    
+    @staticmethod
+    def _federated_generation(federated: FederatedCorpus) -> CorpusGeneration:
+        return CorpusGeneration(federated.index, federated.chunks, federated.bm25, federated.version, federated)
+    
+    @staticmethod
+    def _federated_calibration() -> bool:
+        return os.getenv('RAG_FEDERATED_CALIBRATION', 'true').lower() in ('1', 'true', 'yes')
+    
+    def _reload_federated(self):
+        """
+        Switch to re-ingested corpus bundles
+        
+        Corpora whose bundle changed are re-registered and re-calibrated
+        against the existing score target, then the new generation is swapped
+        in as a whole. Requests pinned to the old generation keep reading the
+        old versions (see FederatedCorpus.reload).
+        """
+        previous = self.federated
+        federated = previous.reload()
+        changed = [shard.name for shard in federated.shards
+                   if shard.key != previous.select([shard.name])[0].key]
+        if self._federated_calibration() and changed:
+            federated.calibrate(self._encode_queries(calibration_questions()), corpora=changed)
+        federated.configure(self.nprobe, self.ef_search)
+        self._generation = self._federated_generation(federated)
+        logger.info(f"Reloaded corpora {', '.join(changed) or '(none changed)'}; now serving {federated.version}")
+    
+    def corpus_names(self) -> List[str]:
+        """Names of the searchable corpora (empty outside multi-corpus mode)"""
+        return self.federated.names if self.federated is not None else []
+    
+    def corpus_stats(self) -> Dict:
+        """
+        Memory budget, loaded file bytes (the budget's estimate of memory use) and
+        per-corpus version, residency, load/eviction counters and score calibration
+        (empty outside multi-corpus mode)
+        """
+        return self.federated.stats() if self.federated is not None else {}
+    
+    def _resolve_scope(self, corpora: Optional[List[str]] = None,
+                       filters: Optional[Dict] = None) -> Optional[SearchScope]:
+        """
+        Validate a requested corpus subset and chunk filter
+        
+        Returns:
+            The search scope, or None to search everything
+            
+        Raises:
+            ValueError: for unknown corpora or a subset outside multi-corpus mode,
+                        and for invalid filters
+        """
+        chunk_filter = ChunkFilter.from_dict(filters)
+        selected = None
+        if corpora:
+            if self.federated is None:
+                raise ValueError("Corpus selection needs multi-corpus mode (RAG_CORPORA)")
+            selected = tuple(sorted(set(corpora)))
+            self.federated.select(selected)
+            if len(selected) == len(self.federated.shards):
+                selected = None
+        if selected is None and chunk_filter is None:
+            return None
+        return SearchScope(selected, chunk_filter)
+    
+    @staticmethod
+    def _filtered_ids(generation: CorpusGeneration, chunk_filter: ChunkFilter) -> FilteredIds:
+        """The chunks a filter selects in a corpus generation (cached per filter)"""
+        selected = generation.filtered.get(chunk_filter)
+        if selected is None:
+            if len(generation.filtered) >= 64:
+                generation.filtered.clear()
+            selected = generation.filtered[chunk_filter] = FilteredIds(chunk_filter.mask(generation.chunks))
+        return selected
+    
+    def _attach_shared(self):
+        """Attach to the corpus published in shared memory (zero-copy)"""
+        if self._shared is None:
+            self._shared = SharedCorpus(self.shared_memory)
+        else:
+            self._shared.attach()
+        header = self._shared.header
+        
+        if header['embedding_model'] != self.model_name:
+            raise index_bundle.BundleError(
+                f"Shared corpus was built with '{header['embedding_model']}' but the engine uses '{self.model_name}'"
+            )
+        model_dimension = self.embedding_model.get_sentence_embedding_dimension()
+        if header['dimension'] != model_dimension:
+            raise index_bundle.BundleError(
+                f"Dimension mismatch: shared corpus {header['dimension']}, embedding model {model_dimension}"
+            )
+        
+        self._generation = CorpusGeneration(self._shared.index, self._shared.chunks, self._shared.bm25,
+                                            header['bundle_version'])
+        self.index_config = {'index_type': 'shared-flat'}
+        logger.info(f"Attached to shared corpus '{self.shared_memory}' generation {header['generation']} "
+                    f"(bundle {header['bundle_version']}, {len(self._shared.chunks)} document sections)")
+    
+    def _refresh_shared(self):
+        """
+        Switch to a newly published shared-memory generation or re-ingested corpora
+        
+        The new corpus is swapped in as one CorpusGeneration. Requests in flight
+        finish on the generation they pinned; the old segment is unmapped once
+        nothing references it.
+        """
+        if self.federated is not None and self.federated.is_stale():
+            with self._shared_lock:
+                if not self.federated.is_stale():
+                    return
+                try:
+                    self._reload_federated()
+                except Exception as e:
+                    logger.error(f"Could not reload the changed corpora, staying on {self.federated.version}: {e}")
+                    return
+                if self.answer_cache is not None:
+                    self.answer_cache.clear()
+            return
+        if self._shared is None or not self._shared.is_stale():
+            return
+        with self._shared_lock:
+            if not self._shared.is_stale():
+                return
+            try:
+                self._attach_shared()
+            except Exception as e:
+                logger.error(f"Could not attach to the new shared corpus, staying on "
+                             f"generation {self._shared.generation}: {e}")
+                return
+            if self.answer_cache is not None:
+                self.answer_cache.clear()
+    
+    def corpus_version(self) -> str:
+        """
+        Identifier of the corpus currently served
+        
+        The bundle version for bundles and shared-memory corpora (after switching
+        to a newly published generation), otherwise the size and modification
+        time of the index and chunks files.
+        """
+        self._refresh_shared()
+        return self._generation_version(self._generation)
+    
+    def _generation_version(self, generation: CorpusGeneration) -> str:
+        """Version of a corpus generation (file sizes and times for plain index files)"""
+        if generation.version is not None:
+            return generation.version
+        parts = []
+        for path in self._data_files():
+            st = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+        return "files:" + "|".join(parts)
+    
+    def _data_files(self) -> List[str]:
+        """Files whose change means the loaded corpus is stale"""
+        if self.federated is not None:
+            return self.federated.manifest_paths()
+        files = [self.index_path, self.chunks_path]
+        if self.bundle_manifest is not None:
+            files.append(index_bundle.manifest_path(self.bundle_path))
+        return files
+    
+    def _apply_index_config(self):
+        """Apply the search parameters recorded in the index build metadata"""
+        if self.index_config:
+            logger.info(f"Index type: {self.index_config.get('index_type', 'flat')} "
+                        f"{self.index_config.get('build_params', {})}")
+        
+        search_params = self.index_config.get('search_params', {})
+        if self.nprobe is None:
+            self.nprobe = search_params.get('nprobe')
+        if self.ef_search is None:
+            self.ef_search = search_params.get('efSearch')
+        self._configure_index()
+    
+    def _configure_index(self):
+        """Apply the runtime search parameters to the loaded index"""
+        if self.federated is not None:
+            self.federated.configure(self.nprobe, self.ef_search)
+            return
+        if not isinstance(self.index, faiss.Index):
+            return
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None and self.nprobe:
+            ivf.nprobe = int(self.nprobe)
+        if hasattr(self.index, 'hnsw') and self.ef_search:
+            self.index.hnsw.efSearch = int(self.ef_search)
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        Change the runtime search parameters of an approximate index
+        
+        Args:
+            nprobe: IVF lists probed per query (higher = better recall, slower)
+            ef_search: HNSW search depth (higher = better recall, slower)
+        """
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        self._configure_index()
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Create L2-normalized float32 query embeddings"""
+        query_embeddings = np.asarray(self.embedding_model.encode(queries), dtype='float32')
+        faiss.normalize_L2(query_embeddings)
+        return query_embeddings
+    
+    def _search_batch_by_embedding(self, query_embeddings: np.ndarray, k: int = 3,
+                                   questions: Optional[List[str]] = None,
+                                   scope: Optional[SearchScope] = None) -> List[List[Tuple[str, float]]]:
+        """Search for relevant document sections for several query embeddings in one FAISS call"""
+        generation = self._generation
+        return [self._sections(hits, generation)
+                for hits in self._search_batch_ids(query_embeddings, k, questions, scope, generation)]
+    
+    def _sections(self, hits: List[Tuple[int, float]],
+                  generation: Optional[CorpusGeneration] = None) -> List[Tuple[str, float]]:
+        """(chunk text, score) pairs of (chunk id, score) hits of a generation (default: the current one)"""
+        chunks = (generation or self._generation).chunks
+        return [(chunks[idx], score) for idx, score in hits]
+    
+    def _source_details(self, hits: List[Tuple[int, float]], generation: CorpusGeneration) -> List[Dict]:
+        """Provenance of each hit (chunk id, score, page range, chapter, section, part, document, corpus)"""
+        return [{'chunk_id': idx, 'score': score, **self._chunk_location(idx, generation)} for idx, score in hits]
+    
+    def _resolve_hits(self, hits: List[Tuple[int, float]],
+                      generation: CorpusGeneration) -> Tuple[List[Tuple[str, float]], List[Dict]]:
+        """Sections and source details of hits, read from the generation they were retrieved from"""
+        return self._sections(hits, generation), self._source_details(hits, generation)
+    
+    def _search_batch_ids(self, query_embeddings: np.ndarray, k: int = 3,
+                          questions: Optional[List[str]] = None,
+                          scope: Optional[SearchScope] = None,
+                          generation: Optional[CorpusGeneration] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Search for relevant chunk ids for several query embeddings in one FAISS call
+        
+        In hybrid mode (and when the question texts are given) the dense hits are
+        fused with BM25 hits using reciprocal-rank fusion. With a re-ranker, a
+        wider candidate set is retrieved and re-ordered by the cross-encoder
+        before the top k are kept. A scope restricts the search to a corpus
+        subset (multi-corpus mode) and/or the chunks matching a filter; the
+        filter is applied inside the FAISS and BM25 searches. Everything is
+        read from one corpus generation (default: the current one). Hybrid
+        questions with a decisive exact-token match take their BM25 hits and
+        skip the dense search (see _lexical_shortcut).
+        """
+        generation = generation or self._generation
+        if generation.index is None or not generation.chunks:
             raise ValueError("System not properly loaded")
         
-        # Create query embedding
-        query_embedding = self.embedding_model.encode([query])
-        faiss.normalize_L2(query_embedding)
+        hybrid = self.retrieval_mode == 'hybrid' and questions is not None
+        rerank = self.reranker is not None and questions is not None
+        k_candidates = max(k, self.rerank_candidates) if rerank else k
+        k_dense = max(k_candidates, self.hybrid_candidates) if hybrid else k_candidates
+        
+        batch_hits: List[Optional[List[Tuple[int, float]]]] = [
+            self._lexical_shortcut(generation, questions[row], query_embeddings[row], k, scope) if hybrid else None
+            for row in range(len(query_embeddings))
+        ]
+        dense_rows = [row for row, hits in enumerate(batch_hits) if hits is None]
+        if not dense_rows:
+            return batch_hits
         
         # Search FAISS index
-        scores, indices = self.index.search(query_embedding.astype('float32'), k)
+        scores, indices = self._index_search(generation, query_embeddings[dense_rows], k_dense, scope)
         
         # Extract results
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx != -1 and idx < len(self.chunks):
-                results.append((self.chunks[idx], float(score)))
+        num_chunks = len(generation.chunks)
+        for row, row_scores, row_indices in zip(dense_rows, scores, indices):
+            hits = [(int(idx), float(score)) for score, idx in zip(row_scores, row_indices)
+                    if idx != -1 and idx < num_chunks]
+            if hybrid:
+                hits = self._fuse_with_lexical(generation, questions[row], query_embeddings[row], hits,
+                                               k_candidates, scope)
+            batch_hits[row] = hits[:k_candidates]
+        
+        if rerank:
+            reranked = self._rerank(generation, [questions[row] for row in dense_rows],
+                                    [batch_hits[row] for row in dense_rows], k)
+            for row, hits in zip(dense_rows, reranked):
+                batch_hits[row] = hits
+        
+        return [hits[:k] for hits in batch_hits]
+    
+    def _index_search(self, generation: CorpusGeneration, query_embeddings: np.ndarray, k: int,
+                      scope: Optional[SearchScope] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Dense search, pre-filtered to the scope"""
+        if scope is None:
+            return generation.index.search(query_embeddings, k)
+        if generation.federated is not None:
+            return generation.index.search(query_embeddings, k, corpora=scope.corpora, chunk_filter=scope.filter)
+        return search_selected(generation.index, query_embeddings, k, self._filtered_ids(generation, scope.filter))
+    
+    def _bm25_search(self, generation: CorpusGeneration, question: str, k: int,
+                     scope: Optional[SearchScope] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Lexical search, pre-filtered to the scope"""
+        if scope is None:
+            return generation.bm25.search(question, k)
+        if generation.federated is not None:
+            return generation.bm25.search(question, k, corpora=scope.corpora, chunk_filter=scope.filter)
+        return generation.bm25.search(question, k, self._filtered_ids(generation, scope.filter).mask)
+    
+    def _fuse_with_lexical(self, generation: CorpusGeneration, question: str, query_embedding: np.ndarray,
+                           dense_hits: List[Tuple[int, float]], k: int,
+                           scope: Optional[SearchScope] = None) -> List[Tuple[int, float]]:
+        """
+        Fuse dense hits with BM25 hits (reciprocal-rank fusion)
+        
+        Fusion only decides the order; each returned hit keeps its cosine
+        similarity as score so confidence stays comparable with dense mode.
+        """
+        _, lexical_ids = self._bm25_search(generation, question, self.hybrid_candidates, scope)
+        fused = reciprocal_rank_fusion([[idx for idx, _ in dense_hits], lexical_ids.tolist()])[:k]
+        
+        dense_scores = dict(dense_hits)
+        missing = [idx for idx, _ in fused if idx not in dense_scores]
+        if missing:
+            dense_scores.update(self._cosine_scores(generation, query_embedding, missing))
+        return [(idx, dense_scores.get(idx, 0.0)) for idx, _ in fused]
+    
+    @staticmethod
+    def _cosine_scores(generation: CorpusGeneration, query_embedding: np.ndarray,
+                       ids: List[int]) -> Dict[int, float]:
+        """Cosine similarity of the query to specific chunks (empty if the index cannot reconstruct)"""
+        try:
+            vectors = generation.index.reconstruct_batch(np.asarray(ids, dtype='int64'))
+        except RuntimeError:
+            return {}
+        return {idx: float(score) for idx, score in zip(ids, vectors @ query_embedding)}
+    
+    def _get_rerank_executor(self) -> ThreadPoolExecutor:
+        """One thread per request thread, so a pass never waits behind another request's pass"""
+        if self._rerank_executor is None:
+            self._rerank_executor = ThreadPoolExecutor(max_workers=self.worker_threads,
+                                                       thread_name_prefix='rag-rerank')
+        return self._rerank_executor
+    
+    def _predict_rerank(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        try:
+            # Forward passes of at most rerank_max_pairs pairs
+            return self.reranker.predict(pairs, batch_size=self.rerank_max_pairs, show_progress_bar=False)
+        finally:
+            self._rerank_slots.release()
+    
+    def _rerank(self, generation: CorpusGeneration, questions: List[str],
+                batch_hits: List[List[Tuple[int, float]]], k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Re-order candidate hits by cross-encoder relevance
+        
+        Each question re-ranks its share of rerank_max_pairs top candidates, but
+        never fewer than the k hits it returns, and keeps the rest after them in
+        retrieval order. The (question, chunk) pairs are scored in forward
+        passes of at most rerank_max_pairs, so a large batch of questions takes
+        several passes, with rerank_budget_ms for each. A pass cannot be
+        cancelled once running, so one that overruns the budget keeps its
+        thread until it ends; when every re-rank thread is still busy,
+        re-ranking is skipped rather than queued. If it is skipped, overruns or
+        fails, the incoming order is returned unchanged. Hits keep their cosine
+        similarity as score so confidence stays comparable.
+        """
+        per_question = max(k, self.rerank_max_pairs // max(1, len(questions)))
+        pairs = [(question, generation.chunks[idx]) for question, hits in zip(questions, batch_hits)
+                 for idx, _ in hits[:per_question]]
+        if not pairs:
+            return batch_hits
+        
+        if not self._rerank_slots.acquire(blocking=False):
+            logger.warning("All re-rank threads are busy; using retrieval order")
+            return batch_hits
+        try:
+            future = self._get_rerank_executor().submit(self._predict_rerank, pairs)
+        except Exception:
+            self._rerank_slots.release()
+            raise
+        passes = -(-len(pairs) // self.rerank_max_pairs)
+        try:
+            rerank_scores = future.result(timeout=passes * self.rerank_budget_ms / 1000.0)
+        except FutureTimeoutError:
+            if future.cancel():
+                self._rerank_slots.release()
+            logger.warning(f"Re-ranking {len(pairs)} candidates exceeded {passes * self.rerank_budget_ms:.0f} ms; "
+                           f"using retrieval order")
+            return batch_hits
+        except Exception as e:
+            logger.error(f"Re-ranking failed, using retrieval order: {e}")
+            return batch_hits
+        
+        reranked = []
+        offset = 0
+        for hits in batch_hits:
+            head = hits[:per_question]
+            row_scores = np.asarray(rerank_scores[offset:offset + len(head)])
+            offset += len(head)
+            order = np.argsort(-row_scores, kind='stable')
+            reranked.append([head[j] for j in order] + hits[per_question:])
+        return reranked
+    
+    def _lexical_shortcut(self, generation: CorpusGeneration, question: str, query_embedding: np.ndarray,
+                          k: int, scope: Optional[SearchScope] = None) -> Optional[List[Tuple[int, float]]]:
+        """
+        Return the top k BM25 hits in place of dense search when the lexical match is decisive
+        
+        Decisive means the question contains an exact numeric token (a section
+        or form number) that also occurs in the top lexical hit, and that hit
+        scores at least lexical_decisive_ratio times the runner-up. Hits keep
+        the BM25 order but are scored by cosine similarity, like dense hits, so
+        confidence, routing and adaptive-k treat them the same.
+        
+        Returns:
+            The hits, or None to fall back to dense search (also when the index
+            cannot reconstruct vectors for the cosine scores)
+        """
+        numbers = {token for token in tokenize(question) if token.isdigit()}
+        if self.retrieval_mode != 'hybrid' or self.lexical_decisive_ratio <= 0 or not numbers:
+            return None
+        
+        scores, ids = self._bm25_search(generation, question, max(k, 2), scope)
+        if len(ids) == 0 or not numbers.intersection(tokenize(generation.chunks[int(ids[0])])):
+            return None
+        if len(ids) > 1 and scores[0] < self.lexical_decisive_ratio * scores[1]:
+            return None
+        
+        ids = [int(idx) for idx in ids[:k]]
+        cosine = self._cosine_scores(generation, query_embedding, ids)
+        if len(cosine) < len(ids):
+            return None
+        return [(idx, cosine[idx]) for idx in ids]
+    
+    def _search_by_embedding(self, query_embedding: np.ndarray, k: int = 3,
+                             question: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Search for relevant document sections with a precomputed query embedding"""
+        questions = [question] if question is not None else None
+        return self._search_batch_by_embedding(query_embedding.reshape(1, -1), k, questions)[0]
+    
+    def _search_relevant_sections(self, query: str, k: int = 3,
+                                  filters: Optional[Dict] = None) -> List[Tuple[str, float]]:
+        """
+        Search for relevant document sections
+        
+        Args:
+            query: Search text
+            k: Number of sections
+            filters: Optional chunk filter, e.g. {'chapter': 'XXV'} or {'part': 'rules'}
+                     (see chunk_filter.ChunkFilter)
+        """
+        generation = self._generation
+        if generation.index is None or not generation.chunks:
+            raise ValueError("System not properly loaded")
+        scope = self._resolve_scope(filters=filters)
+        
+        # Create query embedding
+        query_embedding = self._encode_queries([query])
+        hits = self._search_batch_ids(query_embedding, k, [query], scope, generation)[0]
+        return self._sections(hits, generation)
+    
+    def _retrieve(self, question: str, num_sources: int,
+                  scope: Optional[SearchScope] = None) -> Tuple[Optional[Dict], Optional[np.ndarray],
+                                                                List[Tuple[int, float]], CorpusGeneration]:
+        """
+        Cache lookups and retrieval shared by the query paths
+        
+        Returns:
+            (cached answer or None, query embedding or None, relevant (chunk id, score) hits,
+            the corpus generation the hits belong to)
+        """
+        self._refresh_shared()
+        try:
+            return self._retrieve_from(self._generation, question, num_sources, scope)
+        except CorpusReplacedError as e:
+            # Pinned to a superseded generation whose old bundle is gone; start over on the new one
+            logger.info(f"Retrying retrieval on the current corpus: {e}")
+            self._refresh_shared()
+            return self._retrieve_from(self._generation, question, num_sources, scope)
+    
+    def _retrieve_from(self, generation: CorpusGeneration, question: str, num_sources: int,
+                       scope: Optional[SearchScope] = None) -> Tuple[Optional[Dict], Optional[np.ndarray],
+                                                                     List[Tuple[int, float]], CorpusGeneration]:
+        """_retrieve on one corpus generation"""
+        # Exact-match cache lookup (no model calls)
+        cached = self._cache_lookup_exact(question, num_sources, scope)
+        if cached is not None:
+            return cached, None, [], generation
+        
+        # Embed once for the semantic cache and the search, batched with
+        # concurrent callers when coalescing is on
+        if self._coalescer is not None:
+            return self._coalescer.submit((question, num_sources, scope, generation))
+        return self._encode_and_search([(question, num_sources, scope, generation)])[0]
+    
+    def _encode_and_search(self, requests: List[Tuple[str, int, Optional[SearchScope], CorpusGeneration]]
+                           ) -> List[Tuple[Optional[Dict], np.ndarray, List[Tuple[int, float]], CorpusGeneration]]:
+        """
+        Embed several questions with one encode call and search them with one search call
+        
+        Questions answered by the semantic cache are not searched. Requests with
+        different scopes (corpus subsets, filters) or pinned to different corpus
+        generations are searched separately.
+        
+        Args:
+            requests: (question, num_sources, scope, corpus generation) tuples
+            
+        Returns:
+            (cached answer or None, query embedding, relevant (chunk id, score) hits,
+            corpus generation) per request
+        """
+        query_embeddings = self._encode_queries([request[0] for request in requests])
+        
+        results = [None] * len(requests)
+        to_search: Dict[Tuple[Optional[SearchScope], CorpusGeneration], List[int]] = {}
+        for row, (_, num_sources, scope, generation) in enumerate(requests):
+            cached = self._cache_lookup_similar(query_embeddings[row], num_sources, scope)
+            if cached is not None:
+                results[row] = (cached, query_embeddings[row], [], generation)
+            else:
+                to_search.setdefault((scope, generation), []).append(row)
+        
+        for (scope, generation), rows in to_search.items():
+            # Search once with the largest k; each request keeps its own top k
+            k = max(self._retrieval_k(requests[row][1]) for row in rows)
+            batch_hits = self._search_batch_ids(
+                query_embeddings[rows], k=k, questions=[requests[row][0] for row in rows], scope=scope,
+                generation=generation
+            )
+            for row, hits in zip(rows, batch_hits):
+                hits = hits[:self._retrieval_k(requests[row][1])]
+                if self.adaptive_k:
+                    hits = self._adaptive_cut(hits)
+                results[row] = (None, query_embeddings[row], hits, generation)
         
         return results
     
-    def _generate_answer(self, query: str, context: str) -> str:
-        """Generate answer using Groq API"""
+    def _retrieval_k(self, num_sources: int) -> int:
+        """Number of sections to retrieve for a request of num_sources"""
+        return max(num_sources, self.adaptive_max_sources) if self.adaptive_k else num_sources
+    
+    def _adaptive_cut(self, hits: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """
+        Keep the hits that are relevant enough to be worth sending to the LLM
+        
+        A hit is kept if its score is at least adaptive_min_score and at
+        least adaptive_relative_cutoff times the best score. Order is preserved
+        (it may come from the re-ranker rather than the scores).
+        """
+        if not hits:
+            return hits
+        top_score = max(score for _, score in hits)
+        cutoff = max(self.adaptive_min_score, top_score * self.adaptive_relative_cutoff)
+        kept = [(idx, score) for idx, score in hits if score >= cutoff]
+        if not kept:
+            logger.info(f"No section scores above {self.adaptive_min_score} (top {top_score:.3f}); "
+                        f"skipping answer generation")
+        return kept
+    
+    def _prepare_context(self, question: str, query_embedding: Optional[np.ndarray],
+                         relevant_sections: List[Tuple[str, float]]) -> str:
+        """Compress the retrieved sections (if enabled) and pack them into the prompt context"""
+        if self.compressor is not None:
+            relevant_sections = self.compressor.compress(question, query_embedding, relevant_sections)
+        return self.context_builder.build(relevant_sections)
+    
+    def _build_messages(self, query: str, context: str) -> List[Dict[str, str]]:
+        """Build the chat messages sent to the Groq API"""
         system_prompt = """You are a helpful assistant that explains Kerala Panchayat rules and procedures in simple, easy-to-understand language.
 
 Your guidelines:
@@ -164,30 +1188,127 @@ Please provide a helpful answer that:
 
 ANSWER:"""
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _generate_answer(self, query: str, context: str, model: Optional[str] = None) -> str:
+        """Generate answer using Groq API"""
         try:
-            chat_completion = self.groq_client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                model="llama3-70b-8192",
-                temperature=0.3,
-                max_tokens=800,
-            )
+            return self.llm.complete(self._build_messages(query, context), model=model)
             
-            return chat_completion.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            raise
+    
+    def _generate_answer_stream(self, query: str, context: str,
+                                model: Optional[str] = None) -> Iterator[str]:
+        """Generate answer using Groq API, yielding text deltas as they arrive"""
+        try:
+            yield from self.llm.stream(self._build_messages(query, context), model=model)
+            
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            raise
+    
+    async def _agenerate_answer(self, query: str, context: str, model: Optional[str] = None) -> str:
+        """Generate answer using the async Groq API"""
+        try:
+            return await self.llm.acomplete(self._build_messages(query, context), model=model)
             
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
             raise
     
-    def query(self, question: str, num_sources: int = 3) -> QueryResponse:
+    def _get_embedding_executor(self) -> ThreadPoolExecutor:
+        """Thread pool running CPU-bound embedding and search off the event loop"""
+        if self._embedding_executor is None:
+            self._embedding_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('RAG_EMBEDDING_THREADS', '2')),
+                thread_name_prefix='rag-embed'
+            )
+        return self._embedding_executor
+    
+    @staticmethod
+    def _cache_entry_matches(cached: Optional[Dict], num_sources: int,
+                             scope: Optional[SearchScope]) -> bool:
+        """Whether a cache entry was generated for the same number of sources and scope"""
+        return (cached is not None and cached.get('num_sources_requested') == num_sources
+                and cached.get('scope') == (scope.as_dict() if scope is not None else None))
+    
+    def _cache_lookup_exact(self, question: str, num_sources: int,
+                            scope: Optional[SearchScope] = None) -> Optional[Dict]:
+        """Exact normalized-text cache lookup"""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.get_exact(
+            question, lambda cached: self._cache_entry_matches(cached, num_sources, scope)
+        )
+    
+    def _cache_lookup_similar(self, query_embedding: np.ndarray, num_sources: int,
+                              scope: Optional[SearchScope] = None) -> Optional[Dict]:
+        """Semantic near-duplicate cache lookup"""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.get_similar(
+            query_embedding, lambda cached: self._cache_entry_matches(cached, num_sources, scope)
+        )
+    
+    def _cache_store(self, question: str, query_embedding: Optional[np.ndarray], num_sources: int,
+                     answer: str, sources: List[str], confidence: float, model_used: Optional[str] = None,
+                     scope: Optional[SearchScope] = None, source_details: Optional[List[Dict]] = None):
+        """Store a generated answer in the cache"""
+        if self.answer_cache is None:
+            return
+        self.answer_cache.put(question, query_embedding, {
+            'answer': answer,
+            'sources': sources,
+            'source_details': source_details or [],
+            'confidence': confidence,
+            'num_sources': len(sources),
+            'num_sources_requested': num_sources,
+            'model_used': model_used,
+            'scope': scope.as_dict() if scope is not None else None
+        })
+    
+    def _cached_response(self, cached: Dict, start_time: float) -> QueryResponse:
+        """Build a QueryResponse from a cache entry"""
+        return QueryResponse(
+            answer=cached['answer'],
+            sources=cached['sources'],
+            confidence=cached['confidence'],
+            response_time=time.time() - start_time,
+            num_sources=cached['num_sources'],
+            success=True,
+            cached=True,
+            model_used=cached.get('model_used'),
+            source_details=cached.get('source_details', [])
+        )
+    
+    def cache_stats(self) -> Dict:
+        """Answer cache hit/miss counters (empty if the cache is disabled)"""
+        return self.answer_cache.stats() if self.answer_cache is not None else {}
+    
+    def llm_stats(self) -> Dict:
+        """LLM call, retry and hedging counters plus the model routing counts"""
+        return {**self.llm.stats(), 'routing': self.router.stats()}
+    
+    def coalescer_stats(self) -> Dict:
+        """Micro-batching counters (empty if coalescing is disabled)"""
+        return self._coalescer.stats() if self._coalescer is not None else {}
+    
+    def query(self, question: str, num_sources: int = 3,
+              corpora: Optional[List[str]] = None, filters: Optional[Dict] = None) -> QueryResponse:
         """
         Main function to query the RAG system
         
         Args:
             question: User's question
             num_sources: Number of relevant sources to retrieve
+            corpora: Corpora to search in multi-corpus mode (None searches all)
+            filters: Restrict retrieval to matching chunks, e.g. {'chapter': 'XXV'} or
+                     {'part': 'rules'} (see chunk_filter.ChunkFilter)
             
         Returns:
             QueryResponse object with answer and metadata
@@ -207,104 +1328,670 @@ ANSWER:"""
                     error_message="Empty question provided"
                 )
             
-            # Search for relevant sections
-            relevant_sections = self._search_relevant_sections(question, k=num_sources)
+            scope = self._resolve_scope(corpora, filters)
+            cached, query_embedding, hits, generation = self._retrieve(question, num_sources, scope)
+            if cached is not None:
+                return self._cached_response(cached, start_time)
+            
+            return self._answer_from_hits(question, query_embedding, hits, generation,
+                                          num_sources, start_time, scope)
             
-            if not relevant_sections:
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            return self._error_response(e, start_time)
+    
+    def _answer_from_hits(self, question: str, query_embedding: Optional[np.ndarray],
+                          hits: List[Tuple[int, float]], generation: CorpusGeneration,
+                          num_sources: int, start_time: float,
+                          scope: Optional[SearchScope] = None) -> QueryResponse:
+        """Generate the answer for already retrieved hits and cache it"""
+        if not hits:
+            return self._no_results_response(start_time)
+        relevant_sections, source_details = self._resolve_hits(hits, generation)
+        
+        # Prepare context
+        context = self._prepare_context(question, query_embedding, relevant_sections)
+        
+        # Generate answer
+        decision = self._route(question, relevant_sections)
+        answer = self._generate_answer(question, context, decision.model)
+        
+        return self._build_response(question, query_embedding, relevant_sections, source_details,
+                                    num_sources, answer, start_time, decision.model, scope)
+    
+    def _no_results_response(self, start_time: float) -> QueryResponse:
+        """Build the QueryResponse returned when no relevant sections are found"""
+        return QueryResponse(
+            answer="I couldn't find information about this topic in the Kerala Panchayat documents. Could you try asking in a different way?",
+            sources=[],
+            confidence=0.0,
+            response_time=time.time() - start_time,
+            num_sources=0,
+            success=True
+        )
+    
+    def _build_response(self, question: str, query_embedding: Optional[np.ndarray],
+                        relevant_sections: List[Tuple[str, float]], source_details: List[Dict],
+                        num_sources: int, answer: str, start_time: float, model_used: Optional[str] = None,
+                        scope: Optional[SearchScope] = None) -> QueryResponse:
+        """Build the QueryResponse for a generated answer and cache it"""
+        # Calculate metrics
+        confidence = sum(score for _, score in relevant_sections) / len(relevant_sections)
+        sources = [section[:200] + "..." if len(section) > 200 else section 
+                  for section, _ in relevant_sections]
+        
+        self._cache_store(question, query_embedding, num_sources, answer, sources, confidence,
+                          model_used, scope, source_details)
+        
+        return QueryResponse(
+            answer=answer,
+            sources=sources,
+            confidence=confidence,
+            response_time=time.time() - start_time,
+            num_sources=len(relevant_sections),
+            success=True,
+            model_used=model_used,
+            source_details=source_details
+        )
+    
+    def _error_response(self, error: Exception, start_time: float) -> QueryResponse:
+        """Build the QueryResponse returned when processing a question fails"""
+        return QueryResponse(
+            answer="Sorry, I encountered an error while processing your question. Please try again.",
+            sources=[],
+            confidence=0.0,
+            response_time=time.time() - start_time,
+            num_sources=0,
+            success=False,
+            error_message=str(error)
+        )
+    
+    def query_batch(self, questions: List[str], num_sources: int = 3,
+                    max_concurrency: Optional[int] = None,
+                    corpora: Optional[List[str]] = None,
+                    filters: Optional[Dict] = None) -> List[QueryResponse]:
+        """
+        Answer several questions at once
+        
+        All questions that miss the answer cache are embedded with a single
+        encode call and searched with a single FAISS call; answer generation
+        then runs with bounded concurrency.
+        
+        Args:
+            questions: List of questions
+            num_sources: Number of relevant sources to retrieve per question
+            max_concurrency: Maximum parallel LLM calls (if None, reads RAG_BATCH_CONCURRENCY, default 4)
+            corpora: Corpora to search in multi-corpus mode (None searches all)
+            filters: Restrict retrieval to matching chunks, e.g. {'chapter': 'XXV'} or
+                     {'part': 'rules'} (see chunk_filter.ChunkFilter)
+            
+        Returns:
+            List of QueryResponse objects in input order. A failure affects only
+            its own item, which is returned with success=False.
+        """
+        start_time = time.time()
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('RAG_BATCH_CONCURRENCY', '4'))
+        
+        try:
+            scope = self._resolve_scope(corpora, filters)
+        except ValueError as e:
+            return [self._error_response(e, start_time) for _ in questions]
+        
+        self._refresh_shared()
+        generation = self._generation
+        responses: List[Optional[QueryResponse]] = [None] * len(questions)
+        pending = []      # Questions that still need embedding and search
+        to_answer = []    # (question index, query embedding, relevant hits)
+        
+        # Validate input and serve exact cache hits
+        for i, question in enumerate(questions):
+            if not question or not question.strip():
+                responses[i] = QueryResponse(
+                    answer="Please provide a valid question.",
+                    sources=[],
+                    confidence=0.0,
+                    response_time=time.time() - start_time,
+                    num_sources=0,
+                    success=False,
+                    error_message="Empty question provided"
+                )
+                continue
+            
+            try:
+                cached = self._cache_lookup_exact(question, num_sources, scope)
+            except Exception as e:
+                logger.error(f"Error processing batch query {i}: {e}")
+                responses[i] = self._error_response(e, start_time)
+                continue
+            
+            if cached is not None:
+                responses[i] = self._cached_response(cached, start_time)
+            else:
+                pending.append(i)
+        
+        # Embed and search all remaining questions in one go
+        if pending:
+            try:
+                retrieved = self._encode_and_search([(questions[i], num_sources, scope, generation)
+                                                     for i in pending])
+                for i, (cached, query_embedding, hits, _) in zip(pending, retrieved):
+                    if cached is not None:
+                        responses[i] = self._cached_response(cached, start_time)
+                    else:
+                        to_answer.append((i, query_embedding, hits))
+                    
+            except Exception as e:
+                logger.error(f"Error processing batch retrieval: {e}")
+                for i in pending:
+                    if responses[i] is None:
+                        responses[i] = self._error_response(e, start_time)
+        
+        # Generate answers with bounded concurrency
+        def answer_one(i: int, query_embedding: Optional[np.ndarray],
+                       hits: List[Tuple[int, float]]) -> QueryResponse:
+            try:
+                return self._answer_from_hits(questions[i], query_embedding, hits, generation,
+                                              num_sources, start_time, scope)
+            except Exception as e:
+                logger.error(f"Error processing batch query {i}: {e}")
+                return self._error_response(e, start_time)
+        
+        if to_answer:
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+                futures = [(i, executor.submit(answer_one, i, embedding, hits))
+                           for i, embedding, hits in to_answer]
+                for i, future in futures:
+                    responses[i] = future.result()
+        
+        return responses
+
+    async def aquery(self, question: str, num_sources: int = 3,
+                     corpora: Optional[List[str]] = None, filters: Optional[Dict] = None) -> QueryResponse:
+        """
+        Async variant of query()
+        
+        Embedding, FAISS search and the answer cache write run in a thread pool
+        and the LLM call uses the async Groq client, so a single event loop can
+        overlap many in-flight questions.
+        
+        Args:
+            question: User's question
+            num_sources: Number of relevant sources to retrieve
+            corpora: Corpora to search in multi-corpus mode (None searches all)
+            filters: Restrict retrieval to matching chunks, e.g. {'chapter': 'XXV'} or
+                     {'part': 'rules'} (see chunk_filter.ChunkFilter)
+            
+        Returns:
+            QueryResponse object with answer and metadata
+        """
+        start_time = time.time()
+        
+        try:
+            # Validate input
+            if not question or not question.strip():
                 return QueryResponse(
-                    answer="I couldn't find information about this topic in the Kerala Panchayat documents. Could you try asking in a different way?",
+                    answer="Please provide a valid question.",
                     sources=[],
                     confidence=0.0,
                     response_time=time.time() - start_time,
                     num_sources=0,
-                    success=True
+                    success=False,
+                    error_message="Empty question provided"
                 )
             
-            # Prepare context
-            context = "\n\n".join([section for section, _ in relevant_sections])
+            scope = self._resolve_scope(corpora, filters)
+            loop = asyncio.get_running_loop()
+            cached, query_embedding, hits, generation = await loop.run_in_executor(
+                self._get_embedding_executor(), self._retrieve, question, num_sources, scope
+            )
+            if cached is not None:
+                return self._cached_response(cached, start_time)
+            
+            if not hits:
+                return self._no_results_response(start_time)
+            relevant_sections, source_details = self._resolve_hits(hits, generation)
+            
+            context = await loop.run_in_executor(
+                self._get_embedding_executor(), self._prepare_context,
+                question, query_embedding, relevant_sections
+            )
+            decision = self._route(question, relevant_sections)
+            answer = await self._agenerate_answer(question, context, decision.model)
+            
+            # Building the response writes the answer cache (SQLite), so keep it off the loop
+            return await loop.run_in_executor(
+                self._get_embedding_executor(), self._build_response,
+                question, query_embedding, relevant_sections, source_details,
+                num_sources, answer, start_time, decision.model, scope
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            return self._error_response(e, start_time)
+
+    def query_stream(self, question: str, num_sources: int = 3,
+                     corpora: Optional[List[str]] = None, filters: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Streaming variant of query()
+        
+        Yields events as soon as they are available, so callers can show the
+        sources before the LLM has produced its first token:
+        
+        - {'type': 'sources', 'sources': [...], 'source_details': [...], 'confidence': float,
+          'num_sources': int}
+        - {'type': 'delta', 'content': str}  (one per answer token batch)
+        - {'type': 'done', 'answer': str, 'response_time': float, 'success': bool, 'model_used': str}
+        - {'type': 'error', 'answer': str, 'error_message': str}
+        
+        Args:
+            question: User's question
+            num_sources: Number of relevant sources to retrieve
+            corpora: Corpora to search in multi-corpus mode (None searches all)
+            filters: Restrict retrieval to matching chunks, e.g. {'chapter': 'XXV'} or
+                     {'part': 'rules'} (see chunk_filter.ChunkFilter)
+        """
+        start_time = time.time()
+        
+        if not question or not question.strip():
+            yield {
+                'type': 'error',
+                'answer': "Please provide a valid question.",
+                'error_message': "Empty question provided"
+            }
+            return
+        
+        answer_parts = []
+        try:
+            scope = self._resolve_scope(corpora, filters)
+            cached, query_embedding, hits, generation = self._retrieve(question, num_sources, scope)
+            
+            if cached is not None:
+                yield {
+                    'type': 'sources',
+                    'sources': cached['sources'],
+                    'source_details': cached.get('source_details', []),
+                    'confidence': cached['confidence'],
+                    'num_sources': cached['num_sources']
+                }
+                yield {'type': 'delta', 'content': cached['answer']}
+                yield {
+                    'type': 'done',
+                    'answer': cached['answer'],
+                    'response_time': time.time() - start_time,
+                    'success': True,
+                    'cached': True,
+                    'model_used': cached.get('model_used')
+                }
+                return
             
-            # Generate answer
-            answer = self._generate_answer(question, context)
+            if not hits:
+                answer = "I couldn't find information about this topic in the Kerala Panchayat documents. Could you try asking in a different way?"
+                yield {'type': 'sources', 'sources': [], 'source_details': [], 'confidence': 0.0, 'num_sources': 0}
+                yield {'type': 'delta', 'content': answer}
+                yield {
+                    'type': 'done',
+                    'answer': answer,
+                    'response_time': time.time() - start_time,
+                    'success': True
+                }
+                return
             
-            # Calculate metrics
+            relevant_sections, source_details = self._resolve_hits(hits, generation)
             confidence = sum(score for _, score in relevant_sections) / len(relevant_sections)
             sources = [section[:200] + "..." if len(section) > 200 else section 
                       for section, _ in relevant_sections]
+            yield {
+                'type': 'sources',
+                'sources': sources,
+                'source_details': source_details,
+                'confidence': confidence,
+                'num_sources': len(relevant_sections)
+            }
             
-            return QueryResponse(
-                answer=answer,
-                sources=sources,
-                confidence=confidence,
-                response_time=time.time() - start_time,
-                num_sources=len(relevant_sections),
-                success=True
-            )
+            # Stream the answer
+            context = self._prepare_context(question, query_embedding, relevant_sections)
+            decision = self._route(question, relevant_sections)
+            for delta in self._generate_answer_stream(question, context, decision.model):
+                answer_parts.append(delta)
+                yield {'type': 'delta', 'content': delta}
+            
+            answer = "".join(answer_parts)
+            self._cache_store(question, query_embedding, num_sources, answer, sources, confidence,
+                              decision.model, scope, source_details)
+            
+            yield {
+                'type': 'done',
+                'answer': answer,
+                'response_time': time.time() - start_time,
+                'success': True,
+                'model_used': decision.model
+            }
             
         except Exception as e:
-            logger.error(f"Error processing query: {e}")
-            return QueryResponse(
-                answer="Sorry, I encountered an error while processing your question. Please try again.",
-                sources=[],
-                confidence=0.0,
-                response_time=time.time() - start_time,
-                num_sources=0,
-                success=False,
-                error_message=str(e)
-            )
+            logger.error(f"Error processing streaming query: {e}")
+            yield {
+                'type': 'error',
+                'answer': "".join(answer_parts) or "Sorry, I encountered an error while processing your question. Please try again.",
+                'error_message': str(e)
+            }
+
+    def search(self, query: Optional[str] = None, page_size: int = 10,
+               cursor: Optional[str] = None, corpora: Optional[List[str]] = None,
+               filters: Optional[Dict] = None) -> Dict:
+        """
+        Retrieval-only search; never calls the LLM
+        
+        The first call embeds the query once and ranks up to RAG_SEARCH_MAX_RESULTS
+        chunks (default 50). Later pages are served from the cursor, which carries
+        the remaining ranked chunk ids, so no embedding or search is repeated and
+        any worker can serve any page.
+        
+        Args:
+            query: Search text (ignored when cursor is given)
+            page_size: Results per page
+            cursor: next_cursor of the previous page
+            corpora: Corpora to search in multi-corpus mode (None searches all; ignored
+                     when cursor is given)
+            filters: Restrict the search to matching chunks (see chunk_filter.ChunkFilter;
+                     ignored when cursor is given)
+            
+        Returns:
+            Dictionary with:
+            - results: [{'rank', 'chunk_id', 'score', 'text', 'page_start', 'page_end',
+              'char_start', 'char_end', 'heading', 'chapter', 'section', 'part', 'document',
+              'corpus'}] (location fields are None for legacy chunk files without metadata,
+              corpus outside multi-corpus mode)
+            - total: Number of ranked chunks
+            - next_cursor: Cursor of the next page, or None on the last page
+            
+        Raises:
+            ValueError: if neither query nor a valid cursor for the current corpus is given
+        """
+        page_size = max(1, page_size)
+        self._refresh_shared()
+        generation = self._generation
+        if cursor:
+            hits, offset = self._decode_cursor(cursor, generation)
+        else:
+            if not query or not query.strip():
+                raise ValueError("Empty query provided")
+            scope = self._resolve_scope(corpora, filters)
+            max_results = int(os.getenv('RAG_SEARCH_MAX_RESULTS', '50'))
+            query_embedding = self._encode_queries([query])
+            hits = self._search_batch_ids(query_embedding, max_results, [query], scope, generation)[0]
+            offset = 0
+        
+        results = []
+        for rank, (idx, score) in enumerate(hits[offset:offset + page_size], offset + 1):
+            meta = self._chunk_location(idx, generation)
+            results.append({'rank': rank, 'chunk_id': idx, 'score': score,
+                            'text': clean_chunk(generation.chunks[idx]), **meta})
+        
+        next_offset = offset + page_size
+        return {
+            'results': results,
+            'total': len(hits),
+            'next_cursor': self._encode_cursor(hits, next_offset, generation) if next_offset < len(hits) else None
+        }
+    
+    @staticmethod
+    def _chunk_location(idx: int, generation: CorpusGeneration) -> Dict:
+        """Page, character offsets, heading and chapter/section/part of a chunk (None where unknown)"""
+        chunks = generation.chunks
+        meta = chunks.metadata(idx) if hasattr(chunks, 'metadata') else {}
+        location = {}
+        for name in ('page_start', 'page_end', 'char_start', 'char_end'):
+            value = meta.get(name)
+            location[name] = value if value is not None and value >= 0 else None
+        for name in ('heading', 'chapter', 'section', 'part'):
+            location[name] = meta.get(name) or None
+        location['document'] = meta.get('document')
+        location['corpus'] = meta.get('corpus')
+        return location
+    
+    def _cursor_corpus_tag(self, generation: CorpusGeneration) -> str:
+        return hashlib.sha256(self._generation_version(generation).encode('utf-8')).hexdigest()[:12]
+    
+    def _encode_cursor(self, hits: List[Tuple[int, float]], offset: int, generation: CorpusGeneration) -> str:
+        """Opaque cursor holding the ranked hits, the next offset and the corpus they belong to"""
+        payload = {
+            'c': self._cursor_corpus_tag(generation),
+            'o': offset,
+            'h': [[idx, round(score, 5)] for idx, score in hits]
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+    
+    def _decode_cursor(self, cursor: str, generation: CorpusGeneration) -> Tuple[List[Tuple[int, float]], int]:
+        """Ranked hits and offset from a cursor, rejecting cursors from another corpus"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            hits = [(int(idx), float(score)) for idx, score in payload['h']]
+            offset = int(payload['o'])
+            corpus_tag = payload['c']
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid cursor")
+        if corpus_tag != self._cursor_corpus_tag(generation):
+            raise ValueError("Cursor belongs to an older version of the documents; search again")
+        if offset < 0 or any(not 0 <= idx < len(generation.chunks) for idx, _ in hits):
+            raise ValueError("Invalid cursor")
+        return hits, offset
 
 # Global instance for production use
 _rag_instance = None
+_rag_lock = threading.Lock()
+_warm_up_state = {'status': 'idle', 'seconds': None, 'error': None}
+# Set in a forked child whose parent was warming up; see _after_fork_in_child
+_warm_up_restart_pending = False
+_warm_up_lock = threading.Lock()
 
 def get_rag_instance() -> KeralaPanchayatRAG:
-    """Get or create RAG instance (singleton pattern)"""
+    """Get or create RAG instance (thread-safe singleton)"""
     global _rag_instance
     if _rag_instance is None:
-        _rag_instance = KeralaPanchayatRAG()
+        with _rag_lock:
+            if _rag_instance is None:
+                _rag_instance = KeralaPanchayatRAG()
     return _rag_instance
 
-def ask_kerala_panchayat(question: str, num_sources: int = 3) -> Dict:
+def warm_up_rag_instance() -> Dict:
+    """
+    Load the RAG instance and warm it up (blocking)
+    
+    Call it before the WSGI server forks its workers (e.g. gunicorn --preload)
+    so every worker shares the loaded engine copy-on-write.
+    
+    Returns:
+        The readiness status (see rag_status)
+    """
+    _warm_up_state.update(status='warming', error=None)
+    try:
+        seconds = get_rag_instance().warm_up()
+        _warm_up_state.update(status='ready', seconds=seconds)
+    except Exception as e:
+        logger.error(f"RAG warm-up failed: {e}")
+        _warm_up_state.update(status='failed', error=str(e))
+    return rag_status()
+
+def start_warm_up_thread() -> threading.Thread:
+    """Warm up the RAG instance in a background thread"""
+    _warm_up_state.update(status='warming', error=None)
+    thread = threading.Thread(target=warm_up_rag_instance, name='rag-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def rag_status() -> Dict:
+    """
+    Readiness of the RAG instance
+    
+    Returns:
+        Dictionary with ready (engine loaded and not warming up), status
+        ('idle', 'warming', 'ready' or 'failed'), seconds and error
+    """
+    if _warm_up_restart_pending:
+        _restart_pending_warm_up()
+    return {
+        'ready': _rag_instance is not None and _warm_up_state['status'] != 'warming',
+        **_warm_up_state
+    }
+
+def _restart_pending_warm_up():
+    """Start the warm-up a forked child inherited as 'warming', once"""
+    global _warm_up_restart_pending
+    with _warm_up_lock:
+        if not _warm_up_restart_pending:
+            return
+        _warm_up_restart_pending = False
+    start_warm_up_thread()
+
+def _after_fork_in_child():
+    """Make the inherited engine safe to use in a forked worker"""
+    global _rag_lock, _warm_up_lock, _warm_up_restart_pending
+    _rag_lock = threading.Lock()
+    _warm_up_lock = threading.Lock()
+    if _rag_instance is not None:
+        _rag_instance._reset_after_fork()
+    if _warm_up_state['status'] == 'warming':
+        # The parent's warm-up thread does not exist in this process. It is restarted
+        # on the first readiness check, so only server workers (which check readiness
+        # on every chat request and /api/ready probe) warm up, not every forked child
+        _warm_up_restart_pending = True
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def ask_kerala_panchayat(question: str, num_sources: int = 3,
+                         corpora: Optional[List[str]] = None, filters: Optional[Dict] = None) -> Dict:
     """
     Simple function to ask questions about Kerala Panchayat
     
     Args:
         question: User's question
         num_sources: Number of relevant sources to retrieve (default: 3)
+        corpora: Corpora to search in multi-corpus mode (default: all)
+        filters: Chunk filter, e.g. {'chapter': 'XXV'} (default: none)
         
     Returns:
         Dictionary containing:
         - answer: The generated answer
         - sources: List of relevant source texts
+        - source_details: Chunk id, score, pages, chapter/section/part and document per source
         - confidence: Confidence score (0-1)
         - response_time: Time taken to process
         - num_sources: Number of sources found
         - success: Whether the query was successful
         - error_message: Error message if any
+        - cached: Whether the answer was served from the answer cache
+        - model_used: LLM that generated the answer (None if no answer was generated)
     """
     try:
         rag_system = get_rag_instance()
-        response = rag_system.query(question, num_sources)
+        response = rag_system.query(question, num_sources, corpora, filters)
         
-        return {
-            'answer': response.answer,
-            'sources': response.sources,
-            'confidence': response.confidence,
-            'response_time': response.response_time,
-            'num_sources': response.num_sources,
-            'success': response.success,
-            'error_message': response.error_message
-        }
+        return _response_to_dict(response)
         
     except Exception as e:
         logger.error(f"Error in ask_kerala_panchayat: {e}")
-        return {
+        return _system_error_dict(e)
+
+async def aask_kerala_panchayat(question: str, num_sources: int = 3,
+                                corpora: Optional[List[str]] = None,
+                                filters: Optional[Dict] = None) -> Dict:
+    """
+    Async counterpart of ask_kerala_panchayat
+    
+    Returns the same dictionary as ask_kerala_panchayat. The engine itself is
+    created in a worker thread on first use so the event loop is not blocked.
+    """
+    try:
+        rag_system = _rag_instance or await asyncio.to_thread(get_rag_instance)
+        response = await rag_system.aquery(question, num_sources, corpora, filters)
+        
+        return _response_to_dict(response)
+        
+    except Exception as e:
+        logger.error(f"Error in aask_kerala_panchayat: {e}")
+        return _system_error_dict(e)
+
+def ask_kerala_panchayat_batch(questions: List[str], num_sources: int = 3,
+                               max_concurrency: Optional[int] = None,
+                               corpora: Optional[List[str]] = None,
+                               filters: Optional[Dict] = None) -> List[Dict]:
+    """
+    Ask several questions about Kerala Panchayat in one call
+    
+    Args:
+        questions: List of questions
+        num_sources: Number of relevant sources to retrieve per question (default: 3)
+        max_concurrency: Maximum parallel LLM calls (default: RAG_BATCH_CONCURRENCY or 4)
+        corpora: Corpora to search in multi-corpus mode (default: all)
+        filters: Chunk filter applied to every question (default: none)
+        
+    Returns:
+        List of dictionaries in input order, each with the same keys as
+        ask_kerala_panchayat
+    """
+    try:
+        rag_system = get_rag_instance()
+        responses = rag_system.query_batch(questions, num_sources, max_concurrency, corpora, filters)
+        
+        return [_response_to_dict(response) for response in responses]
+        
+    except Exception as e:
+        logger.error(f"Error in ask_kerala_panchayat_batch: {e}")
+        return [_system_error_dict(e) for _ in questions]
+
+def _response_to_dict(response: QueryResponse) -> Dict:
+    """Convert a QueryResponse into the public dictionary format"""
+    return {
+        'answer': response.answer,
+        'sources': response.sources,
+        'source_details': response.source_details,
+        'confidence': response.confidence,
+        'response_time': response.response_time,
+        'num_sources': response.num_sources,
+        'success': response.success,
+        'error_message': response.error_message,
+        'cached': response.cached,
+        'model_used': response.model_used
+    }
+
+def _system_error_dict(error: Exception) -> Dict:
+    """Dictionary returned when the RAG system itself is unavailable"""
+    return {
+        'answer': "System error occurred. Please try again later.",
+        'sources': [],
+        'source_details': [],
+        'confidence': 0.0,
+        'response_time': 0.0,
+        'num_sources': 0,
+        'success': False,
+        'error_message': str(error),
+        'cached': False,
+        'model_used': None
+    }
+
+def stream_kerala_panchayat(question: str, num_sources: int = 3,
+                            corpora: Optional[List[str]] = None,
+                            filters: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Streaming counterpart of ask_kerala_panchayat
+    
+    Yields the events produced by KeralaPanchayatRAG.query_stream. Engine
+    start-up failures are reported as a single 'error' event.
+    """
+    try:
+        rag_system = get_rag_instance()
+    except Exception as e:
+        logger.error(f"Error in stream_kerala_panchayat: {e}")
+        yield {
+            'type': 'error',
             'answer': "System error occurred. Please try again later.",
-            'sources': [],
-            'confidence': 0.0,
-            'response_time': 0.0,
-            'num_sources': 0,
-            'success': False,
             'error_message': str(e)
         }
+        return
+    
+    yield from rag_system.query_stream(question, num_sources, corpora, filters)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,397 @@
+"""
+Answer cache for the Kerala Panchayat RAG engine
+Two-tier cache (exact question match + semantic near-duplicate) in front of the LLM
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """
+    LRU/TTL answer cache with exact and semantic lookups
+
+    Entries are keyed by the normalized question text. Each entry also keeps
+    the L2-normalized question embedding, so rephrasings of a cached question
+    can be served when their cosine similarity clears the threshold.
+
+    The cache is cleared whenever any of the watched files (the FAISS index and
+    chunks files) change on disk, because cached answers were generated from
+    the old corpus. The files are checked at most once per check_interval.
+
+    The embeddings live in a preallocated matrix that put and eviction update
+    row by row, so a write does not make the next lookup rebuild it.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1000,
+                 ttl_seconds: float = 24 * 3600,
+                 similarity_threshold: float = 0.95,
+                 persist_path: Optional[str] = None,
+                 watch_paths: Sequence[str] = (),
+                 check_interval: float = 5.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached answers (LRU eviction beyond this)
+            ttl_seconds: Time-to-live of an entry in seconds (0 disables expiry)
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            persist_path: Optional SQLite file so the cache survives restarts
+            watch_paths: Files whose change invalidates the whole cache
+            check_interval: Seconds between checks of the watched files
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.persist_path = persist_path
+        self.watch_paths = list(watch_paths)
+        self.check_interval = check_interval
+        self._next_check = 0.0
+        self._next_sweep = 0.0
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        # Semantic lookup matrix: the first _matrix_count rows hold the embeddings
+        # of _matrix_keys; built lazily, then updated in place
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_count = 0
+        self._matrix_keys: List[str] = []
+        self._matrix_rows: Dict[str, int] = {}
+
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._db = None
+        self._fingerprint = self._compute_fingerprint()
+
+        if persist_path:
+            self._open_store()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize a question for exact matching"""
+        text = text.lower().strip()
+        text = re.sub(r"[^\w\s\u0d00-\u0d7f]", " ", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    def _compute_fingerprint(self) -> str:
+        """Size and modification time of the watched files"""
+        parts = []
+        for path in self.watch_paths:
+            try:
+                st = os.stat(path)
+                parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+            except OSError:
+                parts.append(f"{path}:missing")
+        return "|".join(parts)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _open_store(self):
+        """Open the SQLite store and load surviving entries"""
+        try:
+            self._db = sqlite3.connect(self.persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, question TEXT, embedding BLOB, "
+                "payload TEXT, created_at REAL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._db.commit()
+
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or row[0] != self._fingerprint:
+                # Corpus changed while we were down
+                self._db.execute("DELETE FROM entries")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('fingerprint', ?)",
+                    (self._fingerprint,)
+                )
+                self._db.commit()
+                return
+
+            rows = self._db.execute(
+                "SELECT key, question, embedding, payload, created_at FROM entries ORDER BY created_at"
+            ).fetchall()
+            for key, question, embedding, payload, created_at in rows:
+                self._entries[key] = {
+                    'question': question,
+                    'embedding': np.frombuffer(embedding, dtype='float32') if embedding else None,
+                    'payload': json.loads(payload),
+                    'created_at': created_at
+                }
+            self._trim()
+            logger.info(f"Answer cache loaded {len(self._entries)} entries from {self.persist_path}")
+
+        except sqlite3.Error as e:
+            logger.warning(f"Answer cache store unavailable, using memory only: {e}")
+            self._db = None
+
+    def reset_after_fork(self):
+        """Replace the lock and SQLite connection inherited from the parent process"""
+        self._lock = threading.RLock()
+        if self._db is not None:
+            try:
+                self._db = sqlite3.connect(self.persist_path, check_same_thread=False)
+            except sqlite3.Error as e:
+                logger.warning(f"Answer cache store unavailable after fork, using memory only: {e}")
+                self._db = None
+
+    def _persist(self, key: str, entry: Dict):
+        if self._db is None:
+            return
+        try:
+            embedding = entry['embedding'].tobytes() if entry['embedding'] is not None else None
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, question, embedding, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, entry['question'], embedding, json.dumps(entry['payload']), entry['created_at'])
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist cache entry: {e}")
+
+    def _delete_persisted(self, keys: List[str]):
+        if self._db is None or not keys:
+            return
+        try:
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to delete cache entries: {e}")
+
+    # ------------------------------------------------------------------
+    # Eviction and invalidation
+    # ------------------------------------------------------------------
+
+    def _is_expired(self, entry: Dict, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry['created_at'] > self.ttl_seconds
+
+    def _trim(self, sweep: bool = False):
+        """
+        Enforce the LRU size limit and drop expired entries
+
+        Lookups skip expired entries themselves, so the full scan for them runs
+        at most once a minute (or per TTL, if shorter) unless sweep is set.
+        """
+        now = time.time()
+        removed = []
+        if sweep or now >= self._next_sweep:
+            self._next_sweep = now + min(60.0, self.ttl_seconds or 60.0)
+            removed = [k for k, e in self._entries.items() if self._is_expired(e, now)]
+            for key in removed:
+                del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            removed.append(key)
+            self.evictions += 1
+        if removed:
+            for key in removed:
+                self._matrix_remove(key)
+            self._delete_persisted(removed)
+
+    def _matrix_set(self, key: str, embedding: Optional[np.ndarray]):
+        """Add, replace or (for no embedding) remove the matrix row of an entry"""
+        if self._matrix is None:
+            return  # Built from all entries by the next semantic lookup
+        if embedding is None:
+            self._matrix_remove(key)
+            return
+        row = self._matrix_rows.get(key)
+        if row is None:
+            if self._matrix_count == len(self._matrix):
+                grown = np.zeros((max(16, 2 * len(self._matrix)), self._matrix.shape[1]), dtype='float32')
+                grown[:self._matrix_count] = self._matrix[:self._matrix_count]
+                self._matrix = grown
+            row = self._matrix_count
+            self._matrix_count += 1
+            self._matrix_keys.append(key)
+            self._matrix_rows[key] = row
+        self._matrix[row] = embedding
+
+    def _matrix_remove(self, key: str):
+        """Remove the matrix row of an entry by moving the last row into its place"""
+        row = self._matrix_rows.pop(key, None) if self._matrix is not None else None
+        if row is None:
+            return
+        last = self._matrix_count - 1
+        if row != last:
+            moved = self._matrix_keys[last]
+            self._matrix[row] = self._matrix[last]
+            self._matrix_keys[row] = moved
+            self._matrix_rows[moved] = row
+        self._matrix_keys.pop()
+        self._matrix_count = last
+
+    def _check_invalidation(self):
+        """Clear the cache if the index or chunks files changed (checked at most once per check_interval)"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        fingerprint = self._compute_fingerprint()
+        if fingerprint != self._fingerprint:
+            logger.info("Index files changed, invalidating answer cache")
+            self._fingerprint = fingerprint
+            self.invalidations += 1
+            self.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO meta (name, value) VALUES ('fingerprint', ?)",
+                        (fingerprint,)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to update cache fingerprint: {e}")
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_count = 0
+            self._matrix_keys = []
+            self._matrix_rows = {}
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM entries")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to clear cache store: {e}")
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get_exact(self, question: str, accept: Optional[Callable[[Dict], bool]] = None) -> Optional[Dict]:
+        """
+        Look up a question by its normalized text
+
+        A miss here is not counted, because the caller usually follows up with
+        a semantic lookup; the miss is recorded by get_similar.
+
+        Args:
+            question: Question text
+            accept: Optional check of a payload (e.g. that it was generated with the
+                    same options); a rejected entry is a miss
+        """
+        with self._lock:
+            self._check_invalidation()
+            key = self.normalize(question)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry, time.time()):
+                self._trim(sweep=True)
+                return None
+            if accept is not None and not accept(entry['payload']):
+                return None
+            self._entries.move_to_end(key)
+            self.hits_exact += 1
+            return entry['payload']
+
+    def get_similar(self, embedding: np.ndarray, accept: Optional[Callable[[Dict], bool]] = None) -> Optional[Dict]:
+        """
+        Look up the nearest cached question by cosine similarity
+
+        Args:
+            embedding: L2-normalized question embedding (1-D or single-row 2-D)
+            accept: Optional check of a payload; the nearest accepted entry above the
+                    similarity threshold is returned
+        """
+        with self._lock:
+            match = self._nearest(embedding, accept)
+            if match is None:
+                self.misses += 1
+                return None
+            key, _ = match
+            self._entries.move_to_end(key)
+            self.hits_semantic += 1
+            return self._entries[key]['payload']
+
+    def _nearest(self, embedding: np.ndarray,
+                 accept: Optional[Callable[[Dict], bool]] = None) -> Optional[Tuple[str, float]]:
+        if not self._entries:
+            return None
+
+        if self._matrix is None:
+            self._trim(sweep=True)
+            keys = [k for k, e in self._entries.items() if e['embedding'] is not None]
+            if not keys:
+                return None
+            self._matrix = np.vstack([self._entries[k]['embedding'] for k in keys])
+            self._matrix_count = len(keys)
+            self._matrix_keys = keys
+            self._matrix_rows = {key: row for row, key in enumerate(keys)}
+
+        scores = self._matrix[:self._matrix_count] @ np.asarray(embedding, dtype='float32').reshape(-1)
+        candidates = np.flatnonzero(scores >= self.similarity_threshold)
+        now = time.time()
+        for row in candidates[np.argsort(-scores[candidates], kind='stable')]:
+            key = self._matrix_keys[row]
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry, now):
+                continue
+            if accept is None or accept(entry['payload']):
+                return key, float(scores[row])
+        return None
+
+    def put(self, question: str, embedding: Optional[np.ndarray], payload: Dict):
+        """
+        Store an answer
+
+        Args:
+            question: Original question text
+            embedding: L2-normalized question embedding (None for exact-only)
+            payload: JSON-serializable answer data
+        """
+        with self._lock:
+            key = self.normalize(question)
+            if not key:
+                return
+            entry = {
+                'question': question,
+                'embedding': (np.asarray(embedding, dtype='float32').reshape(-1).copy()
+                              if embedding is not None else None),
+                'payload': payload,
+                'created_at': time.time()
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._matrix_set(key, entry['embedding'])
+            self._persist(key, entry)
+            self._trim()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits_exact + self.hits_semantic + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits_exact': self.hits_exact,
+                'hits_semantic': self.hits_semantic,
+                'misses': self.misses,
+                'hit_rate': (self.hits_exact + self.hits_semantic) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
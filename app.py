@@ -1,3 +1,4 @@
+import click
 from flask import Flask
 from dotenv import load_dotenv
 import os
@@ -10,10 +11,18 @@ from routes.chat_routes import chat_bp
 from routes.admin_routes import admin_bp
 from routes.api_routes import api_bp
 from routes.main_routes import main_bp
+from RAG_engine import warm_up_rag_instance, start_warm_up_thread
 
 # Load environment variables
 load_dotenv()
 
+def serving_requests():
+    """Whether the app is being created to serve requests, not for a `flask` CLI command other than `flask run`"""
+    if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+        return True
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name == 'run'
+
 def create_app():
     """Application factory pattern"""
     app = Flask(__name__)
@@ -31,6 +40,25 @@ def create_app():
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     
+    # Load the RAG engine before the first chat request instead of during it
+    # (CLI commands such as `flask rebuild-faq` or `flask db` load it themselves if they need it)
+    warmup_mode = app.config.get('RAG_WARMUP', 'background') if serving_requests() else 'off'
+    if warmup_mode == 'sync':
+        warm_up_rag_instance()
+    elif warmup_mode == 'background':
+        start_warm_up_thread()
+    
+    @app.cli.command('rebuild-faq')
+    def rebuild_faq():
+        """Precompute the FAQ answers for the current corpus (run after every re-ingest)"""
+        from RAG_engine import get_rag_instance
+        from faq_store import build_faq_store, faq_questions, get_faq_store
+        from utils import translate_english_to_malayalam
+        
+        store = build_faq_store(get_rag_instance(), faq_questions(), get_faq_store().path,
+                                translate_fn=translate_english_to_malayalam)
+        print(f"🎉 FAQ store rebuilt with {len(store['entries'])} answers for corpus {store['corpus_version']}")
+    
     return app
 
 if __name__ == '__main__':
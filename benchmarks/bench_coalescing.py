@@ -0,0 +1,73 @@
+"""
+Micro-batching throughput vs latency benchmark
+Runs concurrent retrievals (embedding + search, no LLM) with and without the
+request coalescer at several concurrency levels.
+
+Usage:
+    python benchmarks/bench_coalescing.py [--concurrency 1,2,4,8,16,32] [--requests 200]
+                                          [--max-wait-ms 5] [--max-batch 32]
+
+Needs a built index (run ingest_pdf.py first). No LLM calls are made.
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark-no-llm-calls')
+
+from config import Config
+from RAG_engine import KeralaPanchayatRAG
+from micro_batcher import MicroBatcher
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(rag, concurrency, total):
+    """Issue total retrievals from concurrency threads; return (queries/s, latencies in ms)"""
+    questions = Config.SAMPLE_SERVICES
+
+    def one(i):
+        start = time.perf_counter()
+        rag._retrieve(f"{questions[i % len(questions)]} ({i})", 3)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(total)))
+    return total / (time.perf_counter() - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32')
+    parser.add_argument('--requests', type=int, default=200, help="Retrievals per run")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch', type=int, default=32)
+    args = parser.parse_args()
+
+    rag = KeralaPanchayatRAG(enable_cache=False)
+    rag._retrieve("warm up", 3)
+
+    print(f"{'threads':>7} {'mode':<10} {'q/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch':>6}")
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        for mode in ('direct', 'coalesced'):
+            if mode == 'coalesced':
+                rag._coalescer = MicroBatcher(rag._encode_and_search, max_batch=args.max_batch,
+                                              max_wait_ms=args.max_wait_ms, name='rag-coalescer')
+            else:
+                rag._coalescer = None
+            throughput, latencies = run(rag, concurrency, args.requests)
+            batch = rag.coalescer_stats().get('mean_batch_size', 1.0)
+            print(f"{concurrency:>7} {mode:<10} {throughput:>8.1f} {percentile(latencies, 50):>8.2f} "
+                  f"{percentile(latencies, 95):>8.2f} {batch:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
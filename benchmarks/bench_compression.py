@@ -0,0 +1,105 @@
+"""
+Extractive context compression benchmark
+Builds the prompt context for a question set with and without sentence-level
+compression and reports prompt tokens and the time spent preparing the context.
+With --llm, answers are also generated from both contexts to measure the
+end-to-end latency change.
+
+Usage:
+    python benchmarks/bench_compression.py [--questions questions.txt] [--k 3]
+                                           [--max-sentences 8] [--neighbours 1] [--llm]
+
+Needs a built index. LLM calls (and GROQ_API_KEY) are only needed with --llm.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark-no-llm-calls')
+
+from config import Config
+from RAG_engine import KeralaPanchayatRAG
+from context_compressor import ExtractiveCompressor
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(name, samples, unit):
+    print(f"{name:<30} mean {statistics.mean(samples):8.2f} {unit}   "
+          f"p50 {percentile(samples, 50):8.2f} {unit}   p95 {percentile(samples, 95):8.2f} {unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', help="Text file with one question per line (default: Config.SAMPLE_SERVICES)")
+    parser.add_argument('--k', type=int, default=3, help="Sources per question")
+    parser.add_argument('--max-sentences', type=int, default=8)
+    parser.add_argument('--neighbours', type=int, default=1)
+    parser.add_argument('--llm', action='store_true', help="Also time answer generation from both contexts")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions, encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = Config.SAMPLE_SERVICES
+
+    rag = KeralaPanchayatRAG(enable_cache=False, compress_context=False)
+    compressor = ExtractiveCompressor(rag._encode_queries, max_sentences=args.max_sentences,
+                                      neighbours=args.neighbours)
+    rag._retrieve("warm up", args.k)
+
+    full_tokens, compressed_tokens, full_ms, compressed_ms = [], [], [], []
+    full_llm, compressed_llm = [], []
+    for question in questions:
+        _, query_embedding, hits, generation = rag._retrieve(question, args.k)
+        sections = rag._sections(hits, generation)
+        if not sections:
+            print(f"⚠️  No sections for: {question}")
+            continue
+
+        rag.compressor = None
+        start = time.perf_counter()
+        full_context = rag._prepare_context(question, query_embedding, sections)
+        full_ms.append((time.perf_counter() - start) * 1000)
+
+        rag.compressor = compressor
+        start = time.perf_counter()
+        compressed_context = rag._prepare_context(question, query_embedding, sections)
+        compressed_ms.append((time.perf_counter() - start) * 1000)
+
+        full_tokens.append(rag.context_builder.count_tokens(full_context))
+        compressed_tokens.append(rag.context_builder.count_tokens(compressed_context))
+
+        if args.llm:
+            for context, samples in ((full_context, full_llm), (compressed_context, compressed_llm)):
+                start = time.perf_counter()
+                rag._generate_answer(question, context)
+                samples.append(time.perf_counter() - start)
+
+    if not full_tokens:
+        print("❌ No questions could be answered")
+        return
+
+    reduction = 1 - sum(compressed_tokens) / sum(full_tokens)
+    print(f"Questions: {len(full_tokens)}  k: {args.k}  max sentences: {args.max_sentences}  "
+          f"neighbours: {args.neighbours}  context budget: {rag.context_builder.token_budget}")
+    report("context tokens (full)", full_tokens, "tok")
+    report("context tokens (compressed)", compressed_tokens, "tok")
+    print(f"{'prompt token reduction':<30} {reduction:.1%}")
+    report("context prep (full)", full_ms, "ms ")
+    report("context prep (compressed)", compressed_ms, "ms ")
+    if args.llm:
+        report("answer latency (full)", full_llm, "s  ")
+        report("answer latency (compressed)", compressed_llm, "s  ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Query encoder backend benchmark
+Compares the PyTorch SentenceTransformer and the exported ONNX encoder on startup
+time, per-query encode latency, peak RSS and agreement of the embeddings.
+
+Usage:
+    python onnx_encoder.py                       # export once
+    python benchmarks/bench_encoder.py [--repeat 50]
+
+Each backend runs in its own process so startup time and RSS are not shared.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_backend(backend, model_name, model_dir, repeat):
+    """Load one backend, encode the sample questions and return its measurements"""
+    start = time.perf_counter()
+    if backend == 'onnx':
+        from onnx_encoder import OnnxSentenceEncoder
+        encoder = OnnxSentenceEncoder(model_dir)
+    else:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(model_name, device='cpu')
+    encoder.encode(["warm up"])
+    startup = time.perf_counter() - start
+
+    from config import Config
+    questions = Config.SAMPLE_SERVICES
+    samples = []
+    for _ in range(repeat):
+        for question in questions:
+            t = time.perf_counter()
+            encoder.encode([question])
+            samples.append((time.perf_counter() - t) * 1000)
+
+    return {
+        'backend': backend,
+        'startup_s': startup,
+        'mean_ms': statistics.mean(samples),
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'torch_imported': 'torch' in sys.modules,
+        'embeddings': encoder.encode(questions).tolist()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50, help="Repetitions per question")
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--model-dir', default=os.getenv('RAG_ONNX_MODEL_DIR', 'onnx_encoder'))
+    parser.add_argument('--child', choices=['torch', 'onnx'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.model, args.model_dir, args.repeat)))
+        return
+
+    results = {}
+    for backend in ('torch', 'onnx'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', backend, '--repeat', str(args.repeat),
+             '--model', args.model, '--model-dir', args.model_dir],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[backend] = json.loads(output.strip().splitlines()[-1])
+
+    for result in results.values():
+        print(f"{result['backend']:<6} startup {result['startup_s']:6.2f} s   "
+              f"encode mean {result['mean_ms']:6.2f} ms  p50 {result['p50_ms']:6.2f} ms  "
+              f"p95 {result['p95_ms']:6.2f} ms   max RSS {result['max_rss_mb']:7.1f} MB   "
+              f"torch imported: {result['torch_imported']}")
+
+    from onnx_encoder import min_cosine
+    import numpy as np
+    agreement = min_cosine(np.asarray(results['torch']['embeddings']), np.asarray(results['onnx']['embeddings']))
+    print(f"Min cosine similarity torch vs onnx over {len(results['torch']['embeddings'])} questions: {agreement:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+PDF extraction throughput benchmark
+Extracts every page of a PDF with pdf_extract.iter_pdf_pages at several
+process counts and reports pages per second, plus the time until the first
+page reaches the consumer.
+
+Usage:
+    python benchmarks/bench_extraction.py [--pdf "Kerala Panchayati Raj Act 1994 and Rules.pdf"]
+                                          [--processes 1,2,4,8] [--repeat 3]
+
+Needs only PyPDF2; no index or model is loaded.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pdf_extract import iter_pdf_pages, page_count
+
+DEFAULT_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                           "Kerala Panchayati Raj Act 1994 and Rules.pdf")
+
+
+def run(pdf_path, processes):
+    """Seconds to the first page and in total, and the number of characters extracted"""
+    start = time.perf_counter()
+    first = None
+    characters = 0
+    for _, text, _ in iter_pdf_pages(pdf_path, processes=processes):
+        if first is None:
+            first = time.perf_counter() - start
+        characters += len(text or "")
+    return first, time.perf_counter() - start, characters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf', default=DEFAULT_PDF, help="PDF to extract")
+    parser.add_argument('--processes', default="1,2,4,8", help="Comma-separated process counts")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per process count (best is reported)")
+    args = parser.parse_args()
+
+    pages = page_count(args.pdf)
+    print(f"{os.path.basename(args.pdf)}: {pages} pages, {os.cpu_count()} CPU cores")
+    print(f"{'processes':>9} {'pages/s':>9} {'total s':>9} {'first page ms':>14} {'speedup':>8}")
+
+    baseline = None
+    for processes in [int(p) for p in args.processes.split(',')]:
+        runs = [run(args.pdf, processes) for _ in range(args.repeat)]
+        total = min(seconds for _, seconds, _ in runs)
+        first = statistics.median(first for first, _, _ in runs)
+        baseline = baseline or total
+        print(f"{processes:>9} {pages / total:>9.1f} {total:>9.2f} {first * 1000:>14.1f} {baseline / total:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Hybrid retrieval latency benchmark
+Measures the per-query cost BM25 + reciprocal-rank fusion adds on top of dense search.
+
+Usage:
+    python benchmarks/bench_hybrid.py [--repeat 20]
+
+Needs a built index with a BM25 index (run ingest_pdf.py first). No LLM calls are made.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark-no-llm-calls')
+
+from config import Config
+from RAG_engine import KeralaPanchayatRAG
+
+EXACT_TOKEN_QUESTIONS = [
+    "What does Section 235 say?",
+    "How do I fill Form 5?",
+    "What is the penalty under section 200?",
+    "Explain rule 12 of the building rules",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<28} mean {statistics.mean(samples):7.3f} ms   "
+          f"p50 {percentile(samples, 50):7.3f} ms   p95 {percentile(samples, 95):7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help="Repetitions per question")
+    parser.add_argument('--k', type=int, default=3, help="Sources per question")
+    args = parser.parse_args()
+
+    rag = KeralaPanchayatRAG(enable_cache=False, retrieval_mode='hybrid')
+    questions = Config.SAMPLE_SERVICES + EXACT_TOKEN_QUESTIONS
+
+    encode, dense, lexical, fusion, hybrid_total, shortcuts = [], [], [], [], [], 0
+    for question in questions:
+        embedding = rag._encode_queries([question])
+        encode += timed(lambda: rag._encode_queries([question]), args.repeat)
+        dense += timed(lambda: rag.index.search(embedding, args.k), args.repeat)
+        lexical += timed(lambda: rag.bm25.search(question, rag.hybrid_candidates), args.repeat)
+        fusion += timed(lambda: rag._search_by_embedding(embedding[0], args.k, question), args.repeat)
+        hybrid_total += timed(lambda: rag._search_relevant_sections(question, args.k), args.repeat)
+        shortcuts += rag._lexical_shortcut(rag._generation, question, embedding[0], args.k) is not None
+
+    rag.retrieval_mode = 'dense'
+    dense_total = []
+    for question in questions:
+        dense_total += timed(lambda: rag._search_relevant_sections(question, args.k), args.repeat)
+
+    print(f"Questions: {len(questions)}  repeat: {args.repeat}  k: {args.k}  "
+          f"chunks: {len(rag.chunks)}  BM25 terms: {len(rag.bm25.terms)}")
+    report("query encode", encode)
+    report("dense search (FAISS)", dense)
+    report("BM25 search", lexical)
+    report("dense + BM25 + RRF", fusion)
+    print()
+    report("end-to-end dense", dense_total)
+    report("end-to-end hybrid", hybrid_total)
+    print(f"Added latency per query (mean): "
+          f"{statistics.mean(hybrid_total) - statistics.mean(dense_total):+.3f} ms; "
+          f"lexical short-circuits: {shortcuts}/{len(questions)} questions")
+
+
+if __name__ == "__main__":
+    main()
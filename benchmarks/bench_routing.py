@@ -0,0 +1,129 @@
+"""
+Model routing report
+Answers every question with both the small and the large model, then compares
+latency and answer agreement, for the routing thresholds from the environment
+(RAG_ROUTER_*) and for a sweep of top-score thresholds.
+
+Agreement is the cosine similarity of the two answers' sentence embeddings
+(the engine's embedding model); answers above --agree count as agreeing.
+
+Usage:
+    python benchmarks/bench_routing.py [--questions questions.txt] [--agree 0.85]
+                                       [--json routing_report.json]
+
+Needs a built index and GROQ_API_KEY. Makes two LLM calls per question.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import Config
+from RAG_engine import KeralaPanchayatRAG
+
+TOP_SCORE_SWEEP = [0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def timed_answer(rag, question, context, model):
+    start = time.perf_counter()
+    answer = rag._generate_answer(question, context, model)
+    return answer, time.perf_counter() - start
+
+
+def summarize(rows, routed_small, agree):
+    """Latency and agreement of a routing policy over the measured rows"""
+    policy = [row['small_seconds'] if small else row['large_seconds'] for row, small in zip(rows, routed_small)]
+    routed = [row['agreement'] for row, small in zip(rows, routed_small) if small]
+    return {
+        'small_share': sum(routed_small) / len(rows),
+        'mean_seconds': statistics.mean(policy),
+        'p95_seconds': percentile(policy, 95),
+        'routed_agreement': statistics.mean(routed) if routed else None,
+        'routed_agree_rate': sum(a >= agree for a in routed) / len(routed) if routed else None
+    }
+
+
+def print_summary(name, summary):
+    agreement = ("-" if summary['routed_agreement'] is None else
+                 f"{summary['routed_agreement']:.3f} ({summary['routed_agree_rate']:.0%} agree)")
+    print(f"{name:<24} small {summary['small_share']:>5.0%}   mean {summary['mean_seconds']:6.2f} s   "
+          f"p95 {summary['p95_seconds']:6.2f} s   routed agreement {agreement}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', help="Text file with one question per line (default: Config.SAMPLE_SERVICES)")
+    parser.add_argument('--k', type=int, default=3, help="Sources per question")
+    parser.add_argument('--agree', type=float, default=0.85, help="Answer cosine counted as agreement")
+    parser.add_argument('--json', help="Write the per-question rows and summaries to this file")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions, encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = Config.SAMPLE_SERVICES
+
+    rag = KeralaPanchayatRAG(enable_cache=False, model_routing=True)
+    router = rag.router
+
+    rows = []
+    for question in questions:
+        _, _, hits, generation = rag._retrieve(question, args.k)
+        sections = rag._sections(hits, generation)
+        if not sections:
+            print(f"⚠️  No sections for: {question}")
+            continue
+        context = rag.context_builder.build(sections)
+        decision = router.decide(question, sections)
+        small_answer, small_seconds = timed_answer(rag, question, context, router.small_model)
+        large_answer, large_seconds = timed_answer(rag, question, context, router.large_model)
+        embeddings = rag._encode_queries([small_answer, large_answer])
+        rows.append({
+            'question': question,
+            **decision.as_dict(),
+            'small_seconds': small_seconds,
+            'large_seconds': large_seconds,
+            'agreement': float(np.dot(embeddings[0], embeddings[1]))
+        })
+        print(f"{decision.tier:<5} top {decision.top_score:.3f} gap {decision.score_gap:.3f} "
+              f"small {small_seconds:5.2f} s  large {large_seconds:5.2f} s  "
+              f"agreement {rows[-1]['agreement']:.3f}  {question[:60]}")
+
+    if not rows:
+        print("❌ No questions could be answered")
+        return
+
+    print(f"\nQuestions: {len(rows)}  small: {router.small_model}  large: {router.large_model}")
+    summaries = {
+        'large only': summarize(rows, [False] * len(rows), args.agree),
+        'small only': summarize(rows, [True] * len(rows), args.agree),
+        'configured router': summarize(rows, [row['tier'] == 'small' for row in rows], args.agree)
+    }
+    for min_top_score in TOP_SCORE_SWEEP:
+        routed_small = [row['top_score'] >= min_top_score and row['score_gap'] >= router.min_score_gap
+                        and row['question_words'] <= router.max_question_words for row in rows]
+        summaries[f"top score >= {min_top_score}"] = summarize(rows, routed_small, args.agree)
+    for name, summary in summaries.items():
+        print_summary(name, summary)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'rows': rows, 'summaries': summaries}, f, indent=2, ensure_ascii=False)
+        print(f"✅ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-worker memory benchmark for the corpus loading modes
+Starts N worker processes per mode, each loading the engine and running a few
+searches, then reports RSS, PSS and USS per worker while all are alive.
+
+Modes:
+    private  index read into each worker's heap (RAG_MMAP_INDEX=false)
+    mmap     index and chunks memory-mapped from the bundle files
+    shared   corpus published once in POSIX shared memory (shared_index.py)
+
+Usage:
+    python benchmarks/bench_shared_memory.py [--workers 4] [--modes private,shared]
+
+RSS counts shared pages in every process; PSS splits them between the
+processes mapping them, so the sum of PSS is the real machine footprint.
+Needs Linux (/proc/<pid>/smaps_rollup) and a built bundle. No LLM calls are made.
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import multiprocessing as mp
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('GROQ_API_KEY', 'benchmark-no-llm-calls')
+
+SHM_NAME = f"kerala_rag_bench_{os.getpid()}"
+
+
+def memory_mb():
+    """RSS, PSS and USS of the current process in MB"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0), 'uss': uss}
+
+
+def worker(mode, shm_name, questions, loaded, measured, results):
+    from RAG_engine import KeralaPanchayatRAG
+
+    kwargs = {'enable_cache': False}
+    if mode == 'private':
+        kwargs['mmap_index'] = False
+    elif mode == 'shared':
+        kwargs['shared_memory'] = shm_name
+    rag = KeralaPanchayatRAG(**kwargs)
+    for question in questions:
+        rag._search_relevant_sections(question, 3)
+
+    loaded.wait()      # every worker is loaded, so shared pages are mapped by all
+    results.put((mode, memory_mb()))
+    measured.wait()    # stay alive until everyone has measured
+
+
+def run_mode(mode, workers, questions):
+    ctx = mp.get_context('spawn')
+    loaded, measured = ctx.Barrier(workers), ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, SHM_NAME, questions, loaded, measured, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get()[1] for _ in processes]
+    for process in processes:
+        process.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--modes', default='private,mmap,shared')
+    parser.add_argument('--bundle', default=os.getenv('RAG_BUNDLE_PATH', 'kerala_panchayat_bundle'))
+    args = parser.parse_args()
+
+    from config import Config
+    import shared_index
+
+    modes = args.modes.split(',')
+    if 'shared' in modes:
+        shared_index.publish(args.bundle, SHM_NAME)
+
+    try:
+        print(f"{'mode':<8} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} "
+              f"{'USS/worker':>11} {'total PSS':>10}   (MB)")
+        for mode in modes:
+            samples = run_mode(mode, args.workers, Config.SAMPLE_SERVICES)
+            rss = statistics.mean(s['rss'] for s in samples)
+            pss = statistics.mean(s['pss'] for s in samples)
+            uss = statistics.mean(s['uss'] for s in samples)
+            print(f"{mode:<8} {args.workers:>7} {rss:>11.1f} {pss:>11.1f} {uss:>11.1f} "
+                  f"{sum(s['pss'] for s in samples):>10.1f}")
+    finally:
+        if 'shared' in modes:
+            shared_index.unpublish(SHM_NAME)
+
+
+if __name__ == "__main__":
+    main()
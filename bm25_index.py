@@ -0,0 +1,148 @@
+"""
+Kerala Panchayat BM25 index
+Compact lexical inverted index used alongside the FAISS dense index
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Lowercased ASCII words/numbers and runs of Malayalam script (including vowel signs)
+TOKEN_RE = re.compile(r"[0-9a-z]+|[\u0d00-\u0d7f]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lexical tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the document chunks, stored as CSR postings arrays
+
+    Postings for term t are doc_ids[indptr[t]:indptr[t + 1]] with the matching
+    precomputed BM25 contributions in weights[...], so scoring a query is one
+    vectorized scatter-add per query term.
+    """
+
+    def __init__(self, terms: Sequence[str], indptr: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, num_docs: int, k1: float = 1.5, b: float = 0.75):
+        self.terms = list(terms)
+        self.vocab: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.num_docs = int(num_docs)
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, chunks: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Build the index from chunk texts
+
+        Args:
+            chunks: Chunk texts; a chunk's position is its document id
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        vocab: Dict[str, int] = {}
+        term_ids, doc_ids, freqs = [], [], []
+        doc_lengths = np.zeros(len(chunks), dtype='float32')
+
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                freqs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype='int64')
+        doc_ids = np.asarray(doc_ids, dtype='int32')
+        freqs = np.asarray(freqs, dtype='float32')
+
+        # Group postings by term (stable, so doc ids stay sorted within a term)
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, doc_ids, freqs = term_ids[order], doc_ids[order], freqs[order]
+        indptr = np.zeros(len(vocab) + 1, dtype='int64')
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=indptr[1:])
+
+        # Precompute idf * saturated tf for every posting
+        num_docs = len(chunks)
+        doc_freq = np.diff(indptr).astype('float32')
+        idf = np.log(1.0 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        avg_len = float(doc_lengths.mean()) if num_docs else 0.0
+        norm = k1 * (1.0 - b + b * doc_lengths[doc_ids] / max(avg_len, 1e-9))
+        weights = (idf[term_ids] * freqs * (k1 + 1.0) / (freqs + norm)).astype('float32')
+
+        return cls(list(vocab), indptr, doc_ids, weights, num_docs, k1, b)
+
+    def save(self, path: str):
+        """Save as an uncompressed .npz file (no pickled objects)"""
+        np.savez(
+            path,
+            terms=np.asarray(self.terms, dtype=str),
+            indptr=self.indptr,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            params=np.asarray([self.num_docs, self.k1, self.b], dtype='float64')
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            num_docs, k1, b = data['params']
+            return cls(data['terms'].tolist(), data['indptr'], data['doc_ids'], data['weights'],
+                       int(num_docs), float(k1), float(b))
+
+    def search(self, query: str, k: int = 10, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score all documents for a query
+
+        Args:
+            query: Query text
+            k: Number of documents to return
+            mask: Optional boolean mask; only documents where it is True are returned
+
+        Returns:
+            (scores, doc_ids) of the top-k documents with a positive score,
+            highest score first
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or k <= 0:
+            return np.zeros(0, dtype='float32'), np.zeros(0, dtype='int64')
+
+        scores = np.zeros(self.num_docs, dtype='float32')
+        for t in term_ids:
+            start, end = self.indptr[t], self.indptr[t + 1]
+            # Doc ids are unique within one term's postings, so plain fancy-index add is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        candidates = np.flatnonzero(scores > 0 if mask is None else (scores > 0) & mask)
+        if len(candidates) > k:
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+        order = np.argsort(-scores[candidates], kind='stable')
+        candidates = candidates[order]
+        return scores[candidates], candidates.astype('int64')
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse several ranked lists of document ids
+
+    Args:
+        rankings: Ranked lists, best first
+        k: RRF constant (higher flattens the contribution of top ranks)
+
+    Returns:
+        (doc_id, fused score) pairs, best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
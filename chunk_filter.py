@@ -0,0 +1,228 @@
+"""
+Kerala Panchayat chunk filters
+Restrict retrieval to part of the corpus (a chapter, a section, the Rules part,
+a document or a page range) by pre-filtering the vector search
+"""
+
+import re
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+_ROMAN = [(1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'), (100, 'C'), (90, 'XC'),
+          (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I')]
+_CHAPTER_RE = re.compile(r"^(?:chapter\s+)?([ivxlcdm]+|\d+)$", re.IGNORECASE)
+_SECTION_RE = re.compile(r"^(?:section\s+|sec\.?\s*|s\.\s*)?(\d+[a-z]{0,2})\.?$", re.IGNORECASE)
+
+
+def to_roman(number: int) -> str:
+    """Roman numeral of a positive integer"""
+    roman = ""
+    for value, numeral in _ROMAN:
+        count, number = divmod(number, value)
+        roman += numeral * count
+    return roman
+
+
+def normalize_chapter(value) -> str:
+    """Chapter number as an upper-case Roman numeral ("25", "xxv" and "Chapter XXV" -> "XXV")"""
+    match = _CHAPTER_RE.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid chapter '{value}'")
+    number = match.group(1)
+    return to_roman(int(number)) if number.isdigit() else number.upper()
+
+
+def normalize_section(value) -> str:
+    """Section number in upper case ("235a", "Section 235A" and "s. 235A" -> "235A")"""
+    match = _SECTION_RE.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid section '{value}'")
+    return match.group(1).upper()
+
+
+@dataclass(frozen=True)
+class ChunkFilter:
+    """
+    Conditions on chunk metadata; all given conditions must hold
+
+    chapter and section match the chapter / section a chunk starts in, part
+    matches case-insensitively anywhere in the part title ("rules" selects
+    the Rules part), document is a source document name and page_from /
+    page_to keep chunks overlapping that page range.
+    """
+    chapter: Optional[str] = None
+    section: Optional[str] = None
+    part: Optional[str] = None
+    document: Optional[str] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, values: Optional[Dict]) -> Optional["ChunkFilter"]:
+        """
+        Build a filter from request values
+
+        Returns:
+            The filter, or None if no condition is given
+
+        Raises:
+            ValueError: for unknown keys or invalid values
+        """
+        if not values:
+            return None
+        if not isinstance(values, dict):
+            raise ValueError("Filters must be an object")
+        unknown = set(values) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        values = {key: value for key, value in values.items() if value not in (None, '')}
+        if not values:
+            return None
+        try:
+            chunk_filter = cls(
+                chapter=normalize_chapter(values['chapter']) if 'chapter' in values else None,
+                section=normalize_section(values['section']) if 'section' in values else None,
+                part=str(values['part']).strip().lower() if 'part' in values else None,
+                document=str(values['document']).strip() if 'document' in values else None,
+                page_from=int(values['page_from']) if 'page_from' in values else None,
+                page_to=int(values['page_to']) if 'page_to' in values else None
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid filter: {e}")
+        if chunk_filter.page_from is not None and chunk_filter.page_to is not None \
+                and chunk_filter.page_from > chunk_filter.page_to:
+            raise ValueError("page_from must not be after page_to")
+        return chunk_filter
+
+    def as_dict(self) -> Dict:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+    def mask(self, chunks) -> np.ndarray:
+        """
+        Boolean mask of the chunks of a store that match
+
+        Evaluated on the metadata columns without decoding any chunk text; each
+        distinct chapter / section / part string is tested once.
+
+        Raises:
+            ValueError: if the store has no metadata for a filtered field
+        """
+        columns = getattr(chunks, 'columns', {})
+        mask = np.ones(len(chunks), dtype=bool)
+
+        def require(name: str) -> np.ndarray:
+            if name not in columns:
+                raise ValueError(f"Filtering by {name} needs chunk metadata; re-run ingest_pdf.py")
+            return columns[name]
+
+        if self.chapter is not None:
+            require('chapter')
+            mask &= chunks.string_mask('chapter', lambda value: value == self.chapter)
+        if self.section is not None:
+            require('section')
+            mask &= chunks.string_mask('section', lambda value: value == self.section)
+        if self.part is not None:
+            require('part')
+            mask &= chunks.string_mask('part', lambda value: self.part in value.lower())
+        if self.document is not None:
+            doc_ids = [i for i, name in enumerate(chunks.documents) if name == self.document]
+            mask &= np.isin(require('doc_id'), doc_ids)
+        if self.page_from is not None:
+            page_end = require('page_end')
+            mask &= (page_end >= self.page_from) & (page_end >= 0)
+        if self.page_to is not None:
+            page_start = require('page_start')
+            mask &= (page_start <= self.page_to) & (page_start >= 0)
+        return mask
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """Part of the collection a request searches: a corpus subset and/or a chunk filter"""
+    corpora: Optional[Tuple[str, ...]] = None
+    filter: Optional[ChunkFilter] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            'corpora': list(self.corpora) if self.corpora else None,
+            'filters': self.filter.as_dict() if self.filter is not None else None
+        }
+
+
+class FilteredIds:
+    """The chunks a filter selects, as a FAISS ID selector and a boolean mask"""
+
+    def __init__(self, mask: np.ndarray):
+        self.mask = mask
+        self.ids = np.flatnonzero(mask).astype('int64')
+        self.selector = faiss.IDSelectorBatch(self.ids) if len(self.ids) else None
+        self._vectors = None
+
+    def vectors(self, index: faiss.Index) -> np.ndarray:
+        """Stored vectors of the selected chunks, reconstructed once (the selection belongs to one index)"""
+        if self._vectors is None:
+            self._vectors = np.ascontiguousarray(index.reconstruct_batch(self.ids), dtype='float32')
+        return self._vectors
+
+
+def search_exact(queries: np.ndarray, vectors: np.ndarray, ids: np.ndarray, k: int,
+                 metric: int = faiss.METRIC_INNER_PRODUCT) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force search among vectors, labelled with the given ids
+
+    Returns:
+        (scores, ids) padded with -inf / -1 (+inf for L2) like FAISS when fewer than k
+    """
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    found = min(k, len(vectors))
+    distances, labels = faiss.knn(queries, vectors, found, metric=metric)
+    labels = np.where(labels >= 0, ids[np.maximum(labels, 0)], -1)
+    if found < k:
+        pad = ((0, 0), (0, k - found))
+        fill = -np.inf if metric == faiss.METRIC_INNER_PRODUCT else np.inf
+        distances = np.pad(distances, pad, constant_values=fill)
+        labels = np.pad(labels, pad, constant_values=-1)
+    return distances, labels
+
+
+def search_selected(index: faiss.Index, queries: np.ndarray, k: int,
+                    selected: FilteredIds) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search only the selected vectors
+
+    The ID selector is applied inside the FAISS search (pre-filtering), with
+    the index's current nprobe / efSearch, so k results are found among the
+    selected vectors instead of over-fetching and dropping the others.
+    Indexes that are not FAISS indexes (shared_index.SharedFlatIndex) are
+    searched through their own search_selected(queries, k, ids).
+
+    IVF only scans nprobe of its nlist lists, so a narrow filter would leave
+    most of the k slots empty. A selection smaller than k * nlist / nprobe
+    (about what those lists hold for k hits) is therefore scored exactly
+    against its stored vectors instead.
+
+    Returns:
+        (scores, ids) padded with -inf / -1 like FAISS when fewer match
+    """
+    if selected.selector is None:
+        return (np.full((len(queries), k), -np.inf, dtype='float32'),
+                np.full((len(queries), k), -1, dtype='int64'))
+    if not isinstance(index, faiss.Index):
+        return index.search_selected(queries, k, selected.ids)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and len(selected.ids) * ivf.nprobe < k * ivf.nlist:
+        try:
+            return search_exact(queries, selected.vectors(index), selected.ids, k, index.metric_type)
+        except RuntimeError:
+            pass  # No direct map to reconstruct from (see index_bundle.read_index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selected.selector, nprobe=ivf.nprobe)
+    elif hasattr(index, 'hnsw'):
+        params = faiss.SearchParametersHNSW(sel=selected.selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selected.selector)
+    return index.search(queries, k, params=params)
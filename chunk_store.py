@@ -0,0 +1,352 @@
+"""
+Kerala Panchayat chunk store
+Compact, memory-mappable columnar storage for document chunks and their metadata
+"""
+
+import io
+import os
+import json
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # Only needed for compressed stores
+    zstandard = None
+
+MAGIC = b"KPCHUNK1"
+FORMAT_VERSION = 1
+_ALIGN = 64
+
+# Integer metadata columns and their on-disk dtypes
+INT_COLUMNS = {
+    'page_start': '<i4',
+    'page_end': '<i4',
+    'doc_id': '<i4',
+    'char_start': '<i8',
+    'char_end': '<i8',
+}
+# String metadata columns, stored as an id per chunk into a string table
+STRING_COLUMNS = ('heading', 'chapter', 'section', 'part')
+
+
+def _pad(length: int) -> int:
+    return (-length) % _ALIGN
+
+
+def is_chunk_store(path: str) -> bool:
+    """Whether a file is a chunk store (as opposed to a legacy pickled list)"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _StringTable:
+    """UTF-8 blob plus offsets, decoded on access"""
+
+    def __init__(self, blob: memoryview, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+
+class ChunkStore:
+    """
+    Read-only chunk store
+
+    Chunk text lives in one UTF-8 blob with an offsets array (optionally zstd
+    compressed in blocks of chunks). Metadata lives in parallel numpy arrays.
+    Everything is a view into one memory-mapped file (or shared buffer), so
+    opening a store costs no per-chunk Python objects; a chunk's text is only
+    decoded when it is accessed.
+
+    Behaves like a read-only list of strings: len(store), store[i], iteration.
+    """
+
+    def __init__(self, buffer: Union[mmap.mmap, memoryview, bytes], _owner=None):
+        """
+        Open a store from a buffer holding the serialized file
+
+        Args:
+            buffer: Buffer with the store contents (mmap, shared memory, bytes)
+        """
+        self._buffer = buffer
+        self._owner = _owner
+        view = memoryview(buffer)
+        self._view = view
+
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a chunk store (bad magic)")
+        header_len, = struct.unpack_from('<Q', view, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(bytes(view[header_start:header_start + header_len]).decode('utf-8'))
+        if self.header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store version {self.header.get('format_version')}")
+
+        self.count = self.header['count']
+        self.compression = self.header.get('compression', 'none')
+        self.block_size = self.header.get('block_size', 0)
+        self.documents: List[str] = self.header.get('documents', [])
+
+        self._sections = {name: self._section(name) for name in self.header['sections']}
+        self._offsets = self._sections['text_offsets']
+        self._blob = self._sections['text_blob']
+        self.columns: Dict[str, np.ndarray] = {
+            name: self._sections[f'col.{name}'] for name in INT_COLUMNS if f'col.{name}' in self._sections
+        }
+        self._string_tables: Dict[str, _StringTable] = {}
+        for name in STRING_COLUMNS:
+            if f'col.{name}' in self._sections:
+                self.columns[name] = self._sections[f'col.{name}']
+                self._string_tables[name] = _StringTable(
+                    self._sections[f'strings.{name}.blob'], self._sections[f'strings.{name}.offsets']
+                )
+
+        if self.compression == 'zstd':
+            if zstandard is None:
+                raise ImportError("zstandard is required to read compressed chunk stores")
+            self._block_offsets = self._sections['block_offsets']
+            self._decompressor = threading.local()
+            self._block_cache: "OrderedDict[int, bytes]" = OrderedDict()
+            self._block_cache_size = 32
+            self._block_lock = threading.Lock()
+
+    def _section(self, name: str):
+        info = self.header['sections'][name]
+        start, length = info['offset'], info['length']
+        raw = self._view[start:start + length]
+        if info['dtype'] == 'bytes':
+            return raw
+        return np.frombuffer(raw, dtype=info['dtype'])
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkStore":
+        """Memory-map a store file"""
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, _owner=mapped)
+
+    @staticmethod
+    def write(path: str, chunks: Sequence[str], metadata: Optional[Sequence[Dict]] = None,
+              documents: Optional[Sequence[str]] = None, compression: str = 'none',
+              block_size: int = 64, level: int = 3):
+        """
+        Serialize chunks and their metadata to a store file
+
+        Args:
+            path: Output file path
+            chunks: Chunk texts
+            metadata: Optional per-chunk dictionaries with any of the keys in
+                      INT_COLUMNS / STRING_COLUMNS (missing values become -1 / '')
+            documents: Source document names referenced by the doc_id column
+            compression: 'none' or 'zstd' (compressed per block of chunks)
+            block_size: Chunks per compressed block
+            level: zstd compression level
+        """
+        data = ChunkStore.serialize(chunks, metadata, documents, compression, block_size, level)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def serialize(chunks: Sequence[str], metadata: Optional[Sequence[Dict]] = None,
+                  documents: Optional[Sequence[str]] = None, compression: str = 'none',
+                  block_size: int = 64, level: int = 3) -> bytes:
+        """Serialize chunks and metadata to bytes (see write)"""
+        if metadata is not None and len(metadata) != len(chunks):
+            raise ValueError("metadata must have one entry per chunk")
+        if compression not in ('none', 'zstd'):
+            raise ValueError(f"Unknown compression '{compression}'")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstandard is required to write compressed chunk stores")
+
+        sections: Dict[str, Union[bytes, np.ndarray]] = {}
+
+        encoded = [chunk.encode('utf-8') for chunk in chunks]
+        lengths = np.fromiter((len(e) for e in encoded), dtype='<i8', count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum(lengths, out=offsets[1:])
+
+        if compression == 'zstd':
+            # Offsets stay global; a chunk is found inside its decompressed block
+            # by subtracting the offset of the block's first chunk
+            compressor = zstandard.ZstdCompressor(level=level)
+            blocks, block_offsets = [], [0]
+            for start in range(0, len(encoded), block_size):
+                block = compressor.compress(b''.join(encoded[start:start + block_size]))
+                blocks.append(block)
+                block_offsets.append(block_offsets[-1] + len(block))
+            sections['text_blob'] = b''.join(blocks)
+            sections['block_offsets'] = np.asarray(block_offsets, dtype='<i8')
+        else:
+            sections['text_blob'] = b''.join(encoded)
+        sections['text_offsets'] = offsets
+
+        if metadata is not None:
+            for name, dtype in INT_COLUMNS.items():
+                sections[f'col.{name}'] = np.asarray(
+                    [m.get(name, -1) if m.get(name) is not None else -1 for m in metadata], dtype=dtype
+                )
+            for name in STRING_COLUMNS:
+                table: Dict[str, int] = {'': 0}
+                ids = np.asarray([table.setdefault(m.get(name) or '', len(table)) for m in metadata], dtype='<i4')
+                strings = [s.encode('utf-8') for s in table]  # dicts keep insertion order
+                string_offsets = np.zeros(len(strings) + 1, dtype='<i8')
+                np.cumsum([len(s) for s in strings], out=string_offsets[1:])
+                sections[f'col.{name}'] = ids
+                sections[f'strings.{name}.blob'] = b''.join(strings)
+                sections[f'strings.{name}.offsets'] = string_offsets
+
+        # Lay out sections after the header, each aligned for zero-copy numpy views
+        header = {
+            'format_version': FORMAT_VERSION,
+            'count': len(chunks),
+            'compression': compression,
+            'block_size': block_size if compression == 'zstd' else 0,
+            'documents': list(documents or []),
+            'sections': {}
+        }
+        # The header length determines where the data starts and the section
+        # offsets are part of the header, so lay out until the length settles.
+        # A shorter final header is padded with JSON whitespace.
+        header_bytes = json.dumps(header).encode('utf-8')
+        while True:
+            position = len(MAGIC) + 8 + len(header_bytes)
+            position += _pad(position)
+            for name, value in sections.items():
+                raw_len = len(value) if isinstance(value, bytes) else value.nbytes
+                header['sections'][name] = {
+                    'offset': position,
+                    'length': raw_len,
+                    'dtype': 'bytes' if isinstance(value, bytes) else value.dtype.str
+                }
+                position += raw_len + _pad(raw_len)
+            final = json.dumps(header).encode('utf-8')
+            if len(final) <= len(header_bytes):
+                header_bytes = final.ljust(len(header_bytes))
+                break
+            header_bytes = final
+
+        out = io.BytesIO()
+        out.write(MAGIC)
+        out.write(struct.pack('<Q', len(header_bytes)))
+        out.write(header_bytes)
+        for name, value in sections.items():
+            out.write(b'\0' * (header['sections'][name]['offset'] - out.tell()))
+            out.write(value if isinstance(value, bytes) else value.tobytes())
+        out.write(b'\0' * _pad(out.tell()))
+        return out.getvalue()
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self[i]
+
+    def __getitem__(self, i: int) -> str:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        i = int(i)
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("chunk index out of range")
+
+        if self.compression == 'zstd':
+            block_id = i // self.block_size
+            block = self._decoded_block(block_id)
+            base = int(self._offsets[block_id * self.block_size])
+            start, end = int(self._offsets[i]) - base, int(self._offsets[i + 1]) - base
+            return block[start:end].decode('utf-8')
+
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def _decoded_block(self, block_id: int) -> bytes:
+        """Decompress a block, keeping a few recently used blocks"""
+        with self._block_lock:
+            block = self._block_cache.get(block_id)
+            if block is not None:
+                self._block_cache.move_to_end(block_id)
+                return block
+
+        decompressor = getattr(self._decompressor, 'value', None)
+        if decompressor is None:
+            decompressor = self._decompressor.value = zstandard.ZstdDecompressor()
+        start, end = int(self._block_offsets[block_id]), int(self._block_offsets[block_id + 1])
+        first = block_id * self.block_size
+        last = min(first + self.block_size, self.count)
+        size = int(self._offsets[last] - self._offsets[first])
+        block = decompressor.decompress(bytes(self._blob[start:end]), max_output_size=size)
+
+        with self._block_lock:
+            self._block_cache[block_id] = block
+            if len(self._block_cache) > self._block_cache_size:
+                self._block_cache.popitem(last=False)
+        return block
+
+    def metadata(self, i: int) -> Dict:
+        """Metadata of one chunk as a dictionary"""
+        meta = {}
+        for name, column in self.columns.items():
+            if name in self._string_tables:
+                meta[name] = self._string_tables[name][int(column[i])]
+            else:
+                meta[name] = int(column[i])
+        if 'doc_id' in meta:
+            doc_id = meta['doc_id']
+            meta['document'] = self.documents[doc_id] if 0 <= doc_id < len(self.documents) else None
+        return meta
+
+    def string_mask(self, name: str, predicate) -> np.ndarray:
+        """
+        Boolean mask of the chunks whose string metadata satisfies a predicate
+
+        The predicate is called once per distinct value, not once per chunk.
+        """
+        table = self._string_tables[name]
+        matches = np.fromiter((bool(predicate(table[i])) for i in range(len(table))), dtype=bool, count=len(table))
+        return matches[self.columns[name]]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the underlying buffer"""
+        return len(self._view)
+
+    def close(self):
+        """
+        Release the underlying memory map
+
+        The map stays open while metadata arrays handed out by this store are
+        still referenced elsewhere; it is then released with the last reference.
+        """
+        self._sections = {}
+        self._offsets = self._blob = None
+        self.columns = {}
+        self._string_tables = {}
+        try:
+            self._view.release()
+            if self._owner is not None:
+                self._owner.close()
+        except BufferError:
+            pass
@@ -16,6 +16,10 @@ class Config:
     ALLOWED_AUDIO_EXTENSIONS = {'wav', 'mp3', 'ogg', 'webm', 'm4a'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
+    # RAG engine warm-up at startup: 'sync' (load in create_app, use with a
+    # preloading WSGI server such as gunicorn --preload), 'background' or 'off'
+    RAG_WARMUP = os.getenv('RAG_WARMUP', 'background')
+    
     # Admin credentials
     ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
     ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'me')
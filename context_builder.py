@@ -0,0 +1,255 @@
+"""
+Kerala Panchayat context builder
+Turns retrieved chunks into a compact prompt context within a token budget
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ungated Llama tokenizer; counts slightly more tokens than the Llama 3 models
+# served by Groq, so the budget errs on the safe side
+DEFAULT_TOKENIZER = "hf-internal-testing/llama-tokenizer"
+TOKENIZER_FILE = "tokenizer.json"
+
+# "--- Page N ---" markers inserted by ingest_pdf.extract_text_from_pdf
+PAGE_MARKER_RE = re.compile(r"^[ \t]*--- Page \d+ ---[ \t]*$\n?", re.MULTILINE)
+SENTENCE_END_RE = re.compile(r"(?<=[.;:!?])\s+|\n+")
+
+
+def clean_chunk(text: str) -> str:
+    """Remove page markers and redundant whitespace from a chunk"""
+    text = PAGE_MARKER_RE.sub("", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def load_tokenizer(name: str):
+    """
+    Load a tokenizers.Tokenizer without touching the network when possible
+
+    Args:
+        name: A tokenizer.json file, a directory containing one, or a Hugging Face
+              model id. A model id is read from the local Hugging Face cache if it
+              is there and only downloaded otherwise (never with HF_HUB_OFFLINE set).
+
+    Raises:
+        Exception: if the tokenizer cannot be loaded
+    """
+    from tokenizers import Tokenizer
+
+    if os.path.isdir(name):
+        name = os.path.join(name, TOKENIZER_FILE)
+    if os.path.isfile(name):
+        return Tokenizer.from_file(name)
+
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        cached = try_to_load_from_cache(name, TOKENIZER_FILE)
+    except ImportError:
+        cached = None
+    if isinstance(cached, str):
+        return Tokenizer.from_file(cached)
+    if os.getenv('HF_HUB_OFFLINE', '').lower() in ('1', 'true', 'yes'):
+        raise FileNotFoundError(f"{name} is not in the local Hugging Face cache and HF_HUB_OFFLINE is set")
+    return Tokenizer.from_pretrained(name)
+
+
+def overlap_length(first: str, second: str, min_overlap: int, max_overlap: int) -> int:
+    """Length of the longest suffix of first that is also a prefix of second (0 if below min_overlap)"""
+    for length in range(min(len(first), len(second), max_overlap), min_overlap - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+class ContextBuilder:
+    """
+    Build the LLM context from retrieved sections
+
+    - Page markers and redundant whitespace are removed.
+    - Chunks that overlap (the ingest splitter repeats chunk_overlap characters
+      between neighbours) or contain one another are merged into one passage.
+    - Long lines already present in an earlier passage are dropped.
+    - Passages are packed most relevant first until the token budget is used;
+      the last one is cut at a sentence boundary if it does not fit (at a word
+      within the budget if not even the first sentence of the first passage fits).
+    """
+
+    def __init__(self, token_budget: int = 1200, tokenizer_name: Optional[str] = DEFAULT_TOKENIZER,
+                 min_overlap: int = 20, max_overlap: int = 400):
+        """
+        Args:
+            token_budget: Maximum context tokens (0 disables the budget)
+            tokenizer_name: Tokenizer used to count tokens: a tokenizer.json file or its
+                            directory, or a Hugging Face model id (see load_tokenizer).
+                            None, or a tokenizer that cannot be loaded, estimates 4
+                            characters per token.
+            min_overlap: Shortest shared prefix/suffix treated as chunk overlap
+            max_overlap: Longest overlap searched for (at least the ingest chunk_overlap)
+        """
+        self.token_budget = token_budget
+        self.tokenizer_name = tokenizer_name
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+        self._tokenizer_failed = tokenizer_name is None
+
+    def _get_tokenizer(self):
+        """Load the tokenizer on first use, falling back to an estimate if it is unavailable"""
+        if self._tokenizer is None and not self._tokenizer_failed:
+            with self._tokenizer_lock:
+                if self._tokenizer is None and not self._tokenizer_failed:
+                    try:
+                        self._tokenizer = load_tokenizer(self.tokenizer_name)
+                    except Exception as e:
+                        logger.warning(f"Tokenizer {self.tokenizer_name} unavailable, "
+                                       f"estimating 4 characters per token: {e}")
+                        self._tokenizer_failed = True
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in text"""
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return (len(text) + 3) // 4
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def merge(self, sections: Sequence[Tuple[str, float]]) -> List[Dict]:
+        """
+        Merge overlapping sections into passages
+
+        Returns:
+            Passages as {'text': str, 'score': float}, ordered by their best score
+        """
+        passages: List[Dict] = []
+        for section, score in sections:
+            text = clean_chunk(section)
+            if text:
+                passages.append({'text': text, 'score': score})
+
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(passages)):
+                for j in range(i + 1, len(passages)):
+                    combined = self._combine(passages[i]['text'], passages[j]['text'])
+                    if combined is not None:
+                        passages[i] = {'text': combined, 'score': max(passages[i]['score'], passages[j]['score'])}
+                        del passages[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        passages.sort(key=lambda p: p['score'], reverse=True)
+        return self._drop_repeated_lines(passages)
+
+    def _combine(self, first: str, second: str) -> Optional[str]:
+        """The union of two passages if one contains or overlaps the other, else None"""
+        if second in first:
+            return first
+        if first in second:
+            return second
+        overlap = overlap_length(first, second, self.min_overlap, self.max_overlap)
+        if overlap:
+            return first + second[overlap:]
+        overlap = overlap_length(second, first, self.min_overlap, self.max_overlap)
+        if overlap:
+            return second + first[overlap:]
+        return None
+
+    @staticmethod
+    def _drop_repeated_lines(passages: List[Dict], min_length: int = 40) -> List[Dict]:
+        """Remove long lines that already appeared in a more relevant passage"""
+        seen = set()
+        result = []
+        for passage in passages:
+            lines = []
+            for line in passage['text'].split("\n"):
+                key = line.strip().lower()
+                if len(key) >= min_length:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                lines.append(line)
+            text = "\n".join(lines).strip()
+            if text:
+                result.append({'text': text, 'score': passage['score']})
+        return result
+
+    def build(self, sections: Sequence[Tuple[str, float]]) -> str:
+        """
+        Build the context string for the prompt
+
+        Args:
+            sections: (chunk text, relevance score) pairs, most relevant first
+
+        Returns:
+            Context text within the token budget
+        """
+        passages = self.merge(sections)
+        if self.token_budget <= 0:
+            return "\n\n".join(p['text'] for p in passages)
+
+        separator_tokens = self.count_tokens("\n\n")
+        remaining = self.token_budget
+        packed = []
+        for passage in passages:
+            cost = self.count_tokens(passage['text']) + (separator_tokens if packed else 0)
+            if cost <= remaining:
+                packed.append(passage['text'])
+                remaining -= cost
+                continue
+
+            # Fit as many whole sentences of this passage as possible, then stop
+            truncated = self._truncate(passage['text'], remaining - (separator_tokens if packed else 0))
+            if not truncated and not packed:
+                # Not even the first sentence fits; an empty context would be worse than a cut one
+                truncated = self._cut_tokens(passage['text'], remaining)
+            if truncated:
+                packed.append(truncated)
+            break
+
+        return "\n\n".join(packed)
+
+    def _truncate(self, text: str, budget: int) -> str:
+        """Longest prefix of text that ends at a sentence boundary and fits in budget tokens"""
+        if budget <= 0:
+            return ""
+        kept, used = [], 0
+        for sentence in SENTENCE_END_RE.split(text):
+            if not sentence:
+                continue
+            cost = self.count_tokens(sentence + " ")
+            if used + cost > budget:
+                break
+            kept.append(sentence)
+            used += cost
+        return " ".join(kept)
+
+    def _cut_tokens(self, text: str, budget: int) -> str:
+        """Longest prefix of text that ends at a word boundary and fits in about budget tokens"""
+        if budget <= 0:
+            return ""
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            cut = text[:budget * 4]
+        else:
+            offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= budget:
+                return text
+            cut = text[:offsets[budget - 1][1]]
+        if len(cut) < len(text) and not text[len(cut)].isspace():
+            # Drop the partial last word, unless it is the only one
+            words = cut.rsplit(None, 1)
+            if len(words) > 1:
+                cut = words[0]
+        return cut.rstrip()
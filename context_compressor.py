@@ -0,0 +1,101 @@
+"""
+Kerala Panchayat context compressor
+Keeps only the sentences of the retrieved chunks that answer the question
+"""
+
+import logging
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context_builder import SENTENCE_END_RE, clean_chunk
+
+logger = logging.getLogger(__name__)
+
+# Shorter fragments (list markers, stray numbers) are kept only as neighbours
+MIN_SENTENCE_CHARS = 20
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split a chunk into sentences after removing page markers"""
+    return [sentence.strip() for sentence in SENTENCE_END_RE.split(clean_chunk(text)) if sentence and sentence.strip()]
+
+
+class ExtractiveCompressor:
+    """
+    Extractive compression of retrieved sections
+
+    Every sentence of every section is embedded in one batched encode call and
+    scored against the query embedding. The max_sentences best sentences are
+    kept together with `neighbours` sentences on each side (from the same
+    section, so definitions and list headers stay attached), in their
+    original order. Sentences repeated across overlapping chunks are scored
+    once.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_sentences: int = 8,
+                 neighbours: int = 1):
+        """
+        Args:
+            encode_fn: Returns L2-normalized embeddings for a list of texts, in the
+                       query embedding space
+            max_sentences: Best-scoring sentences kept (before adding neighbours)
+            neighbours: Sentences kept on each side of a selected sentence
+        """
+        self.encode_fn = encode_fn
+        self.max_sentences = max(1, max_sentences)
+        self.neighbours = max(0, neighbours)
+
+    def compress(self, question: str, query_embedding: Optional[np.ndarray],
+                 sections: Sequence[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        """
+        Compress sections to their most relevant sentences
+
+        Args:
+            question: User's question (embedded with the sentences if query_embedding is None)
+            query_embedding: Normalized query embedding from retrieval, if computed
+            sections: (chunk text, relevance score) pairs
+
+        Returns:
+            (compressed text, original score) pairs; sections without kept sentences are dropped
+        """
+        section_sentences = [split_sentences(section) for section, _ in sections]
+
+        # Unique scoreable sentences, each embedded once
+        candidates, positions, seen = [], [], set()
+        for s, sentences in enumerate(section_sentences):
+            for i, sentence in enumerate(sentences):
+                key = sentence.lower()
+                if len(sentence) < MIN_SENTENCE_CHARS or key in seen:
+                    continue
+                seen.add(key)
+                candidates.append(sentence)
+                positions.append((s, i))
+
+        if len(candidates) <= self.max_sentences:
+            return list(sections)
+
+        texts = candidates if query_embedding is not None else [question] + candidates
+        embeddings = self.encode_fn(texts)
+        if query_embedding is None:
+            query_embedding, embeddings = embeddings[0], embeddings[1:]
+        scores = embeddings @ np.asarray(query_embedding, dtype='float32').reshape(-1)
+
+        keep = [set() for _ in sections]
+        for c in np.argsort(-scores, kind='stable')[:self.max_sentences]:
+            s, i = positions[c]
+            last = len(section_sentences[s]) - 1
+            keep[s].update(range(max(0, i - self.neighbours), min(last, i + self.neighbours) + 1))
+
+        compressed = []
+        for (_, score), sentences, kept in zip(sections, section_sentences, keep):
+            if not kept:
+                continue
+            parts, previous = [], None
+            for i in sorted(kept):
+                if previous is not None and i != previous + 1:
+                    parts.append("...")
+                parts.append(sentences[i])
+                previous = i
+            compressed.append((" ".join(parts), score))
+        return compressed
@@ -0,0 +1,281 @@
+"""
+Kerala Panchayat FAQ answer store
+Precomputed English and Malayalam answers for frequently asked questions,
+served without any model or translation calls
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from answer_cache import AnswerCache
+
+logger = logging.getLogger(__name__)
+
+FAQ_FORMAT_VERSION = 1
+DEFAULT_PATH = "faq_answers.json"
+
+# Words that change only the phrasing of a question. A near match may differ
+# from its FAQ in these words only; any other differing word (a content word
+# such as "demolition" vs "building", or a number) rules it out.
+FUNCTION_WORDS = frozenset("""
+a an the i we you my our me your do does did can could should would will shall may must
+how what when where which who whom whose why is are was were be been being am
+to of for in on at by with from about into as and or please tell explain know
+""".split())
+
+
+def tokens(text: str) -> frozenset:
+    """Normalized word set of a question"""
+    return frozenset(AnswerCache.normalize(text).split())
+
+
+def faq_questions(extra_path: Optional[str] = None) -> List[str]:
+    """
+    Curated FAQ list: the sample questions shown in the UI, plus one question
+    per line from extra_path (if None, reads RAG_FAQ_QUESTIONS_FILE)
+    """
+    from config import Config
+
+    questions = list(Config.SAMPLE_SERVICES)
+    extra_path = extra_path or os.getenv('RAG_FAQ_QUESTIONS_FILE')
+    if extra_path:
+        with open(extra_path, encoding='utf-8') as f:
+            questions += [line.strip() for line in f if line.strip()]
+    return list(dict.fromkeys(questions))
+
+
+def build_faq_store(rag, questions: Sequence[str], path: str = DEFAULT_PATH,
+                    translate_fn: Optional[Callable[[str], Optional[str]]] = None,
+                    num_sources: int = 3) -> Dict:
+    """
+    Answer every FAQ with the RAG engine and write the store
+
+    Args:
+        rag: KeralaPanchayatRAG instance serving the current corpus
+        questions: English FAQ questions
+        path: Output JSON file (replaced atomically)
+        translate_fn: English -> Malayalam translation (returns None on failure);
+                      without it only English answers are stored
+        num_sources: Sources retrieved per question
+
+    Returns:
+        The written store
+    """
+    entries = []
+    for question in questions:
+        response = rag.query(question, num_sources)
+        if not response.success or not response.sources:
+            print(f"⚠️  Skipping FAQ without a grounded answer: {question}")
+            continue
+
+        entry = {
+            'question_en': question,
+            'question_ml': None,
+            'answer_en': response.answer,
+            'answer_ml': None,
+            'sources': response.sources,
+            'source_details': response.source_details,
+            'confidence': response.confidence,
+            'model_used': response.model_used
+        }
+        if translate_fn is not None:
+            entry['question_ml'] = translate_fn(question)
+            entry['answer_ml'] = translate_fn(response.answer)
+            if not entry['answer_ml']:
+                print(f"⚠️  Malayalam translation failed, storing English only: {question}")
+        entries.append(entry)
+        print(f"✅ {question}")
+
+    store = {
+        'format_version': FAQ_FORMAT_VERSION,
+        'corpus_version': rag.corpus_version(),
+        'built_at': datetime.now(timezone.utc).isoformat(),
+        'entries': entries
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return store
+
+
+class FAQStore:
+    """
+    Read side of the FAQ answer store
+
+    Questions match an FAQ exactly after normalization. Both the English and
+    the Malayalam wording of each FAQ are matched. The file is reloaded when
+    it changes on disk, and nothing is served when it was built for a
+    different corpus version than the one the engine serves.
+
+    Near matches are off by default: similar questions often ask something
+    else ("demolition permit" vs "building permit"). When enabled, a near
+    match needs a word-set Jaccard similarity of at least min_jaccard, may
+    differ from the FAQ in FUNCTION_WORDS only, and needs an embedding
+    cosine similarity of at least min_similarity.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_jaccard: Optional[float] = None,
+                 encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 min_similarity: Optional[float] = None):
+        """
+        Args:
+            path: Store file (if None, reads RAG_FAQ_PATH, default faq_answers.json)
+            min_jaccard: Minimum word-set Jaccard similarity for a near match (if None,
+                         reads RAG_FAQ_MIN_JACCARD, default 1.0, which allows exact matches only)
+            encode_fn: Returns L2-normalized embeddings of texts; near matches are only
+                       served when it is given
+            min_similarity: Minimum embedding cosine similarity for a near match (if None,
+                            reads RAG_FAQ_MIN_SIMILARITY, default 0.95)
+        """
+        self.path = path or os.getenv('RAG_FAQ_PATH', DEFAULT_PATH)
+        if min_jaccard is None:
+            min_jaccard = float(os.getenv('RAG_FAQ_MIN_JACCARD', '1.0'))
+        if min_similarity is None:
+            min_similarity = float(os.getenv('RAG_FAQ_MIN_SIMILARITY', '0.95'))
+        self.min_jaccard = min_jaccard
+        self.min_similarity = min_similarity
+        self.encode_fn = encode_fn
+        if min_jaccard < 1.0 and encode_fn is None:
+            logger.warning("FAQ near matching needs an embedding function; serving exact matches only")
+
+        self._lock = threading.Lock()
+        self._mtime_ns = None
+        self._store: Dict = {}
+        self._exact: Dict[str, Dict] = {}
+        self._token_sets: List = []
+        self._stale_warned = None
+
+        self.hits_exact = 0
+        self.hits_near = 0
+        self.misses = 0
+
+    def _load_if_changed(self):
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            store, exact, token_sets = {}, {}, []
+            if mtime_ns is not None:
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        store = json.load(f)
+                    if store.get('format_version') != FAQ_FORMAT_VERSION:
+                        raise ValueError(f"unsupported format version {store.get('format_version')}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not load FAQ store {self.path}: {e}")
+                    store = {}
+            for entry in store.get('entries', []):
+                for question in (entry['question_en'], entry.get('question_ml')):
+                    if question:
+                        exact.setdefault(AnswerCache.normalize(question), entry)
+                        token_sets.append((tokens(question), question, entry))
+            self._store, self._exact, self._token_sets = store, exact, token_sets
+            self._mtime_ns = mtime_ns
+            if store:
+                logger.info(f"FAQ store loaded with {len(store['entries'])} answers "
+                            f"(corpus {store['corpus_version']})")
+
+    def lookup(self, question: str, corpus_version: str) -> Optional[Dict]:
+        """
+        Precomputed entry for a question, if any
+
+        Args:
+            question: User's question, in English or Malayalam
+            corpus_version: Version of the corpus currently served (KeralaPanchayatRAG.corpus_version)
+
+        Returns:
+            Entry with question_en/question_ml, answer_en/answer_ml (answer_ml may be
+            None), sources, confidence and model_used; None if no FAQ matches
+        """
+        self._load_if_changed()
+        store = self._store
+        if not store:
+            return None
+        if store['corpus_version'] != corpus_version:
+            if self._stale_warned != store['corpus_version']:
+                self._stale_warned = store['corpus_version']
+                logger.warning(f"FAQ store {self.path} was built for corpus {store['corpus_version']} "
+                               f"but {corpus_version} is served; rebuild it with 'flask rebuild-faq'")
+            return None
+
+        entry = self._exact.get(AnswerCache.normalize(question))
+        if entry is not None:
+            self.hits_exact += 1
+            return entry
+
+        if self.min_jaccard < 1.0 and self.encode_fn is not None:
+            entry = self._near_match(question)
+            if entry is not None:
+                self.hits_near += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def _near_match(self, question: str) -> Optional[Dict]:
+        """Best FAQ differing only in function words and close in embedding space, if any"""
+        words = tokens(question)
+        best, best_question, best_score = None, None, 0.0
+        for faq_words, faq_question, faq_entry in self._token_sets:
+            if not (words ^ faq_words) <= FUNCTION_WORDS:
+                continue
+            union = len(words | faq_words)
+            score = len(words & faq_words) / union if union else 0.0
+            if score > best_score:
+                best, best_question, best_score = faq_entry, faq_question, score
+        if best is None or best_score < self.min_jaccard:
+            return None
+
+        embeddings = np.asarray(self.encode_fn([question, best_question]), dtype='float32')
+        similarity = float(embeddings[0] @ embeddings[1])
+        if similarity < self.min_similarity:
+            logger.info(f"FAQ near match rejected (similarity {similarity:.3f}): {question!r} vs {best_question!r}")
+            return None
+        return best
+
+    def stats(self) -> Dict:
+        """Store version and hit/miss counters"""
+        self._load_if_changed()
+        return {
+            'path': self.path,
+            'entries': len(self._store.get('entries', [])),
+            'corpus_version': self._store.get('corpus_version'),
+            'built_at': self._store.get('built_at'),
+            'hits_exact': self.hits_exact,
+            'hits_near': self.hits_near,
+            'misses': self.misses
+        }
+
+
+_faq_store = None
+_faq_lock = threading.Lock()
+
+
+def get_faq_store() -> FAQStore:
+    """Get or create the FAQ store (thread-safe singleton)"""
+    global _faq_store
+    if _faq_store is None:
+        with _faq_lock:
+            if _faq_store is None:
+                _faq_store = FAQStore(encode_fn=_encode_questions)
+    return _faq_store
+
+
+def _encode_questions(texts: List[str]) -> np.ndarray:
+    """Question embeddings from the RAG engine's query encoder (used for near matches only)"""
+    from RAG_engine import get_rag_instance
+
+    return get_rag_instance()._encode_queries(texts)
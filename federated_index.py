@@ -0,0 +1,570 @@
+"""
+Kerala Panchayat federated corpus
+Several index bundles (one per legal corpus) searched in parallel and merged
+into one ranked list, ordered by calibrated scores
+"""
+
+import os
+import logging
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+import index_bundle
+from bm25_index import BM25Index
+from chunk_filter import ChunkFilter, FilteredIds, search_selected
+from chunk_store import ChunkStore
+from index_manager import IndexManager
+
+logger = logging.getLogger(__name__)
+
+# Representative questions across the corpora, used to measure each shard's
+# score distribution. RAG_CALIBRATION_QUESTIONS_FILE adds more (one per line).
+CALIBRATION_QUESTIONS = [
+    "How do I apply for a building permit from the Panchayat?",
+    "What are the functions of a Grama Panchayat?",
+    "How is property tax assessed and collected?",
+    "What are the setback requirements for a residential building?",
+    "How are members of the Panchayat elected?",
+    "What is the procedure for obtaining a birth certificate?",
+    "Who approves the budget of a Municipality?",
+    "What are the penalties for unauthorised construction?",
+    "How can a citizen file a complaint against a local body?",
+    "What licences are needed to run a shop?",
+    "What does the government order say about fees?",
+    "How is a Panchayat President removed from office?",
+]
+
+
+# Filters whose selected chunk ids are kept per loaded shard
+MAX_CACHED_FILTERS = 64
+
+
+class CorpusReplacedError(index_bundle.BundleError):
+    """Raised when a superseded generation needs a shard whose bundle version is no longer on disk"""
+
+
+def parse_corpora(spec: str) -> Dict[str, str]:
+    """
+    Parse a corpus list such as "raj_act=corpora/raj_act,building_rules=corpora/building_rules"
+
+    Entries without a name are named after their directory.
+    """
+    corpora = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, path = entry.partition('=')
+        if not sep:
+            name, path = os.path.basename(entry.rstrip(os.sep)), entry
+        corpora[name.strip()] = path.strip()
+    return corpora
+
+
+class LoadedShard:
+    """The search data of one corpus: FAISS index, chunk store and optional BM25 index"""
+
+    def __init__(self, shard: "CorpusShard", dimension: int, mmap: bool = True,
+                 check_checksums: bool = True):
+        bundle_dir, manifest, name = shard.data_dir, shard.manifest, shard.name
+        index_bundle.verify_files(bundle_dir, manifest, check_checksums=check_checksums)
+        self.index = index_bundle.read_index(index_bundle.bundle_file(bundle_dir, manifest, 'index'), mmap=mmap)
+        self.chunks = ChunkStore.open(index_bundle.bundle_file(bundle_dir, manifest, 'chunks'))
+        self.bm25 = None
+        if 'bm25' in manifest['files']:
+            self.bm25 = BM25Index.load(index_bundle.bundle_file(bundle_dir, manifest, 'bm25'))
+
+        if self.index.d != dimension:
+            raise index_bundle.BundleError(
+                f"Corpus '{name}' dimension mismatch: index {self.index.d}, embedding model {dimension}"
+            )
+        counts = {manifest['chunk_count'], self.index.ntotal, len(self.chunks)}
+        if self.bm25 is not None:
+            counts.add(self.bm25.num_docs)
+        if len(counts) != 1:
+            raise index_bundle.BundleError(
+                f"Corpus '{name}' chunk count mismatch: manifest {manifest['chunk_count']}, "
+                f"index {self.index.ntotal}, chunks {len(self.chunks)}"
+            )
+
+        # Size of the data files: an estimate of the shard's memory once fully paged
+        # in (mapped pages are only resident when touched), used for the budget
+        self.file_bytes = sum(info['bytes'] for info in manifest['files'].values())
+        self._filtered: Dict[ChunkFilter, FilteredIds] = {}
+
+    def filtered(self, chunk_filter: ChunkFilter) -> FilteredIds:
+        """The chunks of this shard a filter selects (cached per filter)"""
+        selected = self._filtered.get(chunk_filter)
+        if selected is None:
+            if len(self._filtered) >= MAX_CACHED_FILTERS:
+                self._filtered.clear()
+            selected = self._filtered[chunk_filter] = FilteredIds(chunk_filter.mask(self.chunks))
+        return selected
+
+    def close(self):
+        self.chunks.close()
+        self.index = self.bm25 = None
+
+
+class CorpusShard:
+    """
+    One corpus: an index bundle, described by its manifest
+
+    The search data is loaded on first use through the corpus' IndexManager
+    (see FederatedCorpus.open) and may be evicted again under memory pressure.
+    """
+
+    def __init__(self, name: str, bundle_dir: str, embedding_model: str, dimension: int):
+        # The version directory behind the published symlink; it keeps this
+        # version's files even after a newer bundle is published
+        data_dir = os.path.realpath(bundle_dir)
+        manifest = index_bundle.read_manifest(data_dir)
+        if manifest['embedding_model'] != embedding_model:
+            raise index_bundle.BundleError(
+                f"Corpus '{name}' was built with '{manifest['embedding_model']}' but the engine uses '{embedding_model}'"
+            )
+        if manifest['dimension'] != dimension:
+            raise index_bundle.BundleError(
+                f"Corpus '{name}' dimension mismatch: manifest {manifest['dimension']}, embedding model {dimension}"
+            )
+
+        self.name = name
+        self.bundle_dir = bundle_dir
+        self.data_dir = data_dir
+        self.manifest = manifest
+        self.size = manifest['chunk_count']
+        self.has_bm25 = 'bm25' in manifest['files']
+        self.manifest_mtime_ns = os.stat(index_bundle.manifest_path(bundle_dir)).st_mtime_ns
+
+        self.offset = 0          # First global chunk id, set by FederatedCorpus
+        self.scale = 1.0         # Score calibration: calibrated = scale * score + bias
+        self.bias = 0.0
+        self.nprobe = None       # Search parameters, applied when the index is loaded
+        self.ef_search = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Identity of the loaded data in the index manager"""
+        return self.name, self.manifest['bundle_version']
+
+    def is_stale(self) -> bool:
+        """Whether the bundle directory now holds a different bundle"""
+        try:
+            return os.stat(index_bundle.manifest_path(self.bundle_dir)).st_mtime_ns != self.manifest_mtime_ns
+        except OSError:
+            return False
+
+    def configure(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Set search parameters, falling back to the ones recorded in the bundle"""
+        search_params = self.manifest.get('index_config', {}).get('search_params', {})
+        self.nprobe = nprobe or search_params.get('nprobe')
+        self.ef_search = ef_search or search_params.get('efSearch')
+
+    def search(self, data: LoadedShard, queries: np.ndarray, k: int,
+               chunk_filter: Optional[ChunkFilter] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw top-k search of the loaded index with this shard's search parameters"""
+        ivf = faiss.try_extract_index_ivf(data.index)
+        if ivf is not None and self.nprobe:
+            ivf.nprobe = int(self.nprobe)
+        if hasattr(data.index, 'hnsw') and self.ef_search:
+            data.index.hnsw.efSearch = int(self.ef_search)
+        if chunk_filter is not None:
+            return search_selected(data.index, queries, min(k, self.size), data.filtered(chunk_filter))
+        return data.index.search(queries, min(k, self.size))
+
+    def calibrated(self, scores: np.ndarray) -> np.ndarray:
+        return np.where(np.isfinite(scores), scores * self.scale + self.bias, scores).astype('float32')
+
+
+class FederatedChunks:
+    """Read-only sequence of the chunks of all shards, addressed by global chunk id"""
+
+    def __init__(self, corpus: "FederatedCorpus"):
+        self._corpus = corpus
+
+    def __len__(self) -> int:
+        return self._corpus.ntotal
+
+    def __getitem__(self, i: int) -> str:
+        shard, local = self._corpus.locate(i)
+        with self._corpus.open(shard) as data:
+            return data.chunks[local]
+
+    def __iter__(self):
+        for shard in self._corpus.shards:
+            with self._corpus.open(shard) as data:
+                yield from data.chunks
+
+    def metadata(self, i: int) -> Dict:
+        """Metadata of one chunk, including the name of its corpus"""
+        shard, local = self._corpus.locate(i)
+        with self._corpus.open(shard) as data:
+            return {**data.chunks.metadata(local), 'corpus': shard.name}
+
+
+class FederatedIndex:
+    """
+    Parallel search over the shard indexes
+
+    Supports the parts of the FAISS index API the engine uses (d, ntotal,
+    search, reconstruct_batch), plus an optional corpus subset. Each shard is
+    searched in its own thread (FAISS releases the GIL during search) and the
+    top k are merged by their per-shard calibrated scores. The calibration
+    only decides the order; hits keep their raw cosine similarity, so score
+    thresholds and confidence mean the same as with a single corpus.
+    """
+
+    def __init__(self, corpus: "FederatedCorpus"):
+        self._corpus = corpus
+        self.d = corpus.dimension
+        self.ntotal = corpus.ntotal
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=len(self._corpus.shards),
+                                                        thread_name_prefix='rag-shard')
+        return self._executor
+
+    def reset_after_fork(self):
+        """Threads do not survive fork; start a new pool on next use"""
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def search(self, queries: np.ndarray, k: int, corpora: Optional[Iterable[str]] = None,
+               chunk_filter: Optional[ChunkFilter] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the selected shards (all if corpora is None) and merge their top k
+
+        A chunk filter is applied inside each shard's search.
+
+        Returns:
+            (raw scores, global chunk ids) in calibrated order, padded with -inf / -1 like FAISS
+        """
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        shards = self._corpus.select(corpora)
+
+        def search_shard(shard: CorpusShard):
+            with self._corpus.open(shard) as data:
+                scores, ids = shard.search(data, queries, k, chunk_filter)
+            return scores, shard.calibrated(scores), np.where(ids >= 0, ids + shard.offset, -1)
+
+        if len(shards) == 1:
+            results = [search_shard(shards[0])]
+        else:
+            results = list(self._get_executor().map(search_shard, shards))
+
+        ids = np.concatenate([i for _, _, i in results], axis=1)
+        scores = np.where(ids >= 0, np.concatenate([s for s, _, _ in results], axis=1), -np.inf)
+        calibrated = np.where(ids >= 0, np.concatenate([c for _, c, _ in results], axis=1), -np.inf)
+        if scores.shape[1] < k:
+            pad = ((0, 0), (0, k - scores.shape[1]))
+            scores = np.pad(scores, pad, constant_values=-np.inf)
+            calibrated = np.pad(calibrated, pad, constant_values=-np.inf)
+            ids = np.pad(ids, pad, constant_values=-1)
+
+        order = np.argsort(-calibrated, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def reconstruct_batch(self, ids) -> np.ndarray:
+        vectors = np.zeros((len(ids), self.d), dtype='float32')
+        for row, i in enumerate(ids):
+            shard, local = self._corpus.locate(int(i))
+            with self._corpus.open(shard) as data:
+                vectors[row] = data.index.reconstruct(local)
+        return vectors
+
+
+class FederatedBM25:
+    """
+    Lexical search over the shards that have a BM25 index
+
+    Raw BM25 scores are not comparable across shards (idf and length
+    normalization depend on each corpus), so the shards' results are
+    rank-fused: hits are interleaved by their rank within their shard, ties
+    broken by score relative to the shard's best hit, and that relative
+    score is returned. The engine uses lexical hits for their rank
+    (reciprocal-rank fusion) and the top-1/top-2 ratio; with several
+    matching shards the ratio is 1, so the lexical shortcut is left to
+    queries only one corpus matches.
+    """
+
+    def __init__(self, corpus: "FederatedCorpus"):
+        self._corpus = corpus
+        self.num_docs = corpus.ntotal
+
+    def search(self, query: str, k: int = 10, corpora: Optional[Iterable[str]] = None,
+               chunk_filter: Optional[ChunkFilter] = None) -> Tuple[np.ndarray, np.ndarray]:
+        scores, ranks, ids = [], [], []
+        for shard in self._corpus.select(corpora):
+            if not shard.has_bm25:
+                continue
+            with self._corpus.open(shard) as data:
+                mask = data.filtered(chunk_filter).mask if chunk_filter is not None else None
+                shard_scores, shard_ids = data.bm25.search(query, k, mask)
+            if len(shard_ids) == 0:
+                continue
+            scores.append(shard_scores / shard_scores[0])
+            ranks.append(np.arange(len(shard_ids)))
+            ids.append(shard_ids + shard.offset)
+        if not scores:
+            return np.zeros(0, dtype='float32'), np.zeros(0, dtype='int64')
+        scores, ranks, ids = np.concatenate(scores), np.concatenate(ranks), np.concatenate(ids)
+        order = np.lexsort((-scores, ranks))[:k]
+        return scores[order].astype('float32'), ids[order]
+
+
+class FederatedCorpus:
+    """
+    Several corpora presented as one
+
+    Chunk ids are global: shard i owns ids [offset_i, offset_i + size_i).
+    Only the manifests are read up front; each shard's search data is loaded
+    on first use and kept resident within the IndexManager's memory budget.
+    """
+
+    def __init__(self, corpora: Dict[str, str], embedding_model: str, dimension: int,
+                 mmap: bool = True, check_checksums: bool = True,
+                 manager: Optional[IndexManager] = None):
+        """
+        Args:
+            corpora: Corpus name -> bundle directory
+            embedding_model: Embedding model every bundle must have been built with
+            dimension: Embedding dimension of that model
+            mmap: Memory-map the shard indexes
+            check_checksums: Verify bundle file checksums when a shard is loaded
+            manager: Index manager holding the loaded shards (default: a new one
+                     with the RAG_INDEX_MEMORY_BUDGET_MB budget)
+        """
+        if not corpora:
+            raise ValueError("No corpora configured")
+        self.corpora = dict(corpora)
+        self.embedding_model = embedding_model
+        self.dimension = dimension
+        self.mmap = mmap
+        self.check_checksums = check_checksums
+        self.manager = manager or IndexManager()
+
+        self.shards: List[CorpusShard] = []
+        offset = 0
+        for name, bundle_dir in self.corpora.items():
+            shard = CorpusShard(name, bundle_dir, embedding_model, dimension)
+            shard.offset = offset
+            offset += shard.size
+            self.shards.append(shard)
+            logger.info(f"Corpus '{name}' bundle {shard.manifest['bundle_version']} registered with "
+                        f"{shard.size} document sections")
+
+        self.ntotal = offset
+        self._offsets = np.array([shard.offset for shard in self.shards], dtype='int64')
+        self._by_name = {shard.name: shard for shard in self.shards}
+        self.score_target = None  # Pooled (mean, std) the shard scores are calibrated to
+
+        self.index = FederatedIndex(self)
+        self.chunks = FederatedChunks(self)
+        self.bm25 = FederatedBM25(self) if any(shard.has_bm25 for shard in self.shards) else None
+
+        # Shards replaced by a newer generation (see reload): key -> data owned by this generation
+        self._replaced: Dict[Tuple[str, str], Optional[LoadedShard]] = {}
+        self._replaced_lock = threading.Lock()
+
+    @property
+    def names(self) -> List[str]:
+        return [shard.name for shard in self.shards]
+
+    @property
+    def version(self) -> str:
+        """Combined version of all shards"""
+        return ",".join(f"{shard.name}@{shard.manifest['bundle_version']}" for shard in self.shards)
+
+    def manifest_paths(self) -> List[str]:
+        return [index_bundle.manifest_path(shard.bundle_dir) for shard in self.shards]
+
+    def open(self, shard: CorpusShard):
+        """
+        Use a shard's search data, loading it if it is not resident
+
+        Returns a context manager yielding the LoadedShard; the data is not
+        evicted or closed while the with-block runs. Shards this generation
+        has been superseded for are served from the data it took over.
+
+        Raises:
+            CorpusReplacedError: if the shard was replaced and its old version
+                                 is neither resident nor on disk any more
+        """
+        if shard.key in self._replaced:
+            return nullcontext(self._replaced_data(shard))
+        return self.manager.acquire(shard.key, lambda: self._load(shard))
+
+    def _load(self, shard: CorpusShard) -> LoadedShard:
+        try:
+            version = index_bundle.read_manifest(shard.data_dir)['bundle_version']
+        except (index_bundle.BundleError, OSError, ValueError):
+            version = None
+        if version != shard.manifest['bundle_version']:
+            raise CorpusReplacedError(
+                f"Corpus '{shard.name}' bundle {shard.manifest['bundle_version']} has been replaced on disk"
+            )
+        return LoadedShard(shard, self.dimension, self.mmap, self.check_checksums)
+
+    def _replaced_data(self, shard: CorpusShard) -> LoadedShard:
+        """Data of a replaced shard, loaded outside the index manager if it was not resident"""
+        with self._replaced_lock:
+            data = self._replaced[shard.key]
+            if data is None:
+                data = self._replaced[shard.key] = self._load(shard)
+            return data
+
+    def locate(self, i: int) -> Tuple[CorpusShard, int]:
+        """Shard and local chunk id of a global chunk id"""
+        if not 0 <= i < self.ntotal:
+            raise IndexError(f"Chunk id {i} out of range")
+        s = int(np.searchsorted(self._offsets, i, side='right')) - 1
+        return self.shards[s], i - self.shards[s].offset
+
+    def select(self, corpora: Optional[Iterable[str]] = None) -> List[CorpusShard]:
+        """Shards for a corpus subset (all if None)"""
+        if corpora is None:
+            return self.shards
+        unknown = [name for name in corpora if name not in self._by_name]
+        if unknown:
+            raise ValueError(f"Unknown corpora {unknown}; available: {self.names}")
+        selected = set(corpora)
+        return [shard for shard in self.shards if shard.name in selected]
+
+    def configure(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        for shard in self.shards:
+            shard.configure(nprobe, ef_search)
+
+    def is_stale(self) -> bool:
+        """Whether any corpus bundle has been re-published since it was registered"""
+        return any(shard.is_stale() for shard in self.shards)
+
+    def reload(self) -> "FederatedCorpus":
+        """
+        Register the bundles currently on disk as a new generation
+
+        Unchanged corpora keep their loaded data and score calibration (search
+        parameters must be configured again). The data of replaced bundles is
+        retired from the index manager and taken over by this generation, so
+        requests still pinned to it keep searching the version they started
+        on: resident data is kept, other shards are loaded from their version
+        directory if it is still on disk. It is released with this generation
+        once no request references it any more.
+
+        Returns:
+            The new generation (this one keeps serving its pinned requests)
+        """
+        reloaded = FederatedCorpus(self.corpora, self.embedding_model, self.dimension,
+                                   self.mmap, self.check_checksums, self.manager)
+        reloaded.score_target = self.score_target
+        for shard in reloaded.shards:
+            previous = self._by_name.get(shard.name)
+            if previous is not None and previous.key == shard.key:
+                shard.scale, shard.bias = previous.scale, previous.bias
+        for shard in self.shards:
+            if shard.key != reloaded._by_name[shard.name].key:
+                logger.info(f"Corpus '{shard.name}' bundle {shard.manifest['bundle_version']} replaced by "
+                            f"{reloaded._by_name[shard.name].manifest['bundle_version']}")
+                # Mark it first so this generation stops loading it into the manager
+                with self._replaced_lock:
+                    self._replaced.setdefault(shard.key, None)
+                data = self.manager.retire(shard.key)
+                with self._replaced_lock:
+                    if self._replaced[shard.key] is None:
+                        self._replaced[shard.key] = data
+        return reloaded
+
+    def calibrate(self, query_embeddings: np.ndarray, k: int = 5, max_scale: float = 2.0,
+                  corpora: Optional[Iterable[str]] = None):
+        """
+        Fit per-shard score calibration from representative queries
+
+        Raw similarities are not comparable across shards: a corpus of short,
+        uniform government orders scores every query higher than the Act does,
+        and approximate or quantized indexes shift scores too. Each shard's
+        top-k scores over the calibration queries are mapped linearly to the
+        mean and spread of all shards' scores together, so one shard cannot
+        crowd out the others merely by its score level.
+
+        Args:
+            query_embeddings: Normalized embeddings of the calibration questions
+            k: Scores sampled per query and shard
+            max_scale: Bound on the calibration scale (and its inverse)
+            corpora: Re-fit only these shards against the existing pooled target
+                     (after a reload); None fits all shards and the target
+        """
+        if len(self.shards) < 2:
+            return
+        shards = self.shards if corpora is None or self.score_target is None else self.select(corpora)
+        samples = {}
+        for shard in shards:
+            with self.open(shard) as data:
+                scores, ids = shard.search(data, query_embeddings, k)
+            samples[shard.name] = scores[ids >= 0]
+
+        if shards is self.shards:
+            pooled = np.concatenate(list(samples.values()))
+            if pooled.size < 2:
+                return
+            self.score_target = (float(pooled.mean()), float(pooled.std()))
+        mean, std = self.score_target
+
+        for shard in shards:
+            values = samples[shard.name]
+            if values.size < 2:
+                continue
+            shard_std = float(values.std())
+            scale = std / shard_std if shard_std > 1e-6 else 1.0
+            shard.scale = float(np.clip(scale, 1.0 / max_scale, max_scale))
+            shard.bias = mean - shard.scale * float(values.mean())
+            logger.info(f"Corpus '{shard.name}' score calibration: x{shard.scale:.3f} {shard.bias:+.3f}")
+
+    def stats(self) -> Dict:
+        """
+        Memory budget, loaded file bytes and per-corpus version, residency and calibration
+
+        Byte counts are data file sizes, the estimate the budget is enforced on
+        (see IndexManager), not measured memory.
+        """
+        resident = {entry['key']: entry for entry in self.manager.stats()}
+        corpora = []
+        for shard in self.shards:
+            entry = resident.get(shard.key, {})
+            corpora.append({
+                'corpus': shard.name,
+                'bundle_version': shard.manifest['bundle_version'],
+                'chunks': shard.size,
+                'index_type': shard.manifest.get('index_type'),
+                'file_bytes': sum(info['bytes'] for info in shard.manifest['files'].values()),
+                'resident': entry.get('resident', False),
+                'in_use': entry.get('in_use', 0),
+                'loads': entry.get('loads', 0),
+                'evictions': entry.get('evictions', 0),
+                'last_used': entry.get('last_used'),
+                'scale': shard.scale,
+                'bias': shard.bias
+            })
+        return {
+            'budget_bytes': self.manager.budget_bytes,
+            'loaded_file_bytes': self.manager.loaded_file_bytes,
+            'corpora': corpora
+        }
+
+
+def calibration_questions() -> List[str]:
+    """Built-in calibration questions plus any from RAG_CALIBRATION_QUESTIONS_FILE"""
+    questions = list(CALIBRATION_QUESTIONS)
+    path = os.getenv('RAG_CALIBRATION_QUESTIONS_FILE')
+    if path:
+        with open(path, encoding='utf-8') as f:
+            questions += [line.strip() for line in f if line.strip()]
+    return questions
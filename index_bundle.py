@@ -0,0 +1,211 @@
+"""
+Kerala Panchayat index bundle
+Versioned on-disk bundle holding the FAISS index, the chunks and a manifest tying them together
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import faiss
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.kpc"
+BM25_FILE = "bm25.npz"
+
+
+class BundleError(ValueError):
+    """Raised when a bundle is missing, corrupt or does not match the engine"""
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(bundle_dir: str) -> str:
+    return os.path.join(bundle_dir, MANIFEST_NAME)
+
+
+def is_bundle(path: Optional[str]) -> bool:
+    """Whether path is a directory containing a bundle manifest"""
+    return bool(path) and os.path.isfile(manifest_path(path))
+
+
+def write_manifest(bundle_dir: str, files: Dict[str, str], embedding_model: str,
+                   dimension: int, chunk_count: int, index_config: Optional[Dict] = None,
+                   extra: Optional[Dict] = None) -> Dict:
+    """
+    Write the manifest of a bundle whose data files are already in place
+
+    Args:
+        bundle_dir: Bundle directory
+        files: Role -> file name inside the bundle (e.g. {'index': 'index.faiss'})
+        embedding_model: Name of the sentence embedding model used for the vectors
+        dimension: Embedding dimension
+        chunk_count: Number of chunks (must equal the number of index vectors)
+        index_config: Index build metadata (type, build and search parameters)
+        extra: Additional manifest fields
+
+    Returns:
+        The manifest dictionary
+    """
+    index_config = index_config or {}
+    built_at = datetime.now(timezone.utc)
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'bundle_version': built_at.strftime("%Y%m%dT%H%M%S%fZ"),
+        'built_at': built_at.isoformat(),
+        'embedding_model': embedding_model,
+        'dimension': int(dimension),
+        'chunk_count': int(chunk_count),
+        'index_type': index_config.get('index_type', 'flat'),
+        'index_config': index_config,
+        'files': {}
+    }
+    for role, name in files.items():
+        path = os.path.join(bundle_dir, name)
+        manifest['files'][role] = {
+            'path': name,
+            'bytes': os.path.getsize(path),
+            'sha256': file_sha256(path)
+        }
+    if extra:
+        manifest.update(extra)
+
+    with open(manifest_path(bundle_dir), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def versions_dir(bundle_dir: str) -> str:
+    """Directory holding the published versions behind the bundle_dir symlink"""
+    return f"{bundle_dir.rstrip(os.sep)}.versions"
+
+
+def publish_bundle(staging_dir: str, bundle_dir: str, keep: int = 2):
+    """
+    Move a fully written staging directory into place
+
+    bundle_dir is a symlink to <bundle_dir>.versions/<bundle_version>. The
+    staging directory is renamed to its version directory and the symlink
+    is then replaced with a single rename, so readers always see either the
+    old or the new bundle, never none and never a half-written one. Readers
+    that resolved the link before the switch keep reading the old version
+    directory, which is kept until `keep` newer versions have been published.
+
+    A plain bundle directory left by an older release is moved into the
+    versions directory first; that one switch is not atomic.
+
+    Args:
+        staging_dir: Fully written bundle directory (with manifest)
+        bundle_dir: Bundle path the engine is configured with
+        keep: Version directories to keep, including the new one
+    """
+    bundle_dir = bundle_dir.rstrip(os.sep)
+    versions = versions_dir(bundle_dir)
+    os.makedirs(versions, exist_ok=True)
+    version = read_manifest(staging_dir)['bundle_version']
+    os.replace(staging_dir, os.path.join(versions, version))
+
+    if os.path.isdir(bundle_dir) and not os.path.islink(bundle_dir):
+        try:
+            previous = read_manifest(bundle_dir)['bundle_version']
+        except (BundleError, OSError, ValueError):
+            previous = f"00000000T000000000000Z-unversioned-{int(time.time())}"
+        os.replace(bundle_dir, os.path.join(versions, previous))
+
+    link = f"{bundle_dir}.link-{os.getpid()}"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.join(os.path.basename(versions), version), link)
+    os.replace(link, bundle_dir)
+
+    # Version names are UTC timestamps, so they sort by age
+    for old in sorted(os.listdir(versions))[:-keep] if keep > 0 else []:
+        if old != version:
+            shutil.rmtree(os.path.join(versions, old), ignore_errors=True)
+
+
+def read_manifest(bundle_dir: str) -> Dict:
+    """Read and sanity-check a bundle manifest"""
+    path = manifest_path(bundle_dir)
+    if not os.path.exists(path):
+        raise BundleError(f"Bundle manifest not found at {path}")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format version {manifest.get('format_version')} "
+                          f"(expected {BUNDLE_FORMAT_VERSION})")
+    return manifest
+
+
+def bundle_file(bundle_dir: str, manifest: Dict, role: str) -> str:
+    """Absolute path of a data file listed in the manifest"""
+    try:
+        return os.path.join(bundle_dir, manifest['files'][role]['path'])
+    except KeyError:
+        raise BundleError(f"Bundle at {bundle_dir} has no '{role}' file")
+
+
+def verify_files(bundle_dir: str, manifest: Dict, check_checksums: bool = True):
+    """
+    Check that every data file exists with the recorded size and checksum
+
+    Raises:
+        BundleError: if a file is missing or differs from the manifest
+    """
+    for role, info in manifest.get('files', {}).items():
+        path = os.path.join(bundle_dir, info['path'])
+        if not os.path.exists(path):
+            raise BundleError(f"Bundle file '{role}' missing: {path}")
+        size = os.path.getsize(path)
+        if size != info['bytes']:
+            raise BundleError(f"Bundle file '{role}' has {size} bytes, manifest says {info['bytes']}")
+        if check_checksums and file_sha256(path) != info['sha256']:
+            raise BundleError(f"Bundle file '{role}' checksum does not match the manifest")
+
+
+def read_index(path: str, mmap: bool = True) -> faiss.Index:
+    """
+    Open a FAISS index, memory-mapped when possible
+
+    Memory-mapped indexes are served from the OS page cache, so every worker
+    process on the machine shares the same physical pages. IO_FLAG_MMAP_IFC
+    maps the stored vectors of flat-code indexes (Flat, HNSW storage, IVF
+    lists) in place; IO_FLAG_MMAP alone only maps IVF inverted lists, so it
+    is tried second. Index types that FAISS cannot map are read into memory.
+
+    IVF indexes get a direct map (8 bytes per vector), so reconstruct_batch
+    works on every index type the engine loads; the engine reconstructs
+    vectors to score hits that only the lexical search found.
+    """
+    index = None
+    if mmap:
+        for flag, name in ((faiss.IO_FLAG_MMAP_IFC, 'IO_FLAG_MMAP_IFC'), (faiss.IO_FLAG_MMAP, 'IO_FLAG_MMAP')):
+            try:
+                index = faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+                break
+            except RuntimeError as e:
+                logger.info(f"{name} not supported for {path}: {e}")
+        else:
+            logger.warning(f"Memory-mapped load not supported for {path}, reading into memory")
+    if index is None:
+        index = faiss.read_index(path)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index
@@ -0,0 +1,186 @@
+"""
+Kerala Panchayat index manager
+Loads corpora on first use and keeps the resident ones within a memory budget,
+evicting the least recently used
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """A loaded resource with its file size, reference count and usage counters"""
+
+    def __init__(self, key: Hashable, resource, file_bytes: int):
+        self.key = key
+        self.resource = resource
+        self.file_bytes = file_bytes
+        self.refs = 0
+        self.hits = 0
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+
+class IndexManager:
+    """
+    LRU cache of loaded corpora under a memory budget
+
+    Resources are loaded by a caller-supplied loader on first use and must
+    provide `file_bytes` and `close()`. The budget is enforced on file_bytes,
+    the size of the files a resource maps: an estimate of its memory once
+    fully paged in, not a measurement. Memory-mapped pages only become
+    resident when touched and are shared with other processes mapping the
+    same files, so actual per-process memory is usually lower. Callers hold a resource
+    only inside `acquire`, which counts references: only idle resources are
+    evicted and closed, so queries in flight finish on the data they started
+    with. Retired resources are handed back to the caller instead. When every
+    resident resource is in use the budget is exceeded temporarily rather
+    than failing a request.
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None):
+        """
+        Args:
+            budget_bytes: Budget on the file_bytes of the loaded resources (if None, reads
+                          RAG_INDEX_MEMORY_BUDGET_MB; 0 or unset means unlimited)
+        """
+        if budget_bytes is None:
+            budget_bytes = int(float(os.getenv('RAG_INDEX_MEMORY_BUDGET_MB', '0')) * 1024 * 1024)
+        self.budget_bytes = max(0, budget_bytes)
+
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._counters: Dict[Hashable, Dict[str, int]] = {}
+        self._retired = set()
+
+    def reset_after_fork(self):
+        """Locks held by other threads at fork() time would never be released"""
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @property
+    def loaded_file_bytes(self) -> int:
+        with self._lock:
+            return self._loaded_file_bytes()
+
+    def _loaded_file_bytes(self) -> int:
+        return sum(entry.file_bytes for entry in self._entries.values())
+
+    def _counter(self, key: Hashable) -> Dict[str, int]:
+        return self._counters.setdefault(key, {'loads': 0, 'evictions': 0})
+
+    @contextmanager
+    def acquire(self, key: Hashable, loader: Callable[[], object]) -> Iterator:
+        """
+        Use a resource, loading it if it is not resident
+
+        Args:
+            key: Resource identity (e.g. corpus name and bundle version)
+            loader: Returns the loaded resource
+
+        Yields:
+            The resource; it stays open until the with-block exits
+        """
+        entry = self._checkout(key, loader)
+        try:
+            yield entry.resource
+        finally:
+            self._release(entry)
+
+    def _checkout(self, key: Hashable, loader: Callable[[], object]) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._touch(entry)
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the main lock so other corpora stay usable; concurrent
+        # requests for the same corpus wait for one load
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._touch(entry)
+
+            start = time.time()
+            resource = loader()
+            entry = _Entry(key, resource, int(resource.file_bytes))
+
+            with self._lock:
+                self._counter(key)['loads'] += 1
+                if key in self._retired:
+                    # Superseded while loading: this caller's copy only, never managed
+                    entry.refs += 1
+                    return entry
+                self._entries[key] = entry
+                self._touch(entry)
+                self._evict_over_budget()
+            logger.info(f"Loaded {key} ({entry.file_bytes / 1024 / 1024:.1f} MB of files) in "
+                        f"{time.time() - start:.2f}s; {self.loaded_file_bytes / 1024 / 1024:.1f} MB loaded")
+            return entry
+
+    def _touch(self, entry: _Entry) -> _Entry:
+        entry.refs += 1
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._entries.move_to_end(entry.key)
+        return entry
+
+    def _release(self, entry: _Entry):
+        with self._lock:
+            entry.refs -= 1
+
+    def _evict_over_budget(self):
+        """Evict idle resources, least recently used first (called with the lock held)"""
+        if not self.budget_bytes:
+            return
+        loaded = self._loaded_file_bytes()
+        for entry in list(self._entries.values()):
+            if loaded <= self.budget_bytes:
+                return
+            if entry.refs > 0:
+                continue
+            del self._entries[entry.key]
+            self._counter(entry.key)['evictions'] += 1
+            entry.resource.close()
+            loaded -= entry.file_bytes
+            logger.info(f"Evicted {entry.key} ({entry.file_bytes / 1024 / 1024:.1f} MB) to stay within "
+                        f"the {self.budget_bytes / 1024 / 1024:.0f} MB index budget")
+        if loaded > self.budget_bytes:
+            logger.warning(f"Loaded indexes ({loaded / 1024 / 1024:.1f} MB) exceed the "
+                           f"{self.budget_bytes / 1024 / 1024:.0f} MB budget while in use")
+
+    def retire(self, key: Hashable):
+        """
+        Stop managing a resource that has been superseded (e.g. by a re-ingested bundle)
+
+        The resource is not closed: requests may still be using it, and the
+        caller takes it over (see FederatedCorpus.reload).
+
+        Returns:
+            The resource, or None if it was not resident
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._load_locks.pop(key, None)
+            self._retired.add(key)
+        return entry.resource if entry is not None else None
+
+    def stats(self) -> List[Dict]:
+        """Residency, use and load/eviction counters of every key loaded so far"""
+        with self._lock:
+            resident = {key: {'resident': True, 'file_bytes': entry.file_bytes, 'in_use': entry.refs,
+                              'hits': entry.hits, 'loaded_at': entry.loaded_at,
+                              'last_used': entry.last_used}
+                        for key, entry in self._entries.items()}
+            return [{'key': key, **resident.get(key, {'resident': False, 'file_bytes': 0, 'in_use': 0}),
+                     **counters}
+                    for key, counters in self._counters.items()]
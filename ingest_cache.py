@@ -0,0 +1,104 @@
+"""
+Kerala Panchayat ingestion cache
+Persistent page-text and chunk-embedding cache so re-ingesting an amended
+document only extracts and embeds what changed
+"""
+
+import hashlib
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of a chunk's text with whitespace normalized"""
+    return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+class IngestCache:
+    """
+    SQLite store of extracted page text and chunk embeddings
+
+    Page text is keyed by (PDF SHA-256, page number), so re-running an
+    ingest of the same file never opens it with PyPDF2. Embeddings are keyed
+    by (embedding model, content hash of the chunk text), so chunks that
+    survive an amendment, or reappear after one is reverted, are not
+    embedded again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file (created if missing)
+        """
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "pdf_sha256 TEXT, page INTEGER, text TEXT, PRIMARY KEY (pdf_sha256, page))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents (pdf_sha256 TEXT PRIMARY KEY, page_count INTEGER)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT, content_hash TEXT, dimension INTEGER, vector BLOB, "
+            "PRIMARY KEY (model, content_hash))"
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def page_count(self, pdf_sha256: str) -> Optional[int]:
+        """Number of pages of a PDF extracted before, or None if it was never fully extracted"""
+        row = self._db.execute("SELECT page_count FROM documents WHERE pdf_sha256 = ?",
+                               (pdf_sha256,)).fetchone()
+        return row[0] if row else None
+
+    def get_pages(self, pdf_sha256: str) -> Dict[int, str]:
+        """Cached page texts of a PDF by page number (empty pages included as '')"""
+        rows = self._db.execute("SELECT page, text FROM pages WHERE pdf_sha256 = ?", (pdf_sha256,))
+        return {page: text for page, text in rows}
+
+    def put_pages(self, pdf_sha256: str, pages: Dict[int, str]):
+        self._db.executemany("INSERT OR REPLACE INTO pages (pdf_sha256, page, text) VALUES (?, ?, ?)",
+                             [(pdf_sha256, page, text) for page, text in pages.items()])
+        self._db.commit()
+
+    def mark_complete(self, pdf_sha256: str, page_count: int):
+        """Record that every page of a PDF is cached"""
+        self._db.execute("INSERT OR REPLACE INTO documents (pdf_sha256, page_count) VALUES (?, ?)",
+                         (pdf_sha256, page_count))
+        self._db.commit()
+
+    def get_embeddings(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached embeddings of the given content hashes (missing ones are left out)"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay under SQLite's limit on bound parameters
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT content_hash, vector FROM embeddings WHERE model = ? "
+                f"AND content_hash IN ({','.join('?' * len(batch))})",
+                [model, *batch]
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype='float32')
+        return found
+
+    def put_embeddings(self, model: str, hashes: List[str], embeddings: np.ndarray):
+        embeddings = np.asarray(embeddings, dtype='float32')
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, content_hash, dimension, vector) VALUES (?, ?, ?, ?)",
+            [(model, key, int(vector.shape[0]), vector.tobytes()) for key, vector in zip(hashes, embeddings)]
+        )
+        self._db.commit()
+
+    def stats(self) -> Dict:
+        """Number of cached documents, pages and embeddings"""
+        def count(table):
+            return self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        return {'documents': count('documents'), 'pages': count('pages'), 'embeddings': count('embeddings')}
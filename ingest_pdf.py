@@ -1,27 +1,72 @@
 """
 Kerala Panchayat PDF Ingestion Script
 This script processes the Kerala Panchayat Act PDF and creates searchable embeddings.
-Run this script first to prepare your data before using the Streamlit app.
+Run this script first to prepare your data before starting the Flask app.
 """
 
-import PyPDF2
 import faiss
 import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import pickle
+import json
 import os
+import re
 import sys
+import time
+import bisect
+import argparse
 from pathlib import Path
 
+import index_bundle
+from chunk_store import ChunkStore
+from bm25_index import BM25Index
+from ingest_cache import IngestCache, content_hash
+import pdf_extract
+
+# Supported FAISS index types (see PDFIngestor.create_faiss_index)
+INDEX_TYPES = ('flat', 'ivf', 'hnsw')
+
+# Default page-text and embedding cache file (see ingest_cache.IngestCache)
+DEFAULT_CACHE_PATH = "ingest_cache.sqlite"
+
+# Share of chunks that may change before IVF centroids are retrained instead of reused
+MAX_IVF_UPDATE_FRACTION = 0.5
+
+# Version of the chunk metadata written by build_chunk_metadata, recorded in the
+# bundle manifest; bump it when fields are added so existing bundles are rewritten.
+# Bundles without it predate the chapter / section / part fields (version 1).
+CHUNK_METADATA_VERSION = 2
+
+# "--- Page N ---" markers inserted by extract_text_from_pdf
+PAGE_MARKER_RE = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+# Lines that look like a chapter or numbered section heading
+HEADING_RE = re.compile(r"^[ \t]*(CHAPTER[ \t]+[IVXLC]+\b.*|\d+[A-Z]{0,2}\.[ \t]+[A-Z][^\n]{3,80})$", re.MULTILINE)
+# Chapter and numbered section headings, capturing the number
+CHAPTER_RE = re.compile(r"^[ \t]*CHAPTER[ \t]+([IVXLC]+)\b", re.MULTILINE)
+SECTION_RE = re.compile(r"^[ \t]*(\d+[A-Z]{0,2})\.[ \t]+[A-Z][^\n]{3,80}$", re.MULTILINE)
+# Part titles: "PART II ..." or the title line of an Act, Rules or Regulations
+PART_RE = re.compile(r"^[ \t]*(PART[ \t]+[IVXLC]+\b[^\n]*|(?:THE[ \t]+)?[A-Z][A-Z ()'&,.-]*\b(?:ACT|RULES|REGULATIONS),?[ \t]+\d{4})[ \t]*$",
+                     re.MULTILINE)
+
+def page_block(page_num: int, page_text: str) -> str:
+    """Text of a page as it appears in the extracted document, behind its page marker"""
+    return f"\n--- Page {page_num} ---\n{page_text}\n"
+
+def index_meta_path(index_path: str) -> str:
+    """Path of the JSON sidecar describing how a FAISS index was built"""
+    return index_path + ".meta.json"
+
 class PDFIngestor:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache_path=DEFAULT_CACHE_PATH, extract_processes=None):
         """
         Initialize PDF ingestion system
         
         Args:
             model_name: Sentence transformer model for embeddings
+            cache_path: SQLite cache of extracted pages and chunk embeddings
+                        (None disables caching)
+            extract_processes: Processes extracting PDF pages (None uses every CPU core)
         """
         # Check device availability
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
@@ -29,59 +74,121 @@ class PDFIngestor:
         
         # Initialize models
         print("📥 Loading embedding model...")
+        self.model_name = model_name
         self.embedding_model = SentenceTransformer(model_name, device=self.device)
         
+        self.chunk_size = 800  # Larger chunks for legal documents
+        self.extract_processes = extract_processes
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,  # Larger chunks for legal documents
+            chunk_size=self.chunk_size,
             chunk_overlap=100,
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
         
         self.chunks = []
+        self.chunk_metadata = []
+        self.documents = []
+        self.bm25 = None
         self.index = None
+        self.index_config = {}
+        self.cache = IngestCache(cache_path) if cache_path else None
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"🗃️ Ingestion cache {cache_path}: {stats['pages']} pages, {stats['embeddings']} embeddings")
         print("✅ Ingestion system initialized")
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    def iter_pages(self, pdf_path: str):
         """
-        Extract text from PDF with error handling
+        Extract the pages of a PDF, yielding them in order as they become available
+        
+        Pages are extracted by a pool of worker processes (see
+        pdf_extract.iter_pdf_pages) while the caller consumes them. Page text
+        is cached by (PDF hash, page number): a file that was fully extracted
+        before is not opened with PyPDF2 again, and a run that was interrupted
+        resumes with the missing pages.
         
         Args:
             pdf_path: Path to PDF file
             
-        Returns:
-            Extracted text content
+        Yields:
+            (page number, text) of every non-empty page
         """
         print(f"📄 Extracting text from: {pdf_path}")
-        text = ""
+        pdf_sha256 = index_bundle.file_sha256(pdf_path)
+        cached = self.cache.get_pages(pdf_sha256) if self.cache is not None else {}
+        total_pages = self.cache.page_count(pdf_sha256) if self.cache is not None else None
         
+        if total_pages is not None and len(cached) >= total_pages:
+            print(f"♻️ Using cached text of all {total_pages} pages")
+            missing = []
+        else:
+            try:
+                total_pages = pdf_extract.page_count(pdf_path)
+            except Exception as e:
+                raise ValueError(f"❌ Error reading PDF file: {e}")
+            missing = [page_num for page_num in range(1, total_pages + 1) if page_num not in cached]
+            print(f"📚 Total pages: {total_pages}")
+            if cached:
+                print(f"♻️ {len(cached)} pages cached, extracting the rest")
+            print(f"⚙️ Extracting with {self.extract_processes or os.cpu_count()} processes")
+        
+        extracted = pdf_extract.iter_pdf_pages(pdf_path, missing, self.extract_processes)
+        unsaved, failed = {}, 0
+        start = time.time()
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                print(f"📚 Total pages: {total_pages}")
-                
-                for page_num, page in enumerate(pdf_reader.pages, 1):
+            for page_num in range(1, total_pages + 1):
+                if page_num in cached:
+                    page_text = cached[page_num]
+                else:
                     try:
-                        page_text = page.extract_text()
-                        if page_text.strip():  # Only add non-empty pages
-                            text += f"\n--- Page {page_num} ---\n{page_text}\n"
-                        
-                        # Progress indicator
-                        if page_num % 10 == 0:
-                            print(f"   📖 Processed {page_num}/{total_pages} pages...")
-                            
+                        _, page_text, error = next(extracted)
                     except Exception as e:
-                        print(f"⚠️ Warning: Could not extract text from page {page_num}: {e}")
+                        raise ValueError(f"❌ Error reading PDF file: {e}")
+                    if error is not None:
+                        # Not cached, so it is retried on the next run
+                        print(f"⚠️ Warning: Could not extract text from page {page_num}: {error}")
+                        failed += 1
                         continue
-                        
-        except Exception as e:
-            raise ValueError(f"❌ Error reading PDF file: {e}")
+                    unsaved[page_num] = page_text
+                    
+                    # Progress indicator; keep the cache current in case the run is interrupted
+                    if page_num % 10 == 0:
+                        print(f"   📖 Processed {page_num}/{total_pages} pages...")
+                    if self.cache is not None and len(unsaved) >= 50:
+                        self.cache.put_pages(pdf_sha256, unsaved)
+                        unsaved = {}
+                
+                if page_text.strip():  # Only yield non-empty pages
+                    yield page_num, page_text
+        finally:
+            extracted.close()
+            if self.cache is not None and unsaved:
+                self.cache.put_pages(pdf_sha256, unsaved)
+        
+        if self.cache is not None and missing and not failed:
+            self.cache.mark_complete(pdf_sha256, total_pages)
+        if missing:
+            seconds = time.time() - start
+            print(f"📝 Extracted {len(missing) - failed} pages in {seconds:.1f}s "
+                  f"({(len(missing) - failed) / max(seconds, 1e-9):.1f} pages/s)")
+    
+    def extract_text_from_pdf(self, pdf_path: str) -> str:
+        """
+        Extract text from PDF with error handling
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            Extracted text content
+        """
+        text = "".join(page_block(page_num, page_text) for page_num, page_text in self.iter_pages(pdf_path))
         
         if not text.strip():
             raise ValueError("❌ No text extracted from PDF")
         
-        print(f"📝 Successfully extracted {len(text):,} characters from {total_pages} pages")
+        print(f"📝 Successfully extracted {len(text):,} characters")
         return text
     
     def chunk_text(self, text: str) -> list:
@@ -108,10 +215,162 @@ class PDFIngestor:
         
         return chunks
     
+    def build_chunk_metadata(self, text: str, chunks: list, doc_id: int = 0,
+                             offset: int = 0, carried: dict = None) -> list:
+        """
+        Locate each chunk in the extracted text and derive its metadata
+        
+        Args:
+            text: Full text the chunks were split from
+            chunks: Chunks in document order
+            doc_id: Index of the source document in self.documents
+            offset: Position of text in the whole document, when text is a part of it
+            carried: Page and markers in effect where text starts, when text is a part
+                     of the document (see iter_chunks)
+            
+        Returns:
+            List of dictionaries with page_start, page_end, doc_id, char_start,
+            char_end, heading, chapter, section and part for every chunk. Chapter,
+            section and part are the ones in effect where the chunk starts.
+        """
+        carried = carried or {}
+        page_positions, page_numbers = [], []
+        for match in PAGE_MARKER_RE.finditer(text):
+            page_positions.append(match.start())
+            page_numbers.append(int(match.group(1)))
+        
+        def markers(pattern):
+            matches = list(pattern.finditer(text))
+            if not carried.get('line_start', True):
+                # Text starts mid-line, so a match at its start is only the tail of a line
+                matches = [m for m in matches if m.start() > 0]
+            return [m.start() for m in matches], [" ".join(m.group(1).split()) for m in matches]
+        
+        heading_markers = markers(HEADING_RE)
+        chapter_markers = markers(CHAPTER_RE)
+        section_markers = markers(SECTION_RE)
+        part_markers = markers(PART_RE)
+        
+        def page_at(position):
+            i = bisect.bisect_right(page_positions, position) - 1
+            return page_numbers[i] if i >= 0 else carried.get('page_start', -1)
+        
+        def marker_at(position, found, name):
+            positions, values = found
+            i = bisect.bisect_right(positions, position) - 1
+            return values[i] if i >= 0 else carried.get(name, '')
+        
+        metadata = []
+        cursor = 0
+        for chunk in chunks:
+            # Chunks are in order and overlap, so search from just before the previous chunk's end
+            start = text.find(chunk, max(0, cursor - len(chunk)))
+            if start == -1:
+                start = text.find(chunk)
+            if start == -1:
+                metadata.append({'doc_id': doc_id, 'heading': ''})
+                continue
+            end = start + len(chunk)
+            cursor = end
+            
+            metadata.append({
+                'page_start': page_at(start),
+                'page_end': page_at(end - 1),
+                'doc_id': doc_id,
+                'char_start': offset + start,
+                'char_end': offset + end,
+                'heading': marker_at(start, heading_markers, 'heading'),
+                'chapter': marker_at(start, chapter_markers, 'chapter'),
+                'section': marker_at(start, section_markers, 'section'),
+                'part': marker_at(start, part_markers, 'part')
+            })
+        
+        return metadata
+    
+    def iter_chunks(self, pages, doc_id: int = 0, window: int = 64000):
+        """
+        Split a stream of pages into chunks and their metadata with bounded memory
+        
+        Pages are buffered until about `window` characters are available, then
+        the buffer is split. Chunks ending well before the end of the buffer
+        are not affected by text arriving later, so they are yielded and the
+        buffer is cut where the first pending chunk starts. Only the buffer is
+        held in memory. With the default window the chunks are the same as
+        chunk_text on the whole text; a small window can move a chunk boundary
+        right after a cut.
+        
+        Args:
+            pages: (page number, text) pairs in order, e.g. from iter_pages
+            doc_id: Index of the source document in self.documents
+            window: Characters buffered before splitting
+            
+        Yields:
+            (chunk, metadata) pairs in document order, with the metadata of
+            build_chunk_metadata
+        """
+        buffer, offset, carried = "", 0, {}
+        
+        def settled(final):
+            nonlocal buffer, offset, carried
+            chunks = self.text_splitter.split_text(buffer)
+            metadata = self.build_chunk_metadata(buffer, chunks, doc_id, offset, carried)
+            done = len(chunks)
+            if not final:
+                limit = offset + len(buffer) - 2 * self.chunk_size
+                done = next((i for i, meta in enumerate(metadata)
+                             if 'char_start' not in meta or meta['char_end'] > limit), len(chunks))
+                if done == len(chunks) or 'char_start' not in metadata[done]:
+                    return []  # No safe cut yet; keep buffering
+                pending = metadata[done]
+                cut = pending['char_start'] - offset
+                carried = {name: pending[name] for name in ('page_start', 'heading', 'chapter', 'section', 'part')}
+                carried['line_start'] = cut == 0 or buffer[cut - 1] == '\n'
+                buffer, offset = buffer[cut:], offset + cut
+            # Filter out very short chunks
+            return [(chunk, meta) for chunk, meta in zip(chunks[:done], metadata[:done])
+                    if len(chunk.strip()) > 50]
+        
+        for page_num, page_text in pages:
+            buffer += page_block(page_num, page_text)
+            if len(buffer) >= window:
+                yield from settled(final=False)
+        if buffer.strip():
+            yield from settled(final=True)
+    
+    def create_bm25_index(self, chunks: list) -> BM25Index:
+        """
+        Build the BM25 inverted index used for hybrid lexical + dense retrieval
+        
+        Args:
+            chunks: List of text chunks (same order as the FAISS index)
+        """
+        print("🔤 Building BM25 lexical index...")
+        self.bm25 = BM25Index.build(chunks)
+        print(f"✅ BM25 index: {len(self.bm25.terms):,} terms, {len(self.bm25.doc_ids):,} postings")
+        return self.bm25
+    
+    def write_chunk_store(self, chunks_path: str, compression: str = 'none'):
+        """
+        Write the chunks and their metadata as a compact chunk store
+        
+        Args:
+            chunks_path: Output path
+            compression: 'none' or 'zstd'
+        """
+        ChunkStore.write(
+            chunks_path,
+            self.chunks,
+            metadata=self.chunk_metadata or None,
+            documents=self.documents,
+            compression=compression
+        )
+    
     def create_embeddings(self, chunks: list) -> np.ndarray:
         """
         Generate embeddings for text chunks
         
+        Chunks whose content hash is in the cache are not embedded again.
+        
         Args:
             chunks: List of text chunks
             
@@ -119,13 +378,25 @@ class PDFIngestor:
             Numpy array of embeddings
         """
         print("🧠 Generating embeddings...")
+        hashes = [content_hash(chunk) for chunk in chunks]
+        cached = self.cache.get_embeddings(self.model_name, hashes) if self.cache is not None else {}
+        
+        # Embed each missing text once, even if it occurs in several chunks
+        missing = {}
+        for chunk, key in zip(chunks, hashes):
+            if key not in cached:
+                missing.setdefault(key, chunk)
+        if cached:
+            print(f"   ♻️ Reusing {len(chunks) - sum(key in missing for key in hashes)} cached embeddings, "
+                  f"embedding {len(missing)} new chunks")
+        to_embed = list(missing.values())
         
         # Process in batches to avoid memory issues
         batch_size = 32
         all_embeddings = []
         
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
+        for i in range(0, len(to_embed), batch_size):
+            batch = to_embed[i:i + batch_size]
             batch_embeddings = self.embedding_model.encode(
                 batch, 
                 show_progress_bar=True,
@@ -134,23 +405,103 @@ class PDFIngestor:
             all_embeddings.append(batch_embeddings)
             
             # Progress update
-            processed = min(i + batch_size, len(chunks))
-            print(f"   🔄 Processed {processed}/{len(chunks)} chunks")
+            processed = min(i + batch_size, len(to_embed))
+            print(f"   🔄 Processed {processed}/{len(to_embed)} chunks")
+        
+        if all_embeddings:
+            new_embeddings = np.vstack(all_embeddings).astype('float32')
+            cached.update(zip(missing, new_embeddings))
+            if self.cache is not None:
+                self.cache.put_embeddings(self.model_name, list(missing), new_embeddings)
         
         # Combine all embeddings
-        embeddings = np.vstack(all_embeddings)
+        dimension = self.embedding_model.get_sentence_embedding_dimension()
+        embeddings = np.array([cached[key] for key in hashes], dtype='float32').reshape(-1, dimension)
         print(f"✅ Generated embeddings shape: {embeddings.shape}")
         
         return embeddings
     
-    def create_faiss_index(self, embeddings: np.ndarray):
+    def create_faiss_index(self, embeddings: np.ndarray, index_type: str = 'flat',
+                           nlist: int = None, hnsw_m: int = 32, ef_construction: int = 200,
+                           nprobe: int = 8, ef_search: int = 64, recall_k: int = 10):
         """
         Create FAISS index for similarity search
         
         Args:
             embeddings: Numpy array of embeddings
+            index_type: 'flat' (exact brute force), 'ivf' (IVF-Flat with trained
+                        centroids) or 'hnsw' (graph index)
+            nlist: Number of IVF centroids (default: ~4*sqrt(n), limited by training size)
+            hnsw_m: HNSW graph degree
+            ef_construction: HNSW build-time search depth
+            nprobe: Default IVF lists probed at query time (stored with the index)
+            ef_search: Default HNSW query-time search depth (stored with the index)
+            recall_k: k used for the recall report of approximate indexes
         """
-        print("🔍 Creating FAISS search index...")
+        index_type = index_type.lower()
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"❌ Unknown index type '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}")
+        
+        print(f"🔍 Creating FAISS search index ({index_type})...")
+        dimension = embeddings.shape[1]
+        num_vectors = embeddings.shape[0]
+        
+        # Normalize so inner product equals cosine similarity
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        faiss.normalize_L2(embeddings)
+        
+        build_params = {}
+        search_params = {}
+        start = time.time()
+        
+        if index_type == 'flat':
+            self._create_flat_index(embeddings)
+        
+        elif index_type == 'ivf':
+            if nlist is None:
+                # FAISS wants ~39 training points per centroid
+                nlist = int(4 * np.sqrt(num_vectors))
+                nlist = max(1, min(nlist, num_vectors // 39))
+            nlist = max(1, min(nlist, num_vectors))
+            quantizer = faiss.IndexFlatIP(dimension)
+            self.index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            print(f"   🎯 Training {nlist} IVF centroids...")
+            self.index.train(embeddings)
+            self.index.add(embeddings)
+            self.index.nprobe = min(nprobe, nlist)
+            build_params = {'nlist': nlist}
+            search_params = {'nprobe': self.index.nprobe}
+            print("💻 Using CPU IVF index")
+        
+        else:  # hnsw
+            self.index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = ef_construction
+            self.index.add(embeddings)
+            self.index.hnsw.efSearch = ef_search
+            build_params = {'M': hnsw_m, 'efConstruction': ef_construction}
+            search_params = {'efSearch': ef_search}
+            print("💻 Using CPU HNSW index")
+        
+        build_seconds = time.time() - start
+        
+        self.index_config = {
+            'index_type': index_type,
+            'metric': 'inner_product',
+            'dimension': int(dimension),
+            'ntotal': int(self.index.ntotal),
+            'embedding_model': self.model_name,
+            'build_params': build_params,
+            'search_params': search_params,
+            'build_seconds': round(build_seconds, 3)
+        }
+        
+        print(f"📊 Index created with {self.index.ntotal} vectors in {build_seconds:.2f}s")
+        
+        if index_type != 'flat':
+            self.index_config['recall_report'] = self.recall_report(embeddings, k=recall_k)
+    
+    def _create_flat_index(self, embeddings: np.ndarray):
+        """Create an exact inner-product index, on GPU when available"""
         dimension = embeddings.shape[1]
         
         # Create CPU index (more compatible across systems)
@@ -162,33 +513,205 @@ class PDFIngestor:
                 print(f"🚀 Attempting GPU acceleration - {faiss.get_num_gpus()} GPU(s) available")
                 gpu_resources = faiss.StandardGpuResources()
                 gpu_index = faiss.index_cpu_to_gpu(gpu_resources, 0, self.index)
-                
-                # Normalize and add embeddings
-                faiss.normalize_L2(embeddings)
-                gpu_index.add(embeddings.astype('float32'))
+                gpu_index.add(embeddings)
                 self.index = gpu_index
                 print("✅ GPU acceleration enabled!")
                 
             except Exception as e:
                 print(f"⚠️ GPU acceleration failed, using CPU: {e}")
                 # Fallback to CPU
-                faiss.normalize_L2(embeddings)
-                self.index.add(embeddings.astype('float32'))
+                self.index.add(embeddings)
         else:
             # Use CPU index
-            faiss.normalize_L2(embeddings)
-            self.index.add(embeddings.astype('float32'))
+            self.index.add(embeddings)
             print("💻 Using CPU index")
+    
+    def recall_report(self, embeddings: np.ndarray, k: int = 10, num_queries: int = 200,
+                      noise: float = 0.05, seed: int = 42) -> dict:
+        """
+        Measure recall@k and query latency of the current index against exact search
+        
+        Queries are sampled document vectors with a little Gaussian noise, so
+        they behave like real questions landing near (not exactly on) a chunk.
+        
+        Args:
+            embeddings: The normalized embeddings the index was built from
+            k: Number of neighbours compared
+            num_queries: Number of sampled queries
+            noise: Standard deviation of the noise added to the sampled vectors
+            seed: Random seed for reproducible reports
+            
+        Returns:
+            Dictionary with recall and per-query latency of both indexes
+        """
+        rng = np.random.default_rng(seed)
+        k = min(k, embeddings.shape[0])
+        sample = rng.choice(embeddings.shape[0], size=min(num_queries, embeddings.shape[0]), replace=False)
+        queries = embeddings[sample] + rng.normal(0, noise, size=(len(sample), embeddings.shape[1])).astype('float32')
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        faiss.normalize_L2(queries)
+        
+        exact = faiss.IndexFlatIP(embeddings.shape[1])
+        exact.add(embeddings)
+        
+        start = time.time()
+        _, exact_ids = exact.search(queries, k)
+        exact_ms = (time.time() - start) * 1000 / len(queries)
+        
+        start = time.time()
+        _, approx_ids = self.index.search(queries, k)
+        approx_ms = (time.time() - start) * 1000 / len(queries)
+        
+        hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approx_ids, exact_ids))
+        recall = hits / (len(queries) * k)
+        
+        report = {
+            'k': int(k),
+            'num_queries': int(len(queries)),
+            f'recall@{k}': round(recall, 4),
+            'exact_ms_per_query': round(exact_ms, 4),
+            'index_ms_per_query': round(approx_ms, 4)
+        }
+        
+        print(f"📈 Recall@{k} vs exact Flat index: {recall:.4f} "
+              f"({approx_ms:.3f} ms/query vs {exact_ms:.3f} ms/query exact)")
+        return report
+    
+    def load_previous_bundle(self, bundle_dir: str, index_type: str):
+        """
+        Index and chunks of an existing bundle that can be updated instead of rebuilt
+        
+        Args:
+            bundle_dir: Bundle directory about to be replaced
+            index_type: Index type of the new build
+            
+        Returns:
+            (FAISS index, chunk texts, index config, chunk metadata version), or None
+            if there is no usable bundle built with the same embedding model and index type
+        """
+        if not bundle_dir or not index_bundle.is_bundle(bundle_dir):
+            return None
+        try:
+            manifest = index_bundle.read_manifest(bundle_dir)
+            index_bundle.verify_files(bundle_dir, manifest)
+            if manifest['embedding_model'] != self.model_name or manifest['index_type'] != index_type:
+                print(f"ℹ️ Existing bundle was built with {manifest['embedding_model']} / {manifest['index_type']}; "
+                      "rebuilding the index")
+                return None
+            index = faiss.read_index(index_bundle.bundle_file(bundle_dir, manifest, 'index'))
+            store = ChunkStore.open(index_bundle.bundle_file(bundle_dir, manifest, 'chunks'))
+            try:
+                chunks = list(store)
+            finally:
+                store.close()
+        except (index_bundle.BundleError, OSError, RuntimeError, ValueError) as e:
+            print(f"⚠️ Existing bundle cannot be updated, rebuilding the index: {e}")
+            return None
+        if index.ntotal != len(chunks):
+            print("⚠️ Existing bundle index and chunks disagree, rebuilding the index")
+            return None
+        return index, chunks, manifest.get('index_config', {}), manifest.get('chunk_metadata_version', 1)
+    
+    def update_faiss_index(self, previous, chunks: list, metadata: list, recall_k: int = 10) -> dict:
+        """
+        Update the index of a previous build for a re-ingested document
+        
+        Chunks are matched to the previous build by content hash and only new
+        or changed chunks are embedded. The index is then refilled in document
+        order, with the stored vectors of unchanged chunks, so index ids stay
+        chunk positions in the document (neighbouring ids are neighbouring
+        chunks). IVF keeps its trained centroids; an HNSW graph is rebuilt
+        unless chunks were only appended. Sets self.index, self.chunks and
+        self.chunk_metadata.
+        
+        Args:
+            previous: (index, chunk texts, index config, metadata version) from load_previous_bundle
+            chunks: Chunks of the new text, in document order
+            metadata: Metadata of those chunks
+            recall_k: k used for the recall report of approximate indexes
+            
+        Returns:
+            Dictionary with the kept, added and removed chunk counts, or None if too
+            much changed for IVF centroids to be reused (the caller rebuilds)
+        """
+        index, previous_chunks, index_config, _ = previous
+        index_type = index_config.get('index_type', 'flat')
+        
+        previous_rows = {}
+        for row, chunk in enumerate(previous_chunks):
+            previous_rows.setdefault(content_hash(chunk), []).append(row)
+        kept = {}    # previous row -> position in chunks
+        added = []
+        for i, chunk in enumerate(chunks):
+            rows = previous_rows.get(content_hash(chunk))
+            if rows:
+                kept[rows.pop(0)] = i
+            else:
+                added.append(i)
+        removed = sorted(row for rows in previous_rows.values() for row in rows)
+        
+        changes = {'kept': len(kept), 'added': len(added), 'removed': len(removed)}
+        print(f"🔁 Incremental update: {changes['kept']} chunks unchanged, "
+              f"{changes['added']} new or changed, {changes['removed']} removed")
+        if index_type == 'ivf' and len(added) + len(removed) > MAX_IVF_UPDATE_FRACTION * max(1, len(chunks)):
+            print("ℹ️ Too much changed to reuse the IVF centroids; rebuilding the index")
+            return None
+        
+        start = time.time()
+        new_embeddings = self.create_embeddings([chunks[i] for i in added]) if added else \
+            np.zeros((0, index.d), dtype='float32')
+        new_embeddings = np.ascontiguousarray(new_embeddings, dtype='float32')
+        faiss.normalize_L2(new_embeddings)
+        
+        # Vectors of all chunks in document order: stored ones for unchanged chunks
+        ivf = faiss.extract_index_ivf(index) if index_type == 'ivf' else None
+        if ivf is not None:
+            ivf.make_direct_map()
+        vectors = np.zeros((len(chunks), index.d), dtype='float32')
+        if kept:
+            rows = np.array(list(kept), dtype='int64')
+            vectors[[kept[row] for row in rows]] = index.reconstruct_batch(rows)
+        if added:
+            vectors[added] = new_embeddings
+        if ivf is not None:
+            ivf.set_direct_map_type(faiss.DirectMap.NoMap)
         
-        print(f"📊 Index created with {self.index.ntotal} vectors")
+        appended = not removed and all(row == i for row, i in kept.items())
+        if appended:
+            # Unchanged chunks kept their ids; only new chunks at the end are added
+            index.add(new_embeddings)
+        elif index_type == 'hnsw':
+            # FAISS cannot delete from or reorder an HNSW graph; rebuild it
+            build_params = index_config.get('build_params', {})
+            ef_search = index.hnsw.efSearch
+            index = faiss.IndexHNSWFlat(index.d, build_params.get('M', 32), faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = build_params.get('efConstruction', 200)
+            index.add(vectors)
+            index.hnsw.efSearch = ef_search
+        else:
+            # Flat, or IVF under its already trained centroids
+            index.reset()
+            index.add(vectors)
+        
+        self.index = index
+        self.chunks = list(chunks)
+        self.chunk_metadata = list(metadata)
+        self.index_config = dict(index_config, ntotal=int(index.ntotal),
+                                 build_seconds=round(time.time() - start, 3), incremental=changes)
+        print(f"📊 Index updated to {index.ntotal} vectors in {self.index_config['build_seconds']:.2f}s")
+        
+        if index_type != 'flat':
+            self.index_config['recall_report'] = self.recall_report(vectors, k=recall_k)
+        return changes
     
-    def save_index_and_chunks(self, index_path: str, chunks_path: str):
+    def save_index_and_chunks(self, index_path: str, chunks_path: str, compression: str = 'none'):
         """
         Save FAISS index and chunks to disk
         
         Args:
             index_path: Path to save FAISS index
-            chunks_path: Path to save text chunks
+            chunks_path: Path to save the chunk store
+            compression: Chunk store compression ('none' or 'zstd')
         """
         print("💾 Saving index and chunks...")
         
@@ -201,9 +724,15 @@ class PDFIngestor:
             else:  # CPU index
                 faiss.write_index(self.index, index_path)
             
+            # Record how the index was built so the engine can configure itself
+            if self.index_config:
+                with open(index_meta_path(index_path), 'w') as f:
+                    json.dump(self.index_config, f, indent=2)
+            
             # Save chunks
-            with open(chunks_path, 'wb') as f:
-                pickle.dump(self.chunks, f)
+            self.write_chunk_store(chunks_path, compression)
+            if self.bm25 is not None:
+                self.bm25.save(chunks_path + ".bm25.npz")
             
             print(f"✅ Files saved successfully:")
             print(f"   📁 FAISS Index: {index_path}")
@@ -214,31 +743,117 @@ class PDFIngestor:
             print(f"❌ Error saving files: {e}")
             raise
     
+    def save_bundle(self, bundle_dir: str, compression: str = 'none', extra: dict = None):
+        """
+        Save FAISS index, chunks and a manifest as one versioned bundle
+        
+        The bundle is written to a staging directory and published only once
+        complete (see index_bundle.publish_bundle), so a running engine never
+        sees a partial or missing bundle.
+        
+        Args:
+            bundle_dir: Bundle directory to create or replace
+            compression: Chunk store compression ('none' or 'zstd')
+            extra: Additional manifest fields (e.g. {'corpus': name}); the chunk
+                   metadata version is always recorded
+        """
+        print("💾 Saving index bundle...")
+        staging_dir = f"{bundle_dir.rstrip(os.sep)}.staging"
+        os.makedirs(staging_dir, exist_ok=True)
+        
+        try:
+            index = self.index
+            if hasattr(index, 'index'):  # GPU index
+                index = faiss.index_gpu_to_cpu(index)
+                print("🔄 Converted GPU index to CPU for saving")
+            faiss.write_index(index, os.path.join(staging_dir, index_bundle.INDEX_FILE))
+            
+            self.write_chunk_store(os.path.join(staging_dir, index_bundle.CHUNKS_FILE), compression)
+            files = {'index': index_bundle.INDEX_FILE, 'chunks': index_bundle.CHUNKS_FILE}
+            if self.bm25 is not None:
+                self.bm25.save(os.path.join(staging_dir, index_bundle.BM25_FILE))
+                files['bm25'] = index_bundle.BM25_FILE
+            
+            manifest = index_bundle.write_manifest(
+                staging_dir,
+                files=files,
+                embedding_model=self.model_name,
+                dimension=index.d,
+                chunk_count=len(self.chunks),
+                index_config=self.index_config,
+                extra={**(extra or {}), 'chunk_metadata_version': CHUNK_METADATA_VERSION}
+            )
+            index_bundle.publish_bundle(staging_dir, bundle_dir)
+            
+            print(f"✅ Bundle saved successfully:")
+            print(f"   📁 Bundle: {bundle_dir}")
+            print(f"   🏷️ Version: {manifest['bundle_version']}")
+            print(f"   📊 Total chunks: {len(self.chunks)}")
+            
+        except Exception as e:
+            print(f"❌ Error saving bundle: {e}")
+            raise
+    
     def ingest_pdf(self, pdf_path: str, index_path: str = "kerala_panchayat_index.bin", 
-                   chunks_path: str = "kerala_chunks.pkl"):
+                   chunks_path: str = "kerala_chunks.kpc", index_type: str = 'flat',
+                   bundle_dir: str = None, compression: str = 'none', corpus: str = None,
+                   full_rebuild: bool = False, **index_params):
         """
         Complete PDF ingestion pipeline
         
+        When bundle_dir already holds a bundle built with the same model and
+        index type, its index is updated in place (see update_faiss_index)
+        unless full_rebuild is set. An unchanged document is not written
+        again unless the bundle's chunk metadata predates
+        CHUNK_METADATA_VERSION.
+        
         Args:
             pdf_path: Path to PDF file
-            index_path: Path to save FAISS index
-            chunks_path: Path to save text chunks
+            index_path: Path to save FAISS index (used when bundle_dir is None)
+            chunks_path: Path to save text chunks (used when bundle_dir is None)
+            index_type: FAISS index type ('flat', 'ivf' or 'hnsw')
+            bundle_dir: Save a versioned index bundle to this directory instead
+            compression: Chunk store compression ('none' or 'zstd')
+            corpus: Corpus name recorded in the bundle manifest (multi-corpus mode)
+            full_rebuild: Rebuild the index even if an existing bundle could be updated
+            **index_params: Build/search parameters passed to create_faiss_index
         """
         try:
-            # Step 1: Extract text
-            text = self.extract_text_from_pdf(pdf_path)
+            # Steps 1-2: Extract pages in parallel and chunk them as they arrive
+            self.documents = [os.path.basename(pdf_path)]
+            chunks, metadata = [], []
+            for chunk, meta in self.iter_chunks(self.iter_pages(pdf_path), doc_id=0):
+                chunks.append(chunk)
+                metadata.append(meta)
+            if not chunks:
+                raise ValueError("❌ No text extracted from PDF")
+            print(f"📦 Created {len(chunks)} chunks")
             
-            # Step 2: Chunk text
-            self.chunks = self.chunk_text(text)
+            # Step 3: Update the previous index, or embed everything and build a new one
+            previous = None if full_rebuild else self.load_previous_bundle(bundle_dir, index_type.lower())
+            changes = None
+            if previous is not None:
+                changes = self.update_faiss_index(previous, chunks, metadata,
+                                                  recall_k=index_params.get('recall_k', 10))
+                if changes is not None and not changes['added'] and not changes['removed']:
+                    if previous[3] == CHUNK_METADATA_VERSION:
+                        print("\n✅ Document unchanged; the existing bundle is up to date")
+                        return True
+                    print(f"ℹ️ Document unchanged, but the bundle has chunk metadata version {previous[3]}; "
+                          f"rewriting it with version {CHUNK_METADATA_VERSION}")
+            if changes is None:
+                self.chunks, self.chunk_metadata = chunks, metadata
+                embeddings = self.create_embeddings(self.chunks)
+                self.create_faiss_index(embeddings, index_type=index_type, **index_params)
             
-            # Step 3: Generate embeddings
-            embeddings = self.create_embeddings(self.chunks)
-            
-            # Step 4: Create FAISS index
-            self.create_faiss_index(embeddings)
+            # Step 4: Create the BM25 index
+            self.create_bm25_index(self.chunks)
             
             # Step 5: Save everything
-            self.save_index_and_chunks(index_path, chunks_path)
+            if bundle_dir:
+                self.save_bundle(bundle_dir, compression, extra={'corpus': corpus} if corpus else None)
+            else:
+                self.save_index_and_chunks(index_path, chunks_path, compression)
             
             # Cleanup GPU memory
             if self.device == 'cuda':
@@ -249,10 +864,16 @@ class PDFIngestor:
             print(f"📊 Summary:")
             print(f"   • Document: {os.path.basename(pdf_path)}")
             print(f"   • Total chunks: {len(self.chunks)}")
-            print(f"   • Embedding dimension: {embeddings.shape[1]}")
+            print(f"   • Embedding dimension: {self.index.d}")
+            print(f"   • Index type: {index_type}")
+            if changes is not None:
+                print(f"   • Updated: {changes['added']} chunks added, {changes['removed']} removed")
             print(f"   • Device used: {self.device.upper()}")
-            print(f"   • Index file: {index_path}")
-            print(f"   • Chunks file: {chunks_path}")
+            if bundle_dir:
+                print(f"   • Bundle: {bundle_dir}")
+            else:
+                print(f"   • Index file: {index_path}")
+                print(f"   • Chunks file: {chunks_path}")
             
             return True
             
@@ -268,15 +889,52 @@ def find_pdf_files(directory: str = ".") -> list:
             pdf_files.append(file)
     return pdf_files
 
+def parse_args(argv=None):
+    """Command line options for the index build"""
+    parser = argparse.ArgumentParser(description="Kerala Panchayat PDF ingestion")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat',
+                        help="FAISS index type (default: flat)")
+    parser.add_argument('--nlist', type=int, default=None, help="IVF: number of centroids")
+    parser.add_argument('--nprobe', type=int, default=8, help="IVF: lists probed per query")
+    parser.add_argument('--hnsw-m', type=int, default=32, help="HNSW: graph degree")
+    parser.add_argument('--ef-construction', type=int, default=200, help="HNSW: build-time depth")
+    parser.add_argument('--ef-search', type=int, default=64, help="HNSW: query-time depth")
+    parser.add_argument('--recall-k', type=int, default=10, help="k for the recall report")
+    parser.add_argument('--bundle', default="kerala_panchayat_bundle",
+                        help="Output bundle directory (default: kerala_panchayat_bundle)")
+    parser.add_argument('--legacy', action='store_true',
+                        help="Write the separate kerala_panchayat_index.bin / kerala_chunks.kpc files instead of a bundle")
+    parser.add_argument('--compress-chunks', action='store_true',
+                        help="zstd-compress the chunk store in blocks")
+    parser.add_argument('--pdf', help="PDF to ingest (default: pick from the current directory)")
+    parser.add_argument('--corpus',
+                        help="Build the bundle of this corpus at corpora/<name> for multi-corpus mode (RAG_CORPORA)")
+    parser.add_argument('--yes', action='store_true', help="Overwrite existing output without asking")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Rebuild the index instead of updating an existing bundle in place")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f"Page-text and embedding cache file (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the ingestion cache")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Processes extracting PDF pages (default: every CPU core)")
+    return parser.parse_args(argv)
+
 def main():
     """Main function to run PDF ingestion"""
+    args = parse_args()
+    
     print("🏛️ KERALA PANCHAYAT PDF INGESTION SYSTEM")
     print("=" * 50)
     
     # Check for PDF files
-    pdf_files = find_pdf_files()
+    pdf_files = [] if args.pdf else find_pdf_files()
     
-    if not pdf_files:
+    if args.pdf:
+        pdf_path = args.pdf
+        if not os.path.exists(pdf_path):
+            print(f"❌ File not found: {pdf_path}")
+            return
+    elif not pdf_files:
         print("❌ No PDF files found in current directory")
         pdf_path = input("Please enter the full path to your Kerala Panchayat Act PDF: ").strip()
         if not os.path.exists(pdf_path):
@@ -301,9 +959,20 @@ def main():
     
     # Check if files already exist
     index_path = "kerala_panchayat_index.bin"
-    chunks_path = "kerala_chunks.pkl"
+    chunks_path = "kerala_chunks.kpc"
+    bundle_dir = None if args.legacy else args.bundle
+    if args.corpus:
+        bundle_dir = os.path.join("corpora", args.corpus)
     
-    if os.path.exists(index_path) and os.path.exists(chunks_path):
+    if args.yes:
+        pass  # Overwrite without asking
+    elif bundle_dir and os.path.exists(bundle_dir):
+        action = "Rebuild" if args.full_rebuild else "Update (only new or changed chunks are embedded)"
+        overwrite = input(f"\n⚠️ Bundle already exists:\n- {bundle_dir}\n{action}? (y/n): ").lower()
+        if overwrite != 'y':
+            print("🚫 Ingestion cancelled")
+            return
+    elif not bundle_dir and os.path.exists(index_path) and os.path.exists(chunks_path):
         overwrite = input(f"\n⚠️ Files already exist:\n- {index_path}\n- {chunks_path}\nOverwrite? (y/n): ").lower()
         if overwrite != 'y':
             print("🚫 Ingestion cancelled")
@@ -311,14 +980,31 @@ def main():
     
     # Initialize and run ingestion
     print(f"\n🚀 Starting ingestion of: {pdf_path}")
-    ingestor = PDFIngestor()
+    ingestor = PDFIngestor(cache_path=None if args.no_cache else args.cache, extract_processes=args.processes)
     
-    success = ingestor.ingest_pdf(pdf_path, index_path, chunks_path)
+    success = ingestor.ingest_pdf(
+        pdf_path, index_path, chunks_path,
+        index_type=args.index_type,
+        bundle_dir=bundle_dir,
+        compression='zstd' if args.compress_chunks else 'none',
+        corpus=args.corpus,
+        full_rebuild=args.full_rebuild,
+        nlist=args.nlist,
+        nprobe=args.nprobe,
+        hnsw_m=args.hnsw_m,
+        ef_construction=args.ef_construction,
+        ef_search=args.ef_search,
+        recall_k=args.recall_k
+    )
     
-    if success:
-        print("\n✅ READY TO USE STREAMLIT APP!")
-        print("Run the following command to start the web interface:")
-        print("streamlit run streamlit_app.py")
+    if success and args.corpus:
+        print(f"\n✅ Corpus '{args.corpus}' built. Serve it with, for example:")
+        print(f"RAG_CORPORA=\"{args.corpus}={bundle_dir},...\"")
+    elif success:
+        print("\n✅ READY TO SERVE!")
+        print("Precompute the FAQ answers for the new corpus, then start the web app:")
+        print("flask --app \"app:create_app()\" rebuild-faq")
+        print("python app.py")
     else:
         print("\n❌ Ingestion failed. Please check the errors above.")
 
@@ -0,0 +1,378 @@
+"""
+Kerala Panchayat LLM client
+Groq chat completions with explicit timeouts, bounded retries, a sized
+keep-alive connection pool and optional hedged requests
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import groq
+from groq import Groq, AsyncGroq
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: request timeout, rate limit (plus all 5xx)
+RETRYABLE_STATUS = {408, 429}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed completion call may succeed when repeated"""
+    if isinstance(error, (groq.APITimeoutError, groq.APIConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if any"""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+async def _close_on_shutdown(client: AsyncGroq):
+    """Async generator that closes an async client when its event loop finalizes it"""
+    try:
+        yield
+    finally:
+        await client.close()
+
+
+class LatencyWindow:
+    """Rolling window of recent call latencies"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMClient:
+    """
+    Chat completion client shared by all requests of an engine
+
+    - Connect, read, write and pool timeouts are explicit.
+    - 429, 5xx, timeouts and connection errors are retried up to max_retries
+      times with full-jitter exponential backoff (honouring Retry-After).
+    - One keep-alive pool sized for the expected concurrency is reused for
+      every call.
+    - With hedging, a call still running after the recent latency quantile
+      gets a duplicate request and the first successful answer wins.
+      Latencies are kept per model and call kind: hedging only looks at
+      complete answers of the same model, never at stream-open times.
+    """
+
+    def __init__(self, api_key: str, model: str = "llama3-70b-8192", temperature: float = 0.3,
+                 max_tokens: int = 800, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 concurrency: int = 8, pool_size: Optional[int] = None, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20, hedge_min_delay: float = 0.5):
+        """
+        Args:
+            api_key: Groq API key
+            model: Default model
+            temperature: Sampling temperature
+            max_tokens: Maximum answer tokens
+            connect_timeout: Seconds to establish a connection (also used to wait for a pooled one)
+            read_timeout: Seconds to wait for response data
+            max_retries: Retries after the first attempt
+            backoff_base: First backoff ceiling in seconds (doubles per retry)
+            backoff_max: Largest backoff in seconds
+            concurrency: Calls expected at once (the worker's request threads); sizes the
+                         threads running hedged calls and, by default, the pool
+            pool_size: Keep-alive connections kept open (if None, concurrency)
+            hedge: Send a duplicate request when a call is slower than usual
+            hedge_quantile: Latency quantile after which the duplicate is sent
+            hedge_min_samples: Calls observed before hedging starts
+            hedge_min_delay: Never hedge earlier than this many seconds
+        """
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout,
+                                     write=connect_timeout, pool=connect_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.concurrency = max(1, concurrency)
+        self.pool_size = max(1, pool_size or self.concurrency)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+        self._latencies: Dict[Tuple[str, str], LatencyWindow] = {}
+        # Guards the latency windows and the call counters below
+        self._latencies_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+        self._create_clients()
+
+    def _limits(self) -> httpx.Limits:
+        # Hedged calls may briefly need a second connection each
+        max_connections = self.pool_size * 2 if self.hedge else self.pool_size
+        return httpx.Limits(max_connections=max_connections, max_keepalive_connections=self.pool_size,
+                            keepalive_expiry=30.0)
+
+    def _create_clients(self):
+        # Retries are handled here, so the SDK's own retry loop is disabled
+        self.client = Groq(api_key=self.api_key, timeout=self.timeout, max_retries=0,
+                           http_client=httpx.Client(timeout=self.timeout, limits=self._limits()))
+        # One async client per event loop: its connections belong to the loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def reset_after_fork(self):
+        """Recreate connection pools and threads, which must not be shared with the parent process"""
+        self._create_clients()
+
+    async def _get_async_client(self) -> AsyncGroq:
+        """
+        The async client of the running event loop, created on first use there
+
+        The client is closed when the loop shuts down: the loop finalizes open
+        async generators on shutdown (asyncio.run does this), which runs the
+        finally block of _close_on_shutdown.
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            entry = self._async_clients.get(loop)
+            if entry is None:
+                client = AsyncGroq(
+                    api_key=self.api_key, timeout=self.timeout, max_retries=0,
+                    http_client=httpx.AsyncClient(timeout=self.timeout, limits=self._limits())
+                )
+                # The generator is kept with the client: collecting it would close the client early
+                entry = self._async_clients[loop] = (client, _close_on_shutdown(client))
+                started = False
+            else:
+                started = True
+        if not started:
+            await entry[1].__anext__()
+        return entry[0]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Threads running hedged sync calls"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # A hedged call holds up to two threads (primary and backup)
+                    self._executor = ThreadPoolExecutor(max_workers=self.concurrency * 2,
+                                                        thread_name_prefix='llm-hedge')
+        return self._executor
+
+    def _request(self, messages: List[Dict[str, str]], model: Optional[str], **params) -> Dict:
+        request = {
+            'messages': messages,
+            'model': model or self.model,
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens
+        }
+        request.update(params)
+        return request
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, at least the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _count(self, counter: str):
+        """Increment one of the call counters, which are updated from several threads"""
+        with self._latencies_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _latency_window(self, model: str, kind: str) -> LatencyWindow:
+        """Recent latencies of one model and call kind ('complete' or 'stream_open')"""
+        with self._latencies_lock:
+            latencies = self._latencies.get((model, kind))
+            if latencies is None:
+                latencies = self._latencies[(model, kind)] = LatencyWindow()
+            return latencies
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a completion, or None while there is too little history"""
+        if not self.hedge:
+            return None
+        latencies = self._latency_window(model, 'complete')
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, latencies.quantile(self.hedge_quantile))
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def _with_retries(self, call: Callable, latencies: LatencyWindow):
+        for attempt in range(self.max_retries + 1):
+            start_time = time.monotonic()
+            try:
+                self._count('calls')
+                result = call()
+                latencies.add(time.monotonic() - start_time)
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                self._count('retries')
+                logger.warning(f"LLM call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _complete_once(self, request: Dict) -> str:
+        completion = self._with_retries(lambda: self.client.chat.completions.create(**request),
+                                        self._latency_window(request['model'], 'complete'))
+        return completion.choices[0].message.content
+
+    def complete(self, messages: List[Dict[str, str]], model: Optional[str] = None, **params) -> str:
+        """
+        Generate a completion and return its text
+
+        Args:
+            messages: Chat messages
+            model: Model override (default: the client's model)
+            **params: Extra completion parameters
+        """
+        request = self._request(messages, model, **params)
+        delay = self._hedge_delay(request['model'])
+        if delay is None:
+            return self._complete_once(request)
+
+        executor = self._get_executor()
+        primary = executor.submit(self._complete_once, request)
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+
+        self._count('hedged')
+        backup = executor.submit(self._complete_once, request)
+        first_error = None
+        for future in as_completed([primary, backup]):
+            try:
+                result = future.result()
+            except Exception as e:
+                first_error = first_error or e
+                continue
+            if future is backup:
+                self._count('hedge_wins')
+            return result
+        raise first_error
+
+    def stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, **params) -> Iterator[str]:
+        """
+        Stream a completion, yielding text deltas
+
+        Opening the stream is retried; once tokens flow, errors are raised to
+        the caller. Streams are never hedged.
+        """
+        request = self._request(messages, model, stream=True, **params)
+        stream = self._with_retries(lambda: self.client.chat.completions.create(**request),
+                                    self._latency_window(request['model'], 'stream_open'))
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+    # ------------------------------------------------------------------
+    # Async
+    # ------------------------------------------------------------------
+
+    async def _acomplete_once(self, request: Dict) -> str:
+        latencies = self._latency_window(request['model'], 'complete')
+        client = await self._get_async_client()
+        for attempt in range(self.max_retries + 1):
+            start_time = time.monotonic()
+            try:
+                self._count('calls')
+                completion = await client.chat.completions.create(**request)
+                latencies.add(time.monotonic() - start_time)
+                return completion.choices[0].message.content
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                self._count('retries')
+                logger.warning(f"LLM call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def acomplete(self, messages: List[Dict[str, str]], model: Optional[str] = None, **params) -> str:
+        """Async variant of complete(); the losing hedged request is cancelled"""
+        request = self._request(messages, model, **params)
+        delay = self._hedge_delay(request['model'])
+        if delay is None:
+            return await self._acomplete_once(request)
+
+        primary = asyncio.ensure_future(self._acomplete_once(request))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count('hedged')
+        backup = asyncio.ensure_future(self._acomplete_once(request))
+        pending = {primary, backup}
+        first_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._count('hedge_wins')
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        """Call, retry and hedging counters with recent latency quantiles per model and call kind"""
+        with self._latencies_lock:
+            windows = sorted(self._latencies.items())
+            counters = {'calls': self.calls, 'retries': self.retries,
+                        'hedged': self.hedged, 'hedge_wins': self.hedge_wins}
+        return {
+            **counters,
+            'latency': {
+                f"{model} {kind}": {
+                    'samples': len(latencies),
+                    'p50': latencies.quantile(0.5),
+                    'p95': latencies.quantile(0.95),
+                    'hedge_delay': self._hedge_delay(model) if kind == 'complete' else None
+                }
+                for (model, kind), latencies in windows
+            }
+        }
@@ -0,0 +1,96 @@
+"""
+Kerala Panchayat micro-batcher
+Coalesces concurrent single-item calls into one batched call
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class MicroBatcher:
+    """
+    Gather items from concurrent callers and process them together
+
+    Callers block in submit(). A worker thread takes the first waiting item,
+    keeps collecting until max_batch items are waiting or max_wait_ms has
+    passed since the first one, calls batch_fn once with all of them and
+    hands every caller its own result (or the batch's exception).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]],
+                 max_batch: int = 32, max_wait_ms: float = 5.0, name: str = 'micro-batcher'):
+        """
+        Args:
+            batch_fn: Processes a list of items, returning one result per item in order
+            max_batch: Largest batch passed to batch_fn
+            max_wait_ms: Longest time the first item of a batch waits for company
+            name: Worker thread name
+        """
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item: Any) -> Any:
+        """Process one item as part of the next batch and return its result"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Also restarts the worker in a forked child, where the thread is gone
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Number of batches, items and the mean batch size so far"""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000.0
+        }
@@ -0,0 +1,113 @@
+"""
+Kerala Panchayat model router
+Sends easy questions to a small, fast model and the rest to the large model,
+based on the retrieval scores and the question length
+"""
+
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Sequence, Tuple
+
+
+@dataclass
+class RoutingDecision:
+    """Model chosen for one question and the signals behind the choice"""
+    model: str
+    tier: str               # 'small' or 'large'
+    reason: str
+    top_score: float
+    score_gap: float
+    question_words: int
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+def routing_signals(question: str, sections: Sequence[Tuple[str, float]]) -> Tuple[float, float, int]:
+    """
+    Signals used for routing
+
+    Returns:
+        (top retrieval score, gap between the first and second score, question length in words).
+        A single section counts as a gap of its full score.
+    """
+    scores = sorted((score for _, score in sections), reverse=True)
+    top_score = scores[0] if scores else 0.0
+    score_gap = top_score - scores[1] if len(scores) > 1 else top_score
+    return top_score, score_gap, len(question.split())
+
+
+class ModelRouter:
+    """
+    Confidence-based routing between a small and a large model
+
+    A question goes to the small model only when every signal says it is easy:
+    - the best section scores at least min_top_score (cosine similarity),
+    - it beats the runner-up by at least min_score_gap, so one section
+      clearly holds the answer,
+    - the question has at most max_question_words words.
+    Everything else, and every question while routing is disabled, goes to
+    the large model.
+    """
+
+    def __init__(self, large_model: str, small_model: str = "llama3-8b-8192", enabled: bool = False,
+                 min_top_score: float = 0.65, min_score_gap: float = 0.05, max_question_words: int = 20):
+        """
+        Args:
+            large_model: Model for hard or low-confidence questions
+            small_model: Model for easy questions
+            enabled: Route at all (if False, every question uses large_model)
+            min_top_score: Lowest top retrieval score routed to the small model
+            min_score_gap: Lowest top-1/top-2 score gap routed to the small model
+            max_question_words: Longest question (in words) routed to the small model
+        """
+        self.large_model = large_model
+        self.small_model = small_model
+        self.enabled = enabled
+        self.min_top_score = min_top_score
+        self.min_score_gap = min_score_gap
+        self.max_question_words = max_question_words
+
+        self._lock = threading.Lock()
+        self.counts = {'small': 0, 'large': 0}
+
+    def decide(self, question: str, sections: Sequence[Tuple[str, float]]) -> RoutingDecision:
+        """Choose the model for a question from its retrieved (section, score) pairs"""
+        top_score, score_gap, question_words = routing_signals(question, sections)
+
+        reasons: List[str] = []
+        if not self.enabled:
+            reasons.append("routing disabled")
+        else:
+            if top_score < self.min_top_score:
+                reasons.append(f"top score {top_score:.3f} < {self.min_top_score}")
+            if score_gap < self.min_score_gap:
+                reasons.append(f"score gap {score_gap:.3f} < {self.min_score_gap}")
+            if question_words > self.max_question_words:
+                reasons.append(f"{question_words} words > {self.max_question_words}")
+
+        tier = 'large' if reasons else 'small'
+        with self._lock:
+            self.counts[tier] += 1
+        return RoutingDecision(
+            model=self.large_model if reasons else self.small_model,
+            tier=tier,
+            reason="; ".join(reasons) or "confident retrieval, short question",
+            top_score=top_score,
+            score_gap=score_gap,
+            question_words=question_words
+        )
+
+    def stats(self) -> Dict:
+        """Routing configuration and the number of questions sent to each model"""
+        with self._lock:
+            counts = dict(self.counts)
+        total = counts['small'] + counts['large']
+        return {
+            'enabled': self.enabled,
+            'small_model': self.small_model,
+            'large_model': self.large_model,
+            'small': counts['small'],
+            'large': counts['large'],
+            'small_share': counts['small'] / total if total else 0.0
+        }
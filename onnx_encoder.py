@@ -0,0 +1,263 @@
+"""
+Kerala Panchayat ONNX query encoder
+CPU sentence encoder running an exported (optionally int8-quantized) copy of the
+SentenceTransformer model with onnxruntime, without importing torch at serve time
+"""
+
+import os
+import json
+import argparse
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+CONFIG_NAME = "encoder_config.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# Minimum cosine similarity between ONNX and PyTorch embeddings of the same text
+DEFAULT_MIN_COSINE = 0.99
+
+# Texts used to check an exported model against the original
+VERIFICATION_TEXTS = [
+    "How do I apply for a birth certificate from Panchayat?",
+    "What documents are needed for a building permit?",
+    "Property tax payment and penalty for late payment",
+    "What does Section 235 say?",
+    "Powers and functions of the Grama Sabha",
+    "Procedure for the election of the President and Vice-President",
+    "Trade license renewal",
+    "How can I file a complaint about street lights?",
+    "The Panchayat shall maintain a register of all public roads within its area.",
+    "Form 5",
+]
+
+
+class OnnxSentenceEncoder:
+    """
+    Mean-pooled sentence encoder served by onnxruntime
+
+    Exposes the subset of the SentenceTransformer API used by the engine
+    (encode and get_sentence_embedding_dimension).
+    """
+
+    def __init__(self, model_dir: str, quantized: Optional[bool] = None,
+                 num_threads: Optional[int] = None):
+        """
+        Load an encoder written by export_onnx
+
+        Args:
+            model_dir: Export directory
+            quantized: Use the int8 model (if None, the model selected at export time)
+            num_threads: onnxruntime intra-op threads (if None, onnxruntime's default)
+        """
+        from tokenizers import Tokenizer
+
+        self.config = read_config(model_dir)
+        if quantized is None:
+            model_file = self.config['model_file']
+        else:
+            model_file = INT8_FILE if quantized else FP32_FILE
+        self.model_path = os.path.join(model_dir, model_file)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+        self.num_threads = num_threads
+        self._create_session()
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self.session = ort.InferenceSession(self.model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def reset_after_fork(self):
+        """Recreate the session, whose thread pool does not survive fork()"""
+        self._create_session()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.config['dimension'])
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """
+        Encode sentences to float32 embeddings
+
+        Embeddings are L2-normalized when the source model ends in a Normalize
+        module or normalize_embeddings is set, matching SentenceTransformer.encode.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.asarray([e.ids for e in encodings], dtype='int64')
+            attention_mask = np.asarray([e.attention_mask for e in encodings], dtype='int64')
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.asarray([e.type_ids for e in encodings], dtype='int64')
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over the non-padding tokens
+            mask = attention_mask[..., None].astype('float32')
+            summed = (token_embeddings * mask).sum(axis=1)
+            batches.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        dimension = self.get_sentence_embedding_dimension()
+        embeddings = np.concatenate(batches).astype('float32') if batches else np.zeros((0, dimension), 'float32')
+        if self.config.get('normalize') or normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def read_config(model_dir: str) -> Dict:
+    """Read the export metadata of an ONNX encoder directory"""
+    path = os.path.join(model_dir, CONFIG_NAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ONNX encoder config not found at {path}; run onnx_encoder.py to export one")
+    with open(path) as f:
+        return json.load(f)
+
+
+def min_cosine(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Smallest row-wise cosine similarity between two embedding matrices"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return float(np.min(np.sum(reference * candidate, axis=1)))
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True,
+                min_cos: float = DEFAULT_MIN_COSINE,
+                verification_texts: Optional[List[str]] = None, opset: int = 14) -> Dict:
+    """
+    Export a SentenceTransformer model to ONNX and verify it against PyTorch
+
+    The transformer is exported once in fp32 and, if requested, dynamically
+    quantized to int8. Each exported model is compared with the PyTorch
+    embeddings of verification_texts. The int8 model is only selected when it
+    stays above min_cos, so the existing FAISS index remains valid.
+
+    Args:
+        model_name: SentenceTransformer model name (must match the index)
+        output_dir: Directory for the ONNX files, tokenizer and config
+        quantize: Also produce and prefer an int8 model
+        min_cos: Minimum cosine similarity to the PyTorch embeddings
+        verification_texts: Texts to compare (default: VERIFICATION_TEXTS)
+        opset: ONNX opset version
+
+    Returns:
+        The encoder config written to output_dir
+
+    Raises:
+        ValueError: if the model does not use mean pooling or the fp32 export
+                    fails verification
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st_model = SentenceTransformer(model_name, device='cpu')
+    pooling = next((m for m in st_model if isinstance(m, Pooling)), None)
+    if pooling is None or pooling.get_pooling_mode_str() != 'mean':
+        raise ValueError(f"{model_name} does not use mean pooling; only mean-pooled models can be exported")
+
+    tokenizer = st_model.tokenizer
+    transformer = st_model[0].auto_model.eval()
+    has_token_types = 'token_type_ids' in tokenizer.model_input_names
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Transformer wrapper returning only the token embeddings"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids)[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+
+    sample = tokenizer(["export sample"], return_tensors='pt')
+    input_names = ['input_ids', 'attention_mask'] + (['token_type_ids'] if has_token_types else [])
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['token_embeddings'] = {0: 'batch', 1: 'sequence'}
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    print(f"✅ Exported {model_name} to {fp32_path}")
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        'source_model': model_name,
+        'dimension': st_model.get_sentence_embedding_dimension(),
+        'max_seq_length': st_model.max_seq_length,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id,
+        'pooling': 'mean',
+        'normalize': any(isinstance(m, Normalize) for m in st_model),
+        'min_cosine_required': min_cos,
+        'model_file': FP32_FILE,
+        'verification': {}
+    }
+    with open(os.path.join(output_dir, CONFIG_NAME), 'w') as f:
+        json.dump(config, f, indent=2)
+
+    texts = verification_texts or VERIFICATION_TEXTS
+    reference = st_model.encode(texts, convert_to_numpy=True)
+
+    config['verification'][FP32_FILE] = min_cosine(
+        reference, OnnxSentenceEncoder(output_dir, quantized=False).encode(texts))
+    print(f"🔍 fp32 min cosine vs PyTorch: {config['verification'][FP32_FILE]:.6f}")
+    if config['verification'][FP32_FILE] < min_cos:
+        raise ValueError(f"fp32 ONNX export deviates from PyTorch "
+                         f"(min cosine {config['verification'][FP32_FILE]:.6f} < {min_cos})")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+        config['verification'][INT8_FILE] = min_cosine(
+            reference, OnnxSentenceEncoder(output_dir, quantized=True).encode(texts))
+        print(f"🔍 int8 min cosine vs PyTorch: {config['verification'][INT8_FILE]:.6f}")
+        if config['verification'][INT8_FILE] >= min_cos:
+            config['model_file'] = INT8_FILE
+        else:
+            print(f"⚠️ int8 model is below the {min_cos} cosine tolerance; keeping fp32")
+
+    with open(os.path.join(output_dir, CONFIG_NAME), 'w') as f:
+        json.dump(config, f, indent=2)
+    print(f"✅ Encoder ready in {output_dir} (serving {config['model_file']})")
+    return config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX for CPU serving")
+    parser.add_argument('--model', default='all-MiniLM-L6-v2', help="SentenceTransformer model used for the index")
+    parser.add_argument('--output', default='onnx_encoder', help="Output directory (RAG_ONNX_MODEL_DIR)")
+    parser.add_argument('--no-quantize', action='store_true', help="Skip the int8 model")
+    parser.add_argument('--min-cosine', type=float, default=DEFAULT_MIN_COSINE,
+                        help="Minimum cosine similarity to the PyTorch embeddings")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    export_onnx(args.model, args.output, quantize=not args.no_quantize, min_cos=args.min_cosine)
@@ -0,0 +1,93 @@
+"""
+Kerala Panchayat PDF page extraction
+Extracts page text with PyPDF2 across several processes and yields the pages
+in order as they become available
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import PyPDF2
+
+# PdfReader of the worker process, opened once per process by _init_worker
+_reader = None
+
+
+def _init_worker(pdf_path: str):
+    global _reader
+    _reader = PyPDF2.PdfReader(pdf_path)
+
+
+def _extract_pages(page_numbers: Sequence[int], reader=None) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    """(page number, text, error) for each 1-based page number; text is None when extraction failed"""
+    reader = reader or _reader
+    results = []
+    for page_num in page_numbers:
+        try:
+            results.append((page_num, reader.pages[page_num - 1].extract_text() or "", None))
+        except Exception as e:
+            results.append((page_num, None, str(e)))
+    return results
+
+
+def page_count(pdf_path: str) -> int:
+    """Number of pages of a PDF"""
+    return len(PyPDF2.PdfReader(pdf_path).pages)
+
+
+def iter_pdf_pages(pdf_path: str, pages: Optional[Sequence[int]] = None, processes: Optional[int] = None,
+                   pages_per_task: Optional[int] = None) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    """
+    Extract page text in parallel, yielding pages in order
+
+    Page ranges are handed to a pool of worker processes, each of which
+    opens the PDF once. At most two ranges per worker are in flight, so
+    memory stays bounded however slowly the caller consumes the pages.
+
+    Args:
+        pdf_path: PDF file
+        pages: 1-based page numbers to extract, in the order to yield them (default: all)
+        processes: Worker processes (default: the number of CPU cores; 1 extracts in
+                   this process)
+        pages_per_task: Pages per range handed to a worker (default: enough ranges
+                        for about four per worker, at most 32 pages each)
+
+    Yields:
+        (page number, text, error): text is None and error set when a page could not
+        be extracted
+    """
+    if pages is None:
+        pages = range(1, page_count(pdf_path) + 1)
+    pages = list(pages)
+    processes = max(1, processes or os.cpu_count() or 1)
+    if pages_per_task is None:
+        pages_per_task = max(1, min(32, -(-len(pages) // (processes * 4))))
+    ranges = [pages[i:i + pages_per_task] for i in range(0, len(pages), pages_per_task)]
+
+    if processes == 1 or len(ranges) <= 1:
+        reader = PyPDF2.PdfReader(pdf_path)
+        for page_range in ranges:
+            yield from _extract_pages(page_range, reader)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(processes, len(ranges)), initializer=_init_worker,
+                             initargs=(pdf_path,)) as executor:
+        pending = deque()
+        remaining = iter(ranges)
+        try:
+            for page_range in remaining:
+                pending.append(executor.submit(_extract_pages, page_range))
+                if len(pending) >= 2 * processes:
+                    break
+            while pending:
+                results = pending.popleft().result()
+                next_range = next(remaining, None)
+                if next_range is not None:
+                    pending.append(executor.submit(_extract_pages, next_range))
+                yield from results
+        finally:
+            # The caller stopped early (or a worker failed): drop queued ranges
+            for future in pending:
+                future.cancel()
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, session, redirect, url_for, current_app, jsonify
 from functools import wraps
 from models import UserModel, ChatModel, AudioModel, SessionModel
 
@@ -26,4 +26,32 @@ def admin_dashboard():
     sessions = SessionModel.get_all_sessions() if hasattr(SessionModel, 'get_all_sessions') else []
     return render_template('admin.html', users=users, chat_logs=chat_logs, audio_logs=audio_logs, sessions=sessions)
 
+@admin_bp.route('/cache_stats')
+@admin_required
+def cache_stats():
+    """Answer cache hit/miss counters of this worker's RAG engine"""
+    from RAG_engine import get_rag_instance
+    return jsonify(get_rag_instance().cache_stats())
+
+@admin_bp.route('/llm_stats')
+@admin_required
+def llm_stats():
+    """LLM call latency, retry and hedging counters of this worker's RAG engine"""
+    from RAG_engine import get_rag_instance
+    return jsonify(get_rag_instance().llm_stats())
+
+@admin_bp.route('/faq_stats')
+@admin_required
+def faq_stats():
+    """FAQ store version and hit/miss counters of this worker"""
+    from faq_store import get_faq_store
+    return jsonify(get_faq_store().stats())
+
+@admin_bp.route('/corpus_stats')
+@admin_required
+def corpus_stats():
+    """Index memory budget, loaded file bytes and per-corpus residency, load/eviction counters and calibration"""
+    from RAG_engine import get_rag_instance
+    return jsonify(get_rag_instance().corpus_stats())
+
 # Optionally, add more admin routes for user/session management, analytics, etc.
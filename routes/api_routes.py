@@ -1,14 +1,83 @@
-from flask import Blueprint, request, jsonify, session, current_app
+import json
+import time
+from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context
 from utils import (require_login, allowed_file, generate_secure_filename, 
                    save_uploaded_file, get_response_message, format_timestamp,
                    validate_audio_data, process_base64_audio, transcribe_audio,
                    translate_malayalam_to_english,translate_english_to_malayalam)
-from RAG_engine import ask_kerala_panchayat
+from RAG_engine import ask_kerala_panchayat, stream_kerala_panchayat, rag_status, get_rag_instance
+from faq_store import get_faq_store
+from chunk_filter import ChunkFilter
 from models import SessionModel, ChatModel, AudioModel
 from database import check_db_connection
 
 api_bp = Blueprint('api', __name__)
 
+# Endpoints that need a loaded RAG engine
+RAG_ENDPOINTS = {'api.chat_api', 'api.chat_stream_api', 'api.search_api'}
+
+# Largest page size accepted by /api/search
+MAX_SEARCH_PAGE_SIZE = 50
+
+# Query parameters of /api/search that filter chunks
+SEARCH_FILTER_PARAMS = ('chapter', 'section', 'part', 'document', 'page_from', 'page_to')
+
+@api_bp.before_request
+def require_rag_ready():
+    """Hold chat traffic with 503 while the RAG engine is warming up"""
+    # Anonymous requests fall through to require_login on the view and get a 401
+    if (request.endpoint in RAG_ENDPOINTS and 'user_id' in session
+            and rag_status()['status'] == 'warming'):
+        return jsonify({'error': 'The assistant is starting up. Please try again in a few seconds.'}), 503, \
+            {'Retry-After': '5'}
+
+@api_bp.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the RAG engine is loaded and warmed up, 503 before"""
+    status = rag_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+def _faq_answer(user_message, language):
+    """Precomputed (answer, sources, source details) for a frequently asked question in the requested language, or None"""
+    try:
+        entry = get_faq_store().lookup(user_message, get_rag_instance().corpus_version())
+    except Exception as e:
+        print(f"[FAQ] Lookup failed: {e}")
+        return None
+    if entry is None:
+        return None
+    answer = entry['answer_ml'] if language == 'malayalam' else entry['answer_en']
+    if not answer:
+        return None
+    return answer, entry['sources'], entry.get('source_details', [])
+
+def _requested_corpora(value):
+    """
+    Corpus subset from a request: a list or a comma-separated string of names
+
+    Returns None when no subset is requested; raises ValueError for unknown corpora.
+    """
+    if not value:
+        return None
+    names = value.split(',') if isinstance(value, str) else value
+    corpora = [str(name).strip() for name in names if str(name).strip()]
+    if not corpora:
+        return None
+    available = get_rag_instance().corpus_names()
+    unknown = sorted(set(corpora) - set(available))
+    if unknown:
+        raise ValueError(f"Unknown corpora: {', '.join(unknown)} (available: {', '.join(available) or 'none'})")
+    return corpora
+
+def _requested_filters(values):
+    """
+    Chunk filter from a request, e.g. {"chapter": "XXV"} or {"part": "rules"}
+
+    Returns None when no filter is requested; raises ValueError for unknown or invalid filters.
+    """
+    chunk_filter = ChunkFilter.from_dict(values)
+    return chunk_filter.as_dict() if chunk_filter is not None else None
+
 @api_bp.route('/chat', methods=['POST'])
 @require_login
 def chat_api():
@@ -23,8 +92,33 @@ def chat_api():
     if not user_message.strip():
         return jsonify({'error': 'Message cannot be empty'}), 400
 
+    try:
+        corpora = _requested_corpora(data.get('corpora'))
+        filters = _requested_filters(data.get('filters'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     print(f"[CHAT API] User message: {user_message}, Language: {language}")
 
+    session_id = session.get('session_id')
+    user_id = session.get('user_id')
+
+    # Frequently asked questions are answered from the precomputed store
+    # (built over all corpora and chunks, so not used for a subset or filter)
+    faq = _faq_answer(user_message, language) if corpora is None and filters is None else None
+    if faq is not None:
+        response_message, sources, source_details = faq
+        print("[CHAT API] Served from FAQ store")
+        SessionModel.update_session_activity(session_id)
+        ChatModel.save_message(session_id, user_id, user_message, 'user', language=language)
+        ChatModel.save_message(session_id, user_id, response_message, 'assistant', language=language)
+        return jsonify({
+            'message': response_message,
+            'timestamp': format_timestamp(),
+            'source_reference': sources,
+            'source_details': source_details
+        })
+
     # Always work in English for the RAG engine
     if language == 'malayalam':
         text = translate_malayalam_to_english(user_message)
@@ -34,14 +128,11 @@ def chat_api():
     else:
         user_message_en = user_message
 
-    session_id = session.get('session_id')
-    user_id = session.get('user_id')
-
     # Update session activity
     SessionModel.update_session_activity(session_id)
 
     # Generate response from RAG engine using English message
-    get_response_message = ask_kerala_panchayat(user_message_en)
+    get_response_message = ask_kerala_panchayat(user_message_en, corpora=corpora, filters=filters)
     if get_response_message is None:
         return jsonify({'error': 'Failed to get response from RAG engine'}), 500
 
@@ -59,7 +150,8 @@ def chat_api():
     response = {
         'message': response_message,
         'timestamp': format_timestamp(),
-        'source_reference': get_response_message['sources']
+        'source_reference': get_response_message['sources'],
+        'source_details': get_response_message['source_details']
     }
 
     # Save chat messages to database
@@ -68,6 +160,174 @@ def chat_api():
 
     return jsonify(response)
 
+def _sse_event(event, data):
+    """Format a single Server-Sent-Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@api_bp.route('/chat/stream', methods=['POST'])
+@require_login
+def chat_stream_api():
+    """
+    Streaming API endpoint for chat messages (Server-Sent Events)
+
+    Events pushed to the client:
+    - sources: source references and their details, sent as soon as retrieval finishes
+    - delta: answer text as it is generated (English only; Malayalam
+      answers are translated once the full answer is available)
+    - done: final message, timestamp, source_reference and source_details, same shape as /chat
+    - error: error message
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    user_message = data.get('message', '')
+    language = data.get('language', 'english')
+
+    if not user_message.strip():
+        return jsonify({'error': 'Message cannot be empty'}), 400
+
+    try:
+        corpora = _requested_corpora(data.get('corpora'))
+        filters = _requested_filters(data.get('filters'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    print(f"[CHAT STREAM API] User message: {user_message}, Language: {language}")
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+    }
+    session_id = session.get('session_id')
+    user_id = session.get('user_id')
+
+    # Frequently asked questions are answered from the precomputed store
+    # (built over all corpora and chunks, so not used for a subset or filter)
+    faq = _faq_answer(user_message, language) if corpora is None and filters is None else None
+    if faq is not None:
+        response_message, sources, source_details = faq
+        print("[CHAT STREAM API] Served from FAQ store")
+        SessionModel.update_session_activity(session_id)
+        ChatModel.save_message(session_id, user_id, user_message, 'user', language=language)
+        ChatModel.save_message(session_id, user_id, response_message, 'assistant', language=language)
+
+        def generate_faq():
+            yield _sse_event('sources', {'source_reference': sources, 'source_details': source_details})
+            if language != 'malayalam':
+                yield _sse_event('delta', {'content': response_message})
+            yield _sse_event('done', {
+                'message': response_message,
+                'timestamp': format_timestamp(),
+                'source_reference': sources,
+                'source_details': source_details
+            })
+
+        return Response(generate_faq(), mimetype='text/event-stream', headers=headers)
+
+    # Always work in English for the RAG engine
+    if language == 'malayalam':
+        text = translate_malayalam_to_english(user_message)
+        if text is None:
+            return jsonify({'error': 'Translation failed. Please try again.'}), 500
+        user_message_en = text
+    else:
+        user_message_en = user_message
+
+    # Update session activity
+    SessionModel.update_session_activity(session_id)
+
+    def generate():
+        response_message = None
+        sources, source_details = [], []
+        try:
+            for event in stream_kerala_panchayat(user_message_en, corpora=corpora, filters=filters):
+                if event['type'] == 'sources':
+                    sources, source_details = event['sources'], event['source_details']
+                    yield _sse_event('sources', {'source_reference': sources, 'source_details': source_details})
+                elif event['type'] == 'delta':
+                    if language != 'malayalam':
+                        yield _sse_event('delta', {'content': event['content']})
+                elif event['type'] == 'done':
+                    if language == 'malayalam':
+                        response_message = translate_english_to_malayalam(event['answer'])
+                        if response_message is None:
+                            yield _sse_event('error', {'error': 'Translation failed. Please try again.'})
+                            return
+                    else:
+                        response_message = event['answer']
+                    yield _sse_event('done', {
+                        'message': response_message,
+                        'timestamp': format_timestamp(),
+                        'source_reference': sources,
+                        'source_details': source_details
+                    })
+                elif event['type'] == 'error':
+                    # The engine's answer may be the partial text streamed before the failure
+                    print(f"[CHAT STREAM API] RAG engine error: {event.get('error_message')}")
+                    response_message = None
+                    yield _sse_event('error', {'error': 'Sorry, I encountered an error while processing your question. Please try again.'})
+        finally:
+            # Runs when the stream completes or the client disconnects; only a
+            # completed answer is saved, never the partial text of a failed one
+            ChatModel.save_message(session_id, user_id, user_message, 'user', language=language)
+            if response_message:
+                ChatModel.save_message(session_id, user_id, response_message, 'assistant', language=language)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+@api_bp.route('/search', methods=['GET'])
+@require_login
+def search_api():
+    """
+    Retrieval-only search over the documents (no LLM call)
+
+    Query parameters:
+    - q: search text (English, or Malayalam with language=malayalam)
+    - page_size: results per page (default 10, at most 50)
+    - cursor: next_cursor from the previous page; q is not needed with it
+    - corpora: comma-separated corpus names to search (multi-corpus mode; default all)
+    - chapter, section, part, document, page_from, page_to: restrict the search
+      to matching chunks (e.g. chapter=XXV, part=rules)
+
+    Returns ranked chunks with score, page numbers, character offsets, heading
+    and chapter/section/part.
+    """
+    query = request.args.get('q', '')
+    cursor = request.args.get('cursor')
+    language = request.args.get('language', 'english')
+    try:
+        page_size = min(MAX_SEARCH_PAGE_SIZE, max(1, int(request.args.get('page_size', 10))))
+    except ValueError:
+        return jsonify({'error': 'page_size must be a number'}), 400
+
+    if not cursor and not query.strip():
+        return jsonify({'error': 'Query cannot be empty'}), 400
+
+    try:
+        corpora = _requested_corpora(request.args.get('corpora'))
+        filters = _requested_filters({name: request.args[name]
+                                      for name in SEARCH_FILTER_PARAMS if name in request.args})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    start_time = time.time()
+    query_en = query
+    if not cursor and language == 'malayalam':
+        query_en = translate_malayalam_to_english(query)
+        if query_en is None:
+            return jsonify({'error': 'Translation failed. Please try again.'}), 500
+
+    try:
+        result = get_rag_instance().search(query_en, page_size=page_size, cursor=cursor,
+                                          corpora=corpora, filters=filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    result['query'] = query
+    result['response_time'] = time.time() - start_time
+    return jsonify(result)
+
 @api_bp.route('/upload_audio', methods=['POST'])
 @require_login
 def upload_audio():
@@ -0,0 +1,458 @@
+"""
+Kerala Panchayat shared-memory corpus
+Publishes the index vectors, chunk store and BM25 postings of a bundle in POSIX
+shared memory, so every worker process on the machine attaches to one copy
+
+Run one loader process per machine:
+    python shared_index.py publish --bundle kerala_panchayat_bundle [--watch 30]
+and start the workers with RAG_SHARED_MEMORY=kerala_rag.
+"""
+
+import os
+import json
+import time
+import struct
+import argparse
+import logging
+import threading
+import weakref
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+
+import index_bundle
+from chunk_store import ChunkStore
+from bm25_index import BM25Index
+from chunk_filter import search_exact
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = "kerala_rag"
+FORMAT_VERSION = 1
+CONTROL_MAGIC = b"KPSHMCT1"
+CONTROL_SIZE = 4096
+SEGMENT_MAGIC = b"KPSHMSG1"
+_ALIGN = 64
+
+
+def _pad(length: int) -> int:
+    return (-length) % _ALIGN
+
+
+def control_name(name: str) -> str:
+    return f"{name}_control"
+
+
+def segment_name(name: str, generation: int) -> str:
+    return f"{name}_g{generation}"
+
+
+class _Segment(shared_memory.SharedMemory):
+    """SharedMemory that stays quiet when garbage-collected while numpy views are alive"""
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+def _open(name: str, create: bool = False, size: int = 0) -> _Segment:
+    """
+    Open a segment without handing it to Python's resource tracker
+
+    The tracker would unlink the segment when the opening process exits, but
+    segments must outlive both the loader and individual workers.
+    """
+    shm = _Segment(name=name, create=create, size=size)
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+def _section_layout(header_len: int, sections: Dict[str, Dict]) -> Tuple[Dict[str, int], int]:
+    """Offsets of the sections that follow a header of header_len bytes, and the total size"""
+    position = len(SEGMENT_MAGIC) + 8 + header_len
+    position += _pad(position)
+    offsets = {}
+    for name, info in sections.items():
+        offsets[name] = position
+        position += info['length'] + _pad(info['length'])
+    return offsets, position
+
+
+# ----------------------------------------------------------------------
+# Control segment
+# ----------------------------------------------------------------------
+#
+# CONTROL_MAGIC | generation (u64) | info length (u64) | info JSON
+#
+# The writer stores the JSON first and the generation last; readers retry
+# until the generation before and after reading matches the JSON.
+
+def _read_control_buffer(buf: memoryview) -> Dict:
+    if bytes(buf[:len(CONTROL_MAGIC)]) != CONTROL_MAGIC:
+        raise ValueError("Not a Kerala Panchayat shared-memory control segment")
+    for _ in range(1000):
+        generation, = struct.unpack_from('<Q', buf, 8)
+        length, = struct.unpack_from('<Q', buf, 16)
+        try:
+            info = json.loads(bytes(buf[24:24 + length]).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError):
+            info = None
+        if info is not None and info.get('generation') == generation == struct.unpack_from('<Q', buf, 8)[0]:
+            return info
+        time.sleep(0.001)
+    raise RuntimeError("Shared-memory control segment is not settling")
+
+
+def read_control(name: str = DEFAULT_NAME) -> Optional[Dict]:
+    """Currently published generation and segment, or None if nothing is published"""
+    try:
+        shm = _open(control_name(name))
+    except FileNotFoundError:
+        return None
+    try:
+        return _read_control_buffer(shm.buf)
+    finally:
+        shm.close()
+
+
+def _write_control(name: str, info: Dict):
+    payload = json.dumps(info).encode('utf-8')
+    if 24 + len(payload) > CONTROL_SIZE:
+        raise ValueError("Control info does not fit in the control segment")
+    try:
+        shm = _open(control_name(name))
+    except FileNotFoundError:
+        shm = _open(control_name(name), create=True, size=CONTROL_SIZE)
+        shm.buf[:len(CONTROL_MAGIC)] = CONTROL_MAGIC
+    try:
+        shm.buf[24:24 + len(payload)] = payload
+        struct.pack_into('<Q', shm.buf, 16, len(payload))
+        struct.pack_into('<Q', shm.buf, 8, info['generation'])
+    finally:
+        shm.close()
+
+
+# ----------------------------------------------------------------------
+# Publishing
+# ----------------------------------------------------------------------
+
+def publish(bundle_dir: str, name: str = DEFAULT_NAME, check_checksums: bool = True) -> Dict:
+    """
+    Copy a bundle into a new shared-memory generation and make it current
+
+    The new segment is fully written before the control segment points at it.
+    The previous segment is then unlinked: workers still mapping it keep
+    their pages until they switch, and new attachments see only the new one.
+
+    Args:
+        bundle_dir: Index bundle directory (see index_bundle)
+        name: Shared-memory name shared with the workers (RAG_SHARED_MEMORY)
+        check_checksums: Verify bundle checksums before publishing
+
+    Returns:
+        The control info of the published generation
+    """
+    bundle_dir = os.path.realpath(bundle_dir)
+    manifest = index_bundle.read_manifest(bundle_dir)
+    index_bundle.verify_files(bundle_dir, manifest, check_checksums=check_checksums)
+
+    index = index_bundle.read_index(index_bundle.bundle_file(bundle_dir, manifest, 'index'), mmap=False)
+    vectors = np.ascontiguousarray(index.reconstruct_n(0, index.ntotal), dtype='float32')
+
+    with open(index_bundle.bundle_file(bundle_dir, manifest, 'chunks'), 'rb') as f:
+        sections: Dict[str, Union[bytes, np.ndarray]] = {'vectors': vectors, 'chunks': f.read()}
+
+    bm25_params = None
+    if 'bm25' in manifest['files']:
+        bm25 = BM25Index.load(index_bundle.bundle_file(bundle_dir, manifest, 'bm25'))
+        sections['bm25.terms'] = "\n".join(bm25.terms).encode('utf-8')
+        sections['bm25.indptr'] = np.ascontiguousarray(bm25.indptr)
+        sections['bm25.doc_ids'] = np.ascontiguousarray(bm25.doc_ids)
+        sections['bm25.weights'] = np.ascontiguousarray(bm25.weights)
+        bm25_params = [bm25.num_docs, bm25.k1, bm25.b]
+
+    previous = read_control(name)
+    generation = (previous['generation'] if previous else 0) + 1
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'generation': generation,
+        'bundle_version': manifest['bundle_version'],
+        'embedding_model': manifest['embedding_model'],
+        'dimension': int(vectors.shape[1]),
+        'chunk_count': int(vectors.shape[0]),
+        'metric': 'ip' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2',
+        'bm25_params': bm25_params,
+        'sections': {
+            key: {
+                'length': len(value) if isinstance(value, bytes) else value.nbytes,
+                'dtype': 'bytes' if isinstance(value, bytes) else value.dtype.str,
+                'shape': None if isinstance(value, bytes) else list(value.shape)
+            }
+            for key, value in sections.items()
+        }
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    offsets, total = _section_layout(len(header_bytes), header['sections'])
+
+    shm = _open(segment_name(name, generation), create=True, size=total)
+    try:
+        buf = shm.buf
+        buf[:len(SEGMENT_MAGIC)] = SEGMENT_MAGIC
+        struct.pack_into('<Q', buf, len(SEGMENT_MAGIC), len(header_bytes))
+        start = len(SEGMENT_MAGIC) + 8
+        buf[start:start + len(header_bytes)] = header_bytes
+        for key, value in sections.items():
+            raw = value if isinstance(value, bytes) else value.tobytes()
+            buf[offsets[key]:offsets[key] + len(raw)] = raw
+        del buf
+    finally:
+        shm.close()
+
+    info = {
+        'generation': generation,
+        'segment': segment_name(name, generation),
+        'bundle_version': manifest['bundle_version'],
+        'bytes': total,
+        'published_at': time.time()
+    }
+    _write_control(name, info)
+
+    if previous:
+        _unlink(previous['segment'])
+
+    logger.info(f"Published bundle {manifest['bundle_version']} as generation {generation} "
+                f"({total / 1e6:.1f} MB in {info['segment']})")
+    return info
+
+
+def _unlink(segment: str):
+    try:
+        shm = _open(segment)
+    except FileNotFoundError:
+        return
+    shm.close()
+    # unlink() also unregisters from the resource tracker, so register it back first
+    resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
+def unpublish(name: str = DEFAULT_NAME):
+    """Remove the published segments (attached workers keep their mappings)"""
+    info = read_control(name)
+    if info:
+        _unlink(info['segment'])
+    _unlink(control_name(name))
+
+
+# ----------------------------------------------------------------------
+# Attaching
+# ----------------------------------------------------------------------
+
+class SharedFlatIndex:
+    """
+    Exact search over vectors in shared memory
+
+    Supports the parts of the FAISS index API the engine uses (d, ntotal,
+    metric_type, search, reconstruct_batch), plus search_selected for
+    filtered search. Approximate indexes are published as their stored
+    vectors, so search here is always exact.
+    """
+
+    def __init__(self, vectors: np.ndarray, metric: str = 'ip'):
+        self.vectors = vectors
+        self.d = vectors.shape[1]
+        self.ntotal = vectors.shape[0]
+        self.metric_type = faiss.METRIC_INNER_PRODUCT if metric == 'ip' else faiss.METRIC_L2
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return search_exact(queries, self.vectors, np.arange(self.ntotal, dtype='int64'), k, self.metric_type)
+
+    def search_selected(self, queries: np.ndarray, k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact search among the vectors with the given ids (sorted chunk ids)"""
+        return search_exact(queries, self.vectors[ids], ids, k, self.metric_type)
+
+    def reconstruct_batch(self, ids) -> np.ndarray:
+        return self.vectors[np.asarray(ids, dtype='int64')]
+
+
+class SharedCorpus:
+    """
+    A worker's zero-copy attachment to the published corpus
+
+    index, chunks and bm25 are views into the current generation's segment.
+    is_stale() is a single 8-byte read, cheap enough to call per request.
+    After a switch, the earlier segment is unmapped as soon as the last view
+    into it is gone, i.e. once no in-flight request pins its index, chunks
+    or bm25 any more.
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME):
+        self.name = name
+        try:
+            self._control = _open(control_name(name))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No shared corpus named '{name}' is published; "
+                                    f"run 'python shared_index.py publish' first")
+        self._segment: Optional[_Segment] = None
+        self._retired: List[_Segment] = []
+        self._retired_lock = threading.RLock()   # Finalizers may run in any thread
+        self._views: List[weakref.ref] = []     # Section views into the current segment
+        self.generation = None
+        self.header: Dict = {}
+        self.index: Optional[SharedFlatIndex] = None
+        self.chunks: Optional[ChunkStore] = None
+        self.bm25: Optional[BM25Index] = None
+        self.attach()
+
+    def published_generation(self) -> int:
+        return struct.unpack_from('<Q', self._control.buf, 8)[0]
+
+    def is_stale(self) -> bool:
+        return self.published_generation() != self.generation
+
+    def attach(self):
+        """Attach to the currently published generation"""
+        for attempt in range(100):
+            info = _read_control_buffer(self._control.buf)
+            try:
+                segment = _open(info['segment'])
+                break
+            except FileNotFoundError:
+                # A concurrent publish retired and unlinked this generation after the
+                # control segment was read; read it again for the new one
+                if attempt == 99:
+                    raise
+                time.sleep(0.001)
+        view = segment.buf
+
+        if bytes(view[:len(SEGMENT_MAGIC)]) != SEGMENT_MAGIC:
+            raise ValueError(f"Segment {info['segment']} is not a shared corpus")
+        header_len, = struct.unpack_from('<Q', view, len(SEGMENT_MAGIC))
+        start = len(SEGMENT_MAGIC) + 8
+        header = json.loads(bytes(view[start:start + header_len]).decode('utf-8'))
+        if header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shared corpus version {header.get('format_version')}")
+        offsets, _ = _section_layout(header_len, header['sections'])
+        views = []
+
+        def section(key):
+            meta = header['sections'][key]
+            raw = view[offsets[key]:offsets[key] + meta['length']]
+            if meta['dtype'] == 'bytes':
+                views.append(weakref.ref(raw))
+                return raw
+            array = np.frombuffer(raw, dtype=meta['dtype']).reshape(meta['shape'])
+            # numpy holds the buffer through a memoryview of its own, not raw
+            base = array
+            while isinstance(base, np.ndarray):
+                base = base.base
+            views.append(weakref.ref(base))
+            return array
+
+        index = SharedFlatIndex(section('vectors'), header['metric'])
+        chunks = ChunkStore(section('chunks'))
+        bm25 = None
+        if header['bm25_params']:
+            num_docs, k1, b = header['bm25_params']
+            terms = bytes(section('bm25.terms')).decode('utf-8')
+            terms = terms.split("\n") if terms else []
+            bm25 = BM25Index(terms, section('bm25.indptr'), section('bm25.doc_ids'),
+                             section('bm25.weights'), int(num_docs), float(k1), float(b))
+
+        if self._segment is not None:
+            self._retire(self._segment, self._views)
+        self._segment, self._views = segment, views
+        self.header = header
+        self.generation = header['generation']
+        self.index, self.chunks, self.bm25 = index, chunks, bm25
+        self._close_retired()
+
+    def _retire(self, segment: _Segment, views: List[weakref.ref]):
+        """
+        Close a replaced segment once its section views have all been collected
+
+        A memoryview runs its finalizers after releasing its buffer, so by then
+        only the segment's own buffer is left and close() succeeds.
+        """
+        pins = [view() for view in views]
+        pins = [pin for pin in pins if pin is not None]
+        remaining = [len(pins)]
+
+        def unpin():
+            with self._retired_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self._close_retired()
+
+        with self._retired_lock:
+            self._retired.append(segment)
+            for pin in pins:
+                weakref.finalize(pin, unpin)
+        del pins
+
+    def _close_retired(self):
+        """Unmap earlier generations once no request holds views into them"""
+        with self._retired_lock:
+            for segment in list(self._retired):
+                try:
+                    segment.close()
+                except BufferError:
+                    continue
+                if segment in self._retired:
+                    self._retired.remove(segment)
+
+
+# ----------------------------------------------------------------------
+# Loader CLI
+# ----------------------------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish the index bundle in shared memory for the workers")
+    parser.add_argument('command', choices=['publish', 'status', 'unpublish'])
+    parser.add_argument('--bundle', default=os.getenv('RAG_BUNDLE_PATH', 'kerala_panchayat_bundle'),
+                        help="Index bundle directory")
+    parser.add_argument('--name', default=os.getenv('RAG_SHARED_MEMORY', DEFAULT_NAME),
+                        help="Shared-memory name (RAG_SHARED_MEMORY on the workers)")
+    parser.add_argument('--watch', type=float, default=0,
+                        help="Keep running and republish when the bundle changes (poll interval in seconds)")
+    parser.add_argument('--skip-checksums', action='store_true', help="Do not verify bundle checksums")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    if args.command == 'status':
+        print(json.dumps(read_control(args.name), indent=2))
+        return
+    if args.command == 'unpublish':
+        unpublish(args.name)
+        print(f"🧹 Removed shared corpus '{args.name}'")
+        return
+
+    info = publish(args.bundle, args.name, check_checksums=not args.skip_checksums)
+    print(f"✅ Generation {info['generation']} published as '{args.name}' ({info['bytes'] / 1e6:.1f} MB)")
+
+    while args.watch > 0:
+        time.sleep(args.watch)
+        try:
+            manifest = index_bundle.read_manifest(args.bundle)
+        except (index_bundle.BundleError, OSError, ValueError) as e:
+            logger.warning(f"Bundle not readable, keeping generation {info['generation']}: {e}")
+            continue
+        if manifest['bundle_version'] != info['bundle_version']:
+            info = publish(args.bundle, args.name, check_checksums=not args.skip_checksums)
+            print(f"🔄 Generation {info['generation']} published ({info['bundle_version']})")
+
+
+if __name__ == "__main__":
+    main()
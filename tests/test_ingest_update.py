@@ -0,0 +1,135 @@
+"""
+Round trip of the incremental bundle update in ingest_pdf: an unchanged
+document, an edited page and a removed page must each leave a bundle whose
+index ids, chunks and metadata follow document order
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip('faiss')
+pytest.importorskip('torch')
+pytest.importorskip('sentence_transformers')
+pytest.importorskip('langchain')
+
+import index_bundle
+import ingest_pdf
+from chunk_store import ChunkStore
+
+DIMENSION = 16
+
+
+def vector(text):
+    """Deterministic unit vector of a text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    v = np.random.default_rng(seed).standard_normal(DIMENSION).astype('float32')
+    return v / np.linalg.norm(v)
+
+
+class HashEncoder:
+    """Stand-in for the sentence transformer, so no model is downloaded"""
+
+    def encode(self, texts, **kwargs):
+        return np.stack([vector(text) for text in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+
+def page_text(page_num, edition=0):
+    paragraphs = []
+    if page_num == 1:
+        paragraphs.append("CHAPTER I\nPRELIMINARY")
+    if page_num == 4:
+        paragraphs.append("CHAPTER II\nCONSTITUTION OF PANCHAYATS")
+    for n in range(3):
+        section = 3 * page_num + n
+        words = " ".join(f"clause{page_num}x{n}w{w}e{edition}" for w in range(40))
+        paragraphs.append(f"{section}. Provision number {section} of the Act\n{words}.")
+    return "\n\n".join(paragraphs)
+
+
+def make_pages(count=6, edited=(), removed=()):
+    return [(page_num, page_text(page_num, 1 if page_num in edited else 0))
+            for page_num in range(1, count + 1) if page_num not in removed]
+
+
+@pytest.fixture
+def ingestor(monkeypatch):
+    monkeypatch.setattr(ingest_pdf, 'SentenceTransformer', lambda name, device: HashEncoder())
+    return ingest_pdf.PDFIngestor(cache_path=None)
+
+
+def ingest(ingestor, bundle_dir, pages, index_type):
+    ingestor.iter_pages = lambda pdf_path: iter(pages)
+    assert ingestor.ingest_pdf("act.pdf", bundle_dir=bundle_dir, index_type=index_type)
+    return index_bundle.read_manifest(bundle_dir)
+
+
+def assert_document_order(ingestor, bundle_dir, pages):
+    manifest = index_bundle.read_manifest(bundle_dir)
+    assert manifest['chunk_metadata_version'] == ingest_pdf.CHUNK_METADATA_VERSION
+
+    index = faiss.read_index(index_bundle.bundle_file(bundle_dir, manifest, 'index'))
+    store = ChunkStore.open(index_bundle.bundle_file(bundle_dir, manifest, 'chunks'))
+    try:
+        chunks = list(store)
+        metadata = [store.metadata(i) for i in range(len(store))]
+    finally:
+        store.close()
+
+    assert chunks == [chunk for chunk, _ in ingestor.iter_chunks(iter(pages))]
+    page_starts = [meta['page_start'] for meta in metadata]
+    assert page_starts == sorted(page_starts)
+    assert metadata[-1]['chapter'] == 'II'
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)
+    np.testing.assert_allclose(vectors, np.stack([vector(chunk) for chunk in chunks]), atol=1e-5)
+
+
+@pytest.mark.parametrize('index_type', ingest_pdf.INDEX_TYPES)
+def test_incremental_update_round_trip(ingestor, tmp_path, index_type):
+    bundle_dir = str(tmp_path / "bundle")
+    pages = make_pages()
+    first = ingest(ingestor, bundle_dir, pages, index_type)
+    assert_document_order(ingestor, bundle_dir, pages)
+
+    # Unchanged document: nothing is written
+    assert ingest(ingestor, bundle_dir, pages, index_type)['bundle_version'] == first['bundle_version']
+
+    # One page edited in the middle: its chunks are replaced in place
+    pages = make_pages(edited={3})
+    ingest(ingestor, bundle_dir, pages, index_type)
+    changes = ingestor.index_config['incremental']
+    assert changes['added'] and changes['removed'] and changes['kept']
+    assert_document_order(ingestor, bundle_dir, pages)
+
+    # One page removed
+    pages = make_pages(edited={3}, removed={2})
+    ingest(ingestor, bundle_dir, pages, index_type)
+    changes = ingestor.index_config['incremental']
+    assert changes['removed'] and not changes['added']
+    assert_document_order(ingestor, bundle_dir, pages)
+
+
+def test_unchanged_document_with_old_metadata_is_rewritten(ingestor, tmp_path):
+    bundle_dir = str(tmp_path / "bundle")
+    pages = make_pages()
+    first = ingest(ingestor, bundle_dir, pages, 'flat')
+
+    # A bundle written before the metadata version was recorded
+    path = index_bundle.manifest_path(bundle_dir)
+    with open(path) as f:
+        manifest = json.load(f)
+    del manifest['chunk_metadata_version']
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+
+    assert ingest(ingestor, bundle_dir, pages, 'flat')['bundle_version'] != first['bundle_version']
+    assert_document_order(ingestor, bundle_dir, pages)